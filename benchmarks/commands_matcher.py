@@ -0,0 +1,72 @@
+"""
+Compares indexed commands matcher with nested scans of build log.
+
+Usage: python -m benchmarks.commands_matcher
+
+Nested scans cost grows with lines x commands, matcher's cost grows with lines only.
+"""
+import random
+import timeit
+from typing import Callable, List
+
+from opensource_watchman.utils.logs_analiser import CommandsMatcher
+
+
+WORDS = ['install', 'run', '--verbose', 'tests/', '-r', 'requirements.txt', 'setup.py', '.']
+
+
+def nested_scans_has_commands(log: List[str], commands: List[str]) -> bool:
+    for required_command in commands:
+        for base_command in log:
+            if (
+                base_command.startswith(f'{required_command} ')
+                or f' {required_command} ' in base_command
+                or base_command == required_command
+            ):
+                return True
+    return False
+
+
+def generate_log(lines_number: int) -> List[str]:
+    return [
+        ' '.join(random.choice(WORDS) for _ in range(random.randint(2, 12)))
+        for _ in range(lines_number)
+    ]
+
+
+def generate_sections(commands_number: int) -> List[List[str]]:
+    return [[f'tool{n}', f'python -m tool{n}'] for n in range(commands_number // 2)]
+
+
+def run_nested_scans(log: List[str], sections: List[List[str]]) -> None:
+    for section in sections:
+        nested_scans_has_commands(log, section)
+
+
+def run_matcher(log: List[str], sections: List[List[str]]) -> None:
+    found_commands = CommandsMatcher(c for s in sections for c in s).find_in_log(log)
+    for section in sections:
+        found_commands.intersection(section)
+
+
+def measure(benchmark: Callable[[], None]) -> float:
+    return min(timeit.repeat(benchmark, number=1, repeat=3))
+
+
+def main() -> None:
+    random.seed(0)
+    print(f'{"lines":>8} {"commands":>8} {"nested, ms":>12} {"matcher, ms":>12}')  # noqa: T001
+    for lines_number in (1000, 10000, 100000):
+        log = generate_log(lines_number)
+        for commands_number in (10, 100):
+            sections = generate_sections(commands_number)
+            nested_time = measure(lambda: run_nested_scans(log, sections))
+            matcher_time = measure(lambda: run_matcher(log, sections))
+            print(  # noqa: T001
+                f'{lines_number:>8} {commands_number:>8} '
+                f'{nested_time * 1000:>12.1f} {matcher_time * 1000:>12.1f}',
+            )
+
+
+if __name__ == '__main__':
+    main()
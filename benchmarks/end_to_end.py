@@ -0,0 +1,120 @@
+"""
+End-to-end benchmark of watchman run on synthetic org, served by local fake api server.
+
+Usage: python -m benchmarks.end_to_end --repos 600 --latency_ms 50 >> results.jsonl
+
+Prints single json line with run parameters and measurements, so results
+of different commits can be compared.
+"""
+import json
+import os
+import resource
+import subprocess  # noqa: S404
+import time
+from typing import Any, Mapping
+
+from click import command, option, IntRange
+
+from benchmarks.synthetic_org import SYNTHETIC_ORG_HOSTS, SyntheticOrg, generate_org
+from opensource_watchman.api.host_overrides import HostOverrides
+from opensource_watchman.api.transport import set_transport
+from opensource_watchman.run import create_transport, load_config, run_watchman
+from opensource_watchman.utils.fake_api_server import FakeApiServer
+
+
+BENCHMARK_ENVIRON = {
+    'GITHUB_USERNAME': 'benchmark',
+    'GITHUB_API_TOKEN': 'benchmark',
+    'TRAVIS_CI_ORG_ACCESS_TOKEN': 'benchmark',
+    'CODECLIMATE_API_TOKEN': 'benchmark',
+}
+
+
+def run_benchmark(  # noqa: CFQ002
+    org: SyntheticOrg,
+    latency_seconds: float,
+    jobs: int,
+    pipeline_jobs: int,
+    github_data_source: str = 'rest',
+) -> Mapping[str, Any]:
+    for env_name, env_value in BENCHMARK_ENVIRON.items():
+        os.environ.setdefault(env_name, env_value)
+    config = load_config()._replace(
+        pipeline_jobs=pipeline_jobs,
+        github_data_source=github_data_source,
+    )
+    with FakeApiServer(rate_limit=10 ** 9, latency_seconds=latency_seconds) as server:
+        generate_org(server, org)
+        transport = create_transport(
+            warm_up_connections=False,
+            cache_dir=None,
+            github_api_tokens=config.github_api_tokens,
+            github_points_per_minute={},  # fake api server has no secondary rate limits
+        )
+        transport.layers.append(HostOverrides({h: server.url for h in SYNTHETIC_ORG_HOSTS}))
+        set_transport(transport)
+        started_at = time.perf_counter()
+        repos_stat = run_watchman(org.owner, None, [], config, jobs=jobs)
+        wall_time = time.perf_counter() - started_at
+        requests_number = len(server.requests_log)
+    return {
+        'commit': get_current_commit(),
+        'parameters': {
+            **org._asdict(),
+            'latency_ms': latency_seconds * 1000,
+            'jobs': jobs,
+            'pipeline_jobs': pipeline_jobs,
+            'github_data_source': github_data_source,
+        },
+        'processed_repos': len(repos_stat),
+        'wall_time_seconds': round(wall_time, 3),
+        'requests': requests_number,
+        'requests_per_repo': round(requests_number / org.repos_number, 2),
+        'throughput_repos_per_second': round(len(repos_stat) / wall_time, 3),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'http_stat': dict(transport.stat()),
+    }
+
+
+def get_current_commit() -> str:
+    try:
+        return subprocess.check_output(  # noqa: S603, S607
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+@command()
+@option('--owner', default='synthetic-org', help='name of synthetic org')
+@option('--repos', type=IntRange(min=1), default=50, help='number of repos')
+@option('--issues', type=IntRange(min=0), default=10, help='number of open issues per repo')
+@option('--prs', type=IntRange(min=0), default=3, help='number of open pull requests per repo')
+@option('--log_lines', type=IntRange(min=1), default=2000, help='lines in each travis job log')
+@option('--latency_ms', type=IntRange(min=0), default=20, help='latency of each api response')
+@option('--jobs', type=IntRange(min=1), default=8, help='number of repos processed concurrently')
+@option('--pipeline_jobs', type=IntRange(min=1), default=4, help='concurrent steps of repo')
+def main(  # noqa: CFQ002
+    owner: str,
+    repos: int,
+    issues: int,
+    prs: int,
+    log_lines: int,
+    latency_ms: int,
+    jobs: int,
+    pipeline_jobs: int,
+) -> None:
+    """Run end-to-end benchmark and print its results as json line."""
+    benchmark_result = run_benchmark(
+        SyntheticOrg(owner, repos, issues, prs, log_lines),
+        latency_seconds=latency_ms / 1000,
+        jobs=jobs,
+        pipeline_jobs=pipeline_jobs,
+    )
+    print(json.dumps(benchmark_result))  # noqa: T001
+
+
+if __name__ == '__main__':
+    main()
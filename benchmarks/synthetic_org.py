@@ -0,0 +1,151 @@
+"""Generator of synthetic github organisation, served by local fake api server."""
+import datetime
+import random
+from typing import Any, Dict, List, NamedTuple
+
+from opensource_watchman.utils.fake_api_server import FakeApiServer
+
+
+SYNTHETIC_ORG_HOSTS = (
+    'api.github.com',
+    'raw.githubusercontent.com',
+    'api.travis-ci.org',
+    'api.codeclimate.com',
+    'pypi.org',
+    'pypistats.org',
+)
+BUILD_COMMANDS = [
+    'pip install -r requirements.txt',
+    'flake8 opensource_watchman',
+    'mypy opensource_watchman',
+    'python -m pytest --cov',
+    'mdl README.md',
+    'safety check -r requirements.txt',
+]
+
+
+class SyntheticOrg(NamedTuple):
+    owner: str
+    repos_number: int
+    issues_number: int
+    pull_requests_number: int
+    log_lines_number: int
+    jobs_per_build: int = 2
+
+
+def generate_org(server: FakeApiServer, org: SyntheticOrg, seed: int = 0) -> None:
+    """Registers api routes of all repos of org on fake server."""
+    random.seed(seed)
+    repos_names = [f'repo{n}' for n in range(org.repos_number)]
+    server.add_route(f'/users/{org.owner}/repos', [
+        {'name': r, 'archived': False, 'updated_at': iso_datetime(days_ago=n)}
+        for n, r in enumerate(repos_names)
+    ])
+    for repo_index, repo_name in enumerate(repos_names):
+        add_github_routes(server, org, repo_name)
+        add_travis_routes(server, org, repo_name, repo_index)
+        add_code_climate_routes(server, org, repo_name)
+        server.add_route(f'/project/{repo_name}/', {'info': {'name': repo_name}})
+
+
+def add_github_routes(server: FakeApiServer, org: SyntheticOrg, repo_name: str) -> None:
+    repo_url = f'/repos/{org.owner}/{repo_name}'
+    raw_url = f'/{org.owner}/{repo_name}/master'
+    server.add_route(f'{raw_url}/README.md', generate_readme(repo_name))
+    server.add_route(f'{raw_url}/.travis.yml', 'language: python\npython:\n  - 3.7\n  - 3.8\n')
+    server.add_route(f'{raw_url}/setup.py', f'package_name = "{repo_name}"\n')
+    server.add_route(
+        f'{raw_url}/setup.cfg',
+        '[opensource_watchman]\ntype = project\nmain_languages = python\n',
+    )
+    server.add_route(repo_url, {'name': repo_name, 'description': f'Synthetic {repo_name}'})
+    server.add_route(f'{repo_url}/commits', [generate_commit(days_ago=random.randint(0, 400))])
+    issues = [
+        {'number': n, 'updated_at': iso_datetime(random.randint(0, 400)), 'comments': 1}
+        for n in range(1, org.issues_number + 1)
+    ]
+    server.add_route(f'{repo_url}/issues', issues)
+    for issue in issues:
+        server.add_route(
+            f'{repo_url}/issues/{issue["number"]}/comments',
+            [{'updated_at': iso_datetime(random.randint(0, 400))}],
+        )
+    pull_requests_numbers = range(1000, 1000 + org.pull_requests_number)
+    server.add_route(f'{repo_url}/pulls', [
+        {'number': n, 'updated_at': iso_datetime(random.randint(0, 30))}
+        for n in pull_requests_numbers
+    ])
+    for pr_number in pull_requests_numbers:
+        add_pull_request_routes(server, repo_url, pr_number)
+
+
+def add_pull_request_routes(server: FakeApiServer, repo_url: str, pr_number: int) -> None:
+    commit_sha = f'sha{pr_number}'
+    server.add_route(f'{repo_url}/pulls/{pr_number}', {'number': pr_number})
+    server.add_route(f'{repo_url}/pulls/{pr_number}/commits', [{'sha': commit_sha}])
+    server.add_route(f'{repo_url}/commits/{commit_sha}/statuses', [{'state': 'success'}])
+    server.add_route(f'{repo_url}/commits/{commit_sha}/reviews', [
+        {'state': 'APPROVED', 'submitted_at': iso_datetime(random.randint(0, 30))},
+    ])
+    server.add_route(f'{repo_url}/pulls/{pr_number}/comments', [
+        {'updated_at': iso_datetime(random.randint(0, 30))},
+    ])
+
+
+def add_travis_routes(
+    server: FakeApiServer,
+    org: SyntheticOrg,
+    repo_name: str,
+    repo_index: int,
+) -> None:
+    travis_repo_url = f'/repo/{org.owner}%2F{repo_name}'
+    jobs_ids = [repo_index * org.jobs_per_build + n for n in range(org.jobs_per_build)]
+    server.add_route(f'{travis_repo_url}/builds', {'builds': [
+        {'state': 'passed', 'jobs': [{'id': job_id} for job_id in jobs_ids]},
+    ]})
+    server.add_route(f'{travis_repo_url}/crons', {'crons': [{'interval': 'weekly'}]})
+    for job_id in jobs_ids:
+        server.add_route(f'/job/{job_id}/log.txt', generate_build_log(org.log_lines_number))
+
+
+def add_code_climate_routes(server: FakeApiServer, org: SyntheticOrg, repo_name: str) -> None:
+    repo_id = f'cc-{repo_name}'
+    server.add_route(f'/v1/repos?github_slug={org.owner}/{repo_name}', {'data': [
+        {'id': repo_id, 'attributes': {'badge_token': f'token-{repo_name}'}},
+    ]})
+    server.add_route(f'/v1/repos/{repo_id}/test_reports', {'data': [
+        {'attributes': {'covered_percent': random.randint(50, 100)}},
+    ]})
+
+
+def generate_readme(repo_name: str) -> str:
+    return '\n\n'.join([
+        f'# {repo_name}',
+        'Synthetic repo for benchmarks.',
+        '## Installation\n\n```terminal\npip install synthetic\n```',
+        '## Usage\n\nRun it.',
+        '## Contributing\n\nSend pull requests.',
+    ])
+
+
+def generate_build_log(lines_number: int) -> str:
+    """Generates log with commands spread evenly among lines of their output."""
+    output_lines_per_command = max(lines_number // len(BUILD_COMMANDS) - 1, 0)
+    lines: List[str] = []
+    for command in BUILD_COMMANDS:
+        lines.append(f'\x1b[0K$ {command}')
+        lines.extend(
+            f'{command.split()[0]}: processed file_{n}.py in {random.random():.3f}s'
+            for n in range(output_lines_per_command)
+        )
+    lines.append('Done. Your build exited with 0.')
+    return '\n'.join(lines)
+
+
+def generate_commit(days_ago: int) -> Dict[str, Any]:
+    return {'sha': f'commit{days_ago}', 'commit': {'committer': {'date': iso_datetime(days_ago)}}}
+
+
+def iso_datetime(days_ago: int) -> str:
+    moment = datetime.datetime.utcnow() - datetime.timedelta(days=days_ago)
+    return f'{moment.isoformat(timespec="seconds")}Z'
@@ -1,7 +1,8 @@
 from typing import Optional, NamedTuple, Any, Mapping
 
 import deal
-from requests import get
+
+from opensource_watchman.api.transport import get
 
 
 class CodeClimateAPI(NamedTuple):
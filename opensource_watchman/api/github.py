@@ -1,8 +1,19 @@
-from typing import Optional, Any, Mapping, NamedTuple, List
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Any, Mapping, NamedTuple, List, Iterator
 
-from requests import get
+from requests import Response
 from requests.auth import HTTPBasicAuth
 
+from opensource_watchman.api.transport import get
+from opensource_watchman.config import GITHUB_API_PAGE_SIZE, GITHUB_PAGES_PREFETCH_JOBS
+from opensource_watchman.tracing import in_current_context
+
+
+_pages_prefetch_executor = ThreadPoolExecutor(
+    max_workers=GITHUB_PAGES_PREFETCH_JOBS,
+    thread_name_prefix='github_pages_prefetch',
+)
+
 
 class GithubRepoAPI(NamedTuple):
     owner: str
@@ -10,8 +21,14 @@ class GithubRepoAPI(NamedTuple):
     github_login: str
     github_api_token: str
 
+    def iterate_repos_list(self) -> Iterator[Mapping[str, Any]]:
+        return self._iterate_github_pages(
+            relative_url=f'/users/{self.owner}/repos',
+            params={'sort': 'updated', 'direction': 'desc'},
+        )
+
     def fetch_repos_list(self) -> Optional[List[Mapping[str, Any]]]:
-        return self._fetch_data_from_github(relative_url=f'/users/{self.owner}/repos')
+        return list(self.iterate_repos_list())
 
     def fetch_file_contents(self, file_path: str) -> Optional[str]:
         file_url = (
@@ -23,12 +40,30 @@ class GithubRepoAPI(NamedTuple):
     def fetch_repo_info(self) -> Mapping[str, Any]:
         return self._fetch_data_from_github_repo(relative_url='')
 
-    def fetch_commits(self, pull_request_number: int = None):
+    def fetch_last_commit(self) -> Optional[Mapping[str, Any]]:
+        commits = self._fetch_data_from_github_repo(relative_url='/commits', params={'per_page': 1})
+        return commits[0] if commits else None
+
+    def fetch_last_updated_issue(self) -> Optional[Mapping[str, Any]]:
+        """Issue or pull request of any state, that was updated (commented, closed, etc) last."""
+        issues = self._fetch_data_from_github_repo(
+            relative_url='/issues',
+            params={'state': 'all', 'sort': 'updated', 'direction': 'desc', 'per_page': 1},
+        )
+        return issues[0] if issues else None
+
+    def iterate_commits(
+        self,
+        pull_request_number: Optional[int] = None,
+    ) -> Iterator[Mapping[str, Any]]:
         if pull_request_number:
-            return self._fetch_data_from_github_repo(
+            return self._iterate_github_repo_pages(
                 relative_url=f'/pulls/{pull_request_number}/commits',
-            ) or []
-        return self._fetch_data_from_github_repo(relative_url='/commits')
+            )
+        return self._iterate_github_repo_pages(relative_url='/commits')
+
+    def fetch_commits(self, pull_request_number: Optional[int] = None):
+        return list(self.iterate_commits(pull_request_number))
 
     def fetch_commit_status(self, commit_sha: str):
         return self._fetch_data_from_github_repo(relative_url=f'/commits/{commit_sha}/statuses')
@@ -36,31 +71,97 @@ class GithubRepoAPI(NamedTuple):
     def fetch_commit_reviews(self, commit_sha: str):
         return self._fetch_data_from_github_repo(relative_url=f'/commits/{commit_sha}/reviews')
 
+    def iterate_open_issues(self) -> Iterator[Mapping[str, Any]]:
+        return self._iterate_github_repo_pages(relative_url='/issues')
+
     def fetch_open_issues(self) -> List[Mapping[str, Any]]:
-        return self._fetch_data_from_github_repo(relative_url='/issues') or []
+        return list(self.iterate_open_issues())
+
+    def iterate_issue_comments(self, issue_number: int) -> Iterator[Mapping[str, Any]]:
+        return self._iterate_github_repo_pages(relative_url=f'/issues/{issue_number}/comments')
 
     def fetch_issue_comments(self, issue_number: int):
-        return self._fetch_data_from_github_repo(
-            relative_url=f'/issues/{issue_number}/comments',
-        ) or []
+        return list(self.iterate_issue_comments(issue_number))
+
+    def iterate_open_pull_requests(self) -> Iterator[Mapping[str, Any]]:
+        return self._iterate_github_repo_pages(relative_url='/pulls')
 
     def fetch_open_pull_requests(self) -> List[Mapping[str, Any]]:
-        return self._fetch_data_from_github_repo(relative_url='/pulls') or []
+        return list(self.iterate_open_pull_requests())
 
     def fetch_pull_request(self, pr_number: int):
         return self._fetch_data_from_github_repo(relative_url=f'/pulls/{pr_number}')
 
-    def fetch_pull_request_comments(self, pr_number: int):
-        return self._fetch_data_from_github_repo(relative_url=f'/pulls/{pr_number}/comments')
+    def iterate_pull_request_comments(self, pr_number: int) -> Iterator[Mapping[str, Any]]:
+        return self._iterate_github_repo_pages(relative_url=f'/pulls/{pr_number}/comments')
 
-    def _fetch_data_from_github(self, relative_url: str):
-        raw_response = get(
-            f'https://api.github.com{relative_url}',
+    def fetch_pull_request_comments(self, pr_number: int) -> List[Mapping[str, Any]]:
+        return list(self.iterate_pull_request_comments(pr_number))
+
+    def _fetch_response_from_github(
+        self,
+        url: str,
+        params: Optional[Mapping[str, Any]] = None,
+    ) -> Response:
+        return get(
+            url,
+            params=params,
             auth=HTTPBasicAuth(self.github_login, self.github_api_token),
         )
+
+    def _fetch_data_from_github(
+        self,
+        relative_url: str,
+        params: Optional[Mapping[str, Any]] = None,
+    ):
+        raw_response = self._fetch_response_from_github(
+            f'https://api.github.com{relative_url}',
+            params=params,
+        )
         return raw_response.json() if raw_response else None
 
-    def _fetch_data_from_github_repo(self, relative_url: str):
+    def _fetch_data_from_github_repo(
+        self,
+        relative_url: str,
+        params: Optional[Mapping[str, Any]] = None,
+    ):
         return self._fetch_data_from_github(
             relative_url=f'/repos/{self.owner}/{self.repo_name}{relative_url}',
+            params=params,
+        )
+
+    def _iterate_github_pages(
+        self,
+        relative_url: str,
+        params: Optional[Mapping[str, Any]] = None,
+    ) -> Iterator[Mapping[str, Any]]:
+        """
+        Yields items from all pages of GitHub listing, following Link headers.
+
+        Next page is requested in background as soon as consumer takes the second
+        item of current page, so consumers, that need only first item, cost one call.
+        Listing without first page is empty, but failed next page raises HTTPError:
+        checks should not run on partial listing.
+        """
+        response = self._fetch_response_from_github(
+            f'https://api.github.com{relative_url}',
+            params={'per_page': GITHUB_API_PAGE_SIZE, **(params or {})},
+        )
+        fetch_response = in_current_context(self._fetch_response_from_github)
+        while response:
+            next_page_url = response.links.get('next', {}).get('url')
+            next_page: Optional[Future] = None
+            for item in response.json():
+                yield item
+                if next_page_url and next_page is None:
+                    next_page = _pages_prefetch_executor.submit(fetch_response, next_page_url)
+            if next_page_url is None:
+                break
+            next_page = next_page or _pages_prefetch_executor.submit(fetch_response, next_page_url)
+            response = next_page.result()
+            response.raise_for_status()
+
+    def _iterate_github_repo_pages(self, relative_url: str) -> Iterator[Mapping[str, Any]]:
+        return self._iterate_github_pages(
+            relative_url=f'/repos/{self.owner}/{self.repo_name}{relative_url}',
         )
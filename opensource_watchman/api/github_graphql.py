@@ -0,0 +1,158 @@
+from typing import Any, Iterator, Mapping, NamedTuple
+
+from requests import RequestException
+
+from opensource_watchman.api.transport import post
+
+
+# Items are ordered as REST listings order them: newest first. Nested connections,
+# that have next page, are completed with NODE_CONNECTION_QUERY.
+OPEN_ISSUES_QUERY = '''
+query($owner: String!, $name: String!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    items: issues(
+      states: OPEN, first: 100, after: $cursor, orderBy: {field: CREATED_AT, direction: DESC}
+    ) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        __typename
+        id
+        number
+        updatedAt
+        comments(first: 100) { totalCount pageInfo { hasNextPage endCursor } nodes { updatedAt } }
+      }
+    }
+  }
+}
+'''
+
+# Pull requests are issues for REST, so their comments are fetched as well. Page
+# of pull requests is small to keep query within limit of 500 000 nodes.
+OPEN_PULL_REQUESTS_QUERY = '''
+query($owner: String!, $name: String!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    items: pullRequests(
+      states: OPEN, first: 20, after: $cursor, orderBy: {field: CREATED_AT, direction: DESC}
+    ) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        __typename
+        id
+        number
+        updatedAt
+        comments(first: 100) { totalCount pageInfo { hasNextPage endCursor } nodes { updatedAt } }
+        commits(last: 1) { nodes { commit { oid status { contexts { state createdAt } } } } }
+        reviews(first: 100) {
+          pageInfo { hasNextPage endCursor }
+          nodes { state submittedAt commit { oid } }
+        }
+        reviewThreads(first: 100) {
+          pageInfo { hasNextPage endCursor }
+          nodes {
+            __typename
+            id
+            comments(first: 100) { pageInfo { hasNextPage endCursor } nodes { updatedAt } }
+          }
+        }
+      }
+    }
+  }
+}
+'''
+
+NODE_CONNECTION_QUERY = '''
+query($id: ID!, $cursor: String) {
+  node(id: $id) {
+    ... on %s {
+      items: %s(first: 100, after: $cursor) {
+        pageInfo { hasNextPage endCursor }
+        nodes { %s }
+      }
+    }
+  }
+}
+'''
+
+# Connections of each node type, that are fetched completely, and fields of their nodes.
+NESTED_CONNECTIONS_FIELDS = {
+    'Issue': {'comments': 'updatedAt'},
+    'PullRequest': {
+        'comments': 'updatedAt',
+        'reviews': 'state submittedAt commit { oid }',
+        'reviewThreads': (
+            '__typename id '
+            'comments(first: 100) { pageInfo { hasNextPage endCursor } nodes { updatedAt } }'
+        ),
+    },
+    'PullRequestReviewThread': {'comments': 'updatedAt'},
+}
+
+
+class GraphQLError(RequestException):
+    """Raised when GraphQL query has errors (rate limits, not found, etc) instead of data."""
+
+
+class GithubGraphQLAPI(NamedTuple):
+    owner: str
+    repo_name: str
+    github_login: str
+    github_api_token: str
+
+    def iterate_open_issues(self) -> Iterator[Mapping[str, Any]]:
+        return self._iterate_repository_items(OPEN_ISSUES_QUERY)
+
+    def iterate_open_pull_requests(self) -> Iterator[Mapping[str, Any]]:
+        return self._iterate_repository_items(OPEN_PULL_REQUESTS_QUERY)
+
+    def _iterate_repository_items(self, query: str) -> Iterator[Mapping[str, Any]]:
+        cursor = None
+        while True:
+            data = self._execute_query(
+                query,
+                {'owner': self.owner, 'name': self.repo_name, 'cursor': cursor},
+            )
+            if data.get('repository') is None:
+                raise GraphQLError(f'Repository {self.owner}/{self.repo_name} not found')
+            items = data['repository']['items']
+            for item in items['nodes']:
+                yield self._complete_nested_connections(item)
+            if not items['pageInfo']['hasNextPage']:
+                return
+            cursor = items['pageInfo']['endCursor']
+
+    def _complete_nested_connections(self, node: Mapping[str, Any]) -> Mapping[str, Any]:
+        """Fetches rest of pages of node connections, so it has all their nodes, as REST does."""
+        node_type = node.get('__typename', '')
+        for connection_name, nodes_fields in NESTED_CONNECTIONS_FIELDS.get(node_type, {}).items():
+            connection = node[connection_name]
+            while connection['pageInfo']['hasNextPage']:
+                next_page = self._execute_query(
+                    NODE_CONNECTION_QUERY % (node_type, connection_name, nodes_fields),
+                    {'id': node['id'], 'cursor': connection['pageInfo']['endCursor']},
+                )['node']['items']
+                connection['nodes'].extend(next_page['nodes'])
+                connection['pageInfo'] = next_page['pageInfo']
+            for connection_node in connection['nodes']:
+                self._complete_nested_connections(connection_node)
+        return node
+
+    def _execute_query(self, query: str, variables: Mapping[str, Any]) -> Mapping[str, Any]:
+        """
+        Returns data of query, raises on errors.
+
+        GraphQL reports errors (rate limits, not found, partial failures) with status 200,
+        and data with errors may be incomplete: checks should not run on it.
+        """
+        raw_response = post(
+            'https://api.github.com/graphql',
+            json={'query': query, 'variables': variables},
+            headers={'Authorization': f'bearer {self.github_api_token}'},
+        )
+        raw_response.raise_for_status()
+        response_payload = raw_response.json()
+        if response_payload.get('errors') or response_payload.get('data') is None:
+            raise GraphQLError(
+                f'GraphQL query failed: {response_payload.get("errors")}',
+                response=raw_response,
+            )
+        return response_payload['data']
@@ -0,0 +1,29 @@
+from typing import Any, Mapping
+from urllib.parse import urlparse
+
+from requests import Response
+
+from opensource_watchman.api.transport import SendCallable, TransportLayer
+
+
+class HostOverrides(TransportLayer):
+    """
+    Sends requests to given hosts to other base urls, e.g. to local fake api server.
+
+    Should be the last layer, so rest of layers treat requests by their original hosts.
+    """
+
+    def __init__(self, base_urls: Mapping[str, str]) -> None:
+        self.base_urls = dict(base_urls)
+
+    def is_applicable(self, method: str, url: str, request_kwargs: Mapping[str, Any]) -> bool:
+        return urlparse(url).hostname in self.base_urls
+
+    def send(self, send: SendCallable, method: str, url: str, **kwargs: Any) -> Response:
+        parsed_url = urlparse(url)
+        origin = f'{parsed_url.scheme}://{parsed_url.netloc}'
+        return send(
+            method,
+            f'{self.base_urls[str(parsed_url.hostname)]}{url[len(origin):]}',
+            **kwargs,
+        )
@@ -0,0 +1,81 @@
+import base64
+from collections import Counter
+from typing import Any, Iterable, Mapping, Optional
+from urllib.parse import urlencode, urlparse
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+from opensource_watchman.api.transport import build_response, SendCallable, TransportLayer
+from opensource_watchman.config import CONDITIONAL_CACHE_HOSTS
+from opensource_watchman.utils.storage import SqliteStore
+
+
+class ConditionalRequestsCache(TransportLayer):
+    """
+    Persistent cache of response bodies, revalidated with ETag / Last-Modified.
+
+    Each request is sent with If-None-Match / If-Modified-Since headers of stored
+    response, on 304 stored body is served.
+    """
+
+    def __init__(self, store: SqliteStore, hosts: Iterable[str] = CONDITIONAL_CACHE_HOSTS) -> None:
+        self.store = store
+        self.hosts = set(hosts)
+        self.counters: Counter = Counter()
+
+    def is_applicable(self, method: str, url: str, request_kwargs: Mapping[str, Any]) -> bool:
+        return (
+            method == 'GET'
+            and urlparse(url).hostname in self.hosts
+            and not request_kwargs.get('stream')
+        )
+
+    def send(self, send: SendCallable, method: str, url: str, **kwargs: Any) -> Response:
+        cache_key = get_cache_key(url, kwargs.get('params'))
+        cached_response = self.store.get(cache_key)
+        cached_headers = CaseInsensitiveDict(cached_response['headers'] if cached_response else {})
+        headers = {**(kwargs.pop('headers', None) or {}), **get_validation_headers(cached_headers)}
+        response = send(method, url, headers=headers, **kwargs)
+        if cached_response and response.status_code == 304:
+            self.counters['hit'] += 1
+            return build_response(
+                url=response.url,
+                status_code=200,
+                headers=cached_headers,
+                content=base64.b64decode(cached_response['content']),
+            )
+        self.counters['revalidate' if cached_response else 'miss'] += 1
+        if response.status_code == 200 and get_validation_headers(response.headers):
+            self.store.set(cache_key, {
+                'headers': dict(response.headers),
+                'content': base64.b64encode(response.content).decode(),
+            })
+        return response
+
+    def stat(self) -> Mapping[str, Any]:
+        requests_sent = sum(self.counters.values())
+        return {
+            'conditional_cache_hits': self.counters['hit'],
+            'conditional_cache_revalidations': self.counters['revalidate'],
+            'conditional_cache_misses': self.counters['miss'],
+            'conditional_cache_hit_ratio': round(
+                self.counters['hit'] / requests_sent if requests_sent else 0,
+                2,
+            ),
+        }
+
+
+def get_cache_key(url: str, params: Optional[Mapping[str, Any]]) -> str:
+    return f'{url}?{urlencode(sorted(params.items()))}' if params else url
+
+
+def get_validation_headers(response_headers: Mapping[str, str]) -> Mapping[str, str]:
+    validation_headers = {}
+    for header_name, validation_header_name in [
+        ('ETag', 'If-None-Match'),
+        ('Last-Modified', 'If-Modified-Since'),
+    ]:
+        if response_headers.get(header_name):
+            validation_headers[validation_header_name] = response_headers[header_name]
+    return validation_headers
@@ -0,0 +1,44 @@
+import time
+from typing import Any, Callable
+from urllib.parse import urlparse
+
+from requests import Response
+
+from opensource_watchman.api.transport import SendCallable, TransportLayer
+from opensource_watchman.metrics import Metrics
+
+
+class HttpMetrics(TransportLayer):
+    """
+    Records count, status, latency and response size of requests to each host.
+
+    Should be the last layer, so every attempt, that reaches network, is recorded.
+    Size of streamed responses is taken from Content-Length header.
+    """
+
+    def __init__(self, metrics: Metrics, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.metrics = metrics
+        self.clock = clock
+
+    def send(self, send: SendCallable, method: str, url: str, **kwargs: Any) -> Response:
+        host = str(urlparse(url).hostname)
+        started_at = self.clock()
+        try:
+            response = send(method, url, **kwargs)
+        except Exception:  # noqa: B902
+            self.metrics.observe_request(host, 'error', self.clock() - started_at, 0)
+            raise
+        self.metrics.observe_request(
+            host,
+            str(response.status_code),
+            self.clock() - started_at,
+            get_response_size(response, is_streamed=bool(kwargs.get('stream'))),
+        )
+        return response
+
+
+def get_response_size(response: Response, is_streamed: bool) -> int:
+    if not is_streamed:
+        return len(response.content or b'')
+    content_length = response.headers.get('Content-Length', '')
+    return int(content_length) if content_length.isdigit() else 0
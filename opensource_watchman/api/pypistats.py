@@ -1,8 +1,13 @@
 from typing import Mapping, Optional
 
-from requests import get
+from opensource_watchman.api.transport import get
 
 
 def get_pypi_downloads_stat(pypi_project_name: str) -> Optional[Mapping[str, int]]:
     response = get(f'https://pypistats.org/api/packages/{pypi_project_name}/recent')
     return response.json().get('data', []) if response else None
+
+
+def get_pypi_latest_version(pypi_project_name: str) -> Optional[str]:
+    response = get(f'https://pypi.org/pypi/{pypi_project_name}/json')
+    return response.json().get('info', {}).get('version') if response else None
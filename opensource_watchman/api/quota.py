@@ -0,0 +1,40 @@
+import time
+from typing import Any, Callable
+from urllib.parse import urlparse
+
+from requests import Response
+
+from opensource_watchman.api.metrics import get_response_size
+from opensource_watchman.api.transport import SendCallable, TransportLayer
+from opensource_watchman.quota import QuotaUsage
+from opensource_watchman.tracing import get_enclosing_spans
+
+
+class QuotaAccounting(TransportLayer):
+    """
+    Records every request, that reaches network, with pipeline node, that caused it.
+
+    Node is taken from enclosing spans, so requests made in helper threads of
+    node are attributed to the node too. Should be the last layer.
+    """
+
+    def __init__(
+        self,
+        quota_usage: QuotaUsage,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        self.quota_usage = quota_usage
+        self.clock = clock
+
+    def send(self, send: SendCallable, method: str, url: str, **kwargs: Any) -> Response:
+        enclosing_spans = get_enclosing_spans()
+        started_at = self.clock()
+        response = send(method, url, **kwargs)
+        self.quota_usage.observe_request(
+            (enclosing_spans.get('pipeline'), enclosing_spans.get('node')),
+            str(urlparse(url).hostname),
+            response.status_code,
+            get_response_size(response, is_streamed=bool(kwargs.get('stream'))),
+            self.clock() - started_at,
+        )
+        return response
@@ -0,0 +1,206 @@
+import copy
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+from urllib.parse import urlparse
+
+from requests import RequestException, Response
+from requests.auth import HTTPBasicAuth
+
+from opensource_watchman.api.transport import SendCallable, TransportLayer
+from opensource_watchman.config import (
+    GITHUB_API_HOSTS, GITHUB_MAX_CONCURRENT_REQUESTS, GITHUB_MUTATING_REQUEST_POINTS,
+    GITHUB_RATE_LIMIT_MAX_ATTEMPTS, GITHUB_RATE_LIMIT_RESET_MARGIN_SECONDS,
+    GITHUB_SECONDARY_RATE_LIMIT_POINTS_PER_MINUTE, GITHUB_SECONDARY_RATE_LIMIT_WAIT_SECONDS,
+)
+
+
+class RateLimitExceeded(RequestException):
+    """Raised when request still hits rate limit after all attempts."""
+
+
+class TokenQuota:
+    def __init__(self) -> None:
+        self.remaining: Optional[int] = None
+        self.reset_at: float = 0
+
+    def is_exhausted(self, now: float) -> bool:
+        return self.remaining is not None and self.remaining <= 0 and now < self.reset_at
+
+
+class GithubRateLimiter(TransportLayer):
+    """
+    Schedules GitHub api requests within rate limits of a pool of tokens.
+
+    Each request is sent with the token with most of remaining quota of request
+    resource (core, search, graphql), quota is tracked with X-RateLimit-* headers.
+    When all tokens are exhausted, requests wait exactly until the earliest reset;
+    Retry-After is respected, secondary limit without it is waited for a minute.
+
+    Secondary limits are per minute budgets of points, separate for REST and GraphQL:
+    requests of each api are paced evenly within its budget (GET costs one point,
+    REST mutating request costs more), and concurrency of requests is limited.
+    Budgets are shared by all tokens, since tokens may belong to the same user.
+    """
+
+    def __init__(  # noqa: CFQ002
+        self,
+        tokens: Iterable[str],
+        hosts: Iterable[str] = GITHUB_API_HOSTS,
+        max_concurrent_requests: int = GITHUB_MAX_CONCURRENT_REQUESTS,
+        points_per_minute: Mapping[str, int] = GITHUB_SECONDARY_RATE_LIMIT_POINTS_PER_MINUTE,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], Any] = time.sleep,
+    ) -> None:
+        self.tokens = list(tokens)
+        self.quotas: Dict[Tuple[str, str], TokenQuota] = defaultdict(TokenQuota)
+        self.hosts = set(hosts)
+        self.points_per_minute = dict(points_per_minute)
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._concurrency = threading.BoundedSemaphore(max_concurrent_requests)
+        self._next_request_at: Dict[str, float] = {}
+        self.counters: Counter = Counter()
+        self.wait_seconds: float = 0
+
+    def is_applicable(self, method: str, url: str, request_kwargs: Mapping[str, Any]) -> bool:
+        return urlparse(url).hostname in self.hosts
+
+    def send(self, send: SendCallable, method: str, url: str, **kwargs: Any) -> Response:
+        for _ in range(GITHUB_RATE_LIMIT_MAX_ATTEMPTS):
+            token = self._acquire_token(method, url)
+            with self._concurrency:
+                response = send(method, url, **with_token(kwargs, token))
+            wait_seconds = self._process_response(token, url, response)
+            if wait_seconds is None:
+                return response
+            self._wait(wait_seconds)
+        raise RateLimitExceeded(f'Rate limit exceeded for {url}', response=response)
+
+    def stat(self) -> Mapping[str, Any]:
+        return {
+            'rate_limit_waits': self.counters['waits'],
+            'rate_limit_wait_seconds': round(self.wait_seconds, 3),
+            'rate_limited_responses': self.counters['limited_responses'],
+        }
+
+    def _acquire_token(self, method: str, url: str) -> Optional[str]:
+        while True:
+            with self._lock:
+                now = self.clock()
+                token, wait_seconds = self._choose_token(get_rate_limit_resource(url), now)
+                if wait_seconds <= 0:
+                    pace_seconds = self._schedule_request(method, url, now)
+                    break
+            self._wait(wait_seconds)
+        if pace_seconds:
+            self.sleep(pace_seconds)
+        return token
+
+    def _schedule_request(self, method: str, url: str, now: float) -> float:
+        """Reserves time slot of request in its api budget, returns seconds to wait for it."""
+        api, points = get_secondary_rate_limit_cost(method, url)
+        if api not in self.points_per_minute:
+            return 0
+        next_request_at = max(now, self._next_request_at.get(api, 0))
+        self._next_request_at[api] = next_request_at + points * 60 / self.points_per_minute[api]
+        return next_request_at - now
+
+    def _choose_token(self, resource: str, now: float) -> Tuple[Optional[str], float]:
+        if not self.tokens:
+            return None, 0
+        quotas = {t: self.quotas[(t, resource)] for t in self.tokens}
+        available_tokens = [t for t, q in quotas.items() if not q.is_exhausted(now)]
+        if not available_tokens:
+            earliest_reset_at = min(q.reset_at for q in quotas.values())
+            return None, earliest_reset_at - now + GITHUB_RATE_LIMIT_RESET_MARGIN_SECONDS
+        return max(available_tokens, key=lambda t: get_remaining_quota(quotas[t])), 0
+
+    def _process_response(
+        self,
+        token: Optional[str],
+        url: str,
+        response: Response,
+    ) -> Optional[float]:
+        """Updates token quota, returns seconds to wait before retry if request was limited."""
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset_at = response.headers.get('X-RateLimit-Reset')
+        if token is not None and remaining is not None and reset_at is not None:
+            resource = response.headers.get('X-RateLimit-Resource') or get_rate_limit_resource(url)
+            with self._lock:
+                self.quotas[(token, resource)].remaining = int(remaining)
+                self.quotas[(token, resource)].reset_at = float(reset_at)
+        if response.status_code not in {403, 429}:
+            return None
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is not None or remaining == '0':
+            wait_seconds = float(retry_after or 0)
+        elif is_secondary_rate_limit_response(response):
+            wait_seconds = GITHUB_SECONDARY_RATE_LIMIT_WAIT_SECONDS
+        else:
+            return None
+        self.counters['limited_responses'] += 1
+        return wait_seconds
+
+    def _wait(self, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        with self._lock:
+            self.counters['waits'] += 1
+            self.wait_seconds += seconds
+        self.sleep(seconds)
+
+
+def get_rate_limit_resource(url: str) -> str:
+    """Returns resource of primary rate limit, that request spends, as X-RateLimit-Resource."""
+    path = urlparse(url).path
+    if path == '/graphql':
+        return 'graphql'
+    if path == '/search/code':
+        return 'code_search'
+    if path.startswith('/search/'):
+        return 'search'
+    return 'core'
+
+
+def is_secondary_rate_limit_response(response: Response) -> bool:
+    return response.status_code == 429 or 'secondary rate limit' in response.text.lower()
+
+
+def get_secondary_rate_limit_cost(method: str, url: str) -> Tuple[str, int]:
+    """Returns api, which secondary limit budget request spends, and its points."""
+    if urlparse(url).path == '/graphql':
+        return 'graphql', 1
+    if method in {'GET', 'HEAD', 'OPTIONS'}:
+        return 'rest', 1
+    return 'rest', GITHUB_MUTATING_REQUEST_POINTS
+
+
+def get_remaining_quota(quota: TokenQuota) -> float:
+    return float('inf') if quota.remaining is None else quota.remaining
+
+
+def with_token(request_kwargs: Mapping[str, Any], token: Optional[str]) -> Dict[str, Any]:
+    """Replaces token of request basic auth or bearer Authorization header."""
+    kwargs = dict(request_kwargs)
+    if token is None:
+        return kwargs
+    auth = kwargs.get('auth')
+    if isinstance(auth, HTTPBasicAuth):
+        kwargs['auth'] = copy.copy(auth)
+        kwargs['auth'].password = token
+    headers = dict(kwargs.get('headers') or {})
+    if headers.get('Authorization', '').lower().startswith('bearer '):
+        headers['Authorization'] = f'bearer {token}'
+        kwargs['headers'] = headers
+    return kwargs
+
+
+def get_github_api_tokens(
+    tokens_list: Optional[str],
+    default_token: str,
+) -> List[str]:
+    tokens = [t.strip() for t in (tokens_list or '').split(',') if t.strip()]
+    return tokens or [default_token]
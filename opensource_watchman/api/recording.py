@@ -0,0 +1,82 @@
+import base64
+import json
+import os
+import zlib
+from collections import Counter
+from typing import Any, Mapping
+
+from requests import RequestException, Response
+
+from opensource_watchman.api.transport import build_response, SendCallable, TransportLayer
+from opensource_watchman.config import HTTP_ARCHIVE_FILE_NAME
+from opensource_watchman.utils.storage import SqliteStore
+
+
+class NotRecorded(RequestException):
+    """Raised on replay of request, that is absent in archive."""
+
+
+class HttpRecorder(TransportLayer):
+    """Writes every response, that api wrappers get, to archive."""
+
+    def __init__(self, archive: SqliteStore) -> None:
+        self.archive = archive
+        self.recorded_responses = 0
+
+    def send(self, send: SendCallable, method: str, url: str, **kwargs: Any) -> Response:
+        response = send(method, url, **kwargs)
+        self.archive.set(get_archive_key(method, url, kwargs), {
+            'status_code': response.status_code,
+            'headers': dict(response.headers),
+            'content': base64.b64encode(zlib.compress(response.content)).decode(),
+        })
+        self.recorded_responses += 1
+        return response
+
+    def stat(self) -> Mapping[str, Any]:
+        return {'recorded_responses': self.recorded_responses}
+
+
+class HttpReplayer(TransportLayer):
+    """Serves responses from archive, recorded by HttpRecorder, without network."""
+
+    def __init__(self, archive: SqliteStore) -> None:
+        self.archive = archive
+        self.counters: Counter = Counter()
+
+    def send(self, send: SendCallable, method: str, url: str, **kwargs: Any) -> Response:
+        recorded_response = self.archive.get(get_archive_key(method, url, kwargs))
+        if recorded_response is None:
+            self.counters['miss'] += 1
+            raise NotRecorded(f'{method} {url} is not recorded')
+        self.counters['hit'] += 1
+        return build_response(
+            url=url,
+            status_code=recorded_response['status_code'],
+            headers=recorded_response['headers'],
+            content=zlib.decompress(base64.b64decode(recorded_response['content'])),
+        )
+
+    def stat(self) -> Mapping[str, Any]:
+        return {
+            'replayed_responses': self.counters['hit'],
+            'not_recorded_requests': self.counters['miss'],
+        }
+
+
+def get_http_archive(archive_dir: str) -> SqliteStore:
+    os.makedirs(archive_dir, exist_ok=True)
+    return SqliteStore(os.path.join(archive_dir, HTTP_ARCHIVE_FILE_NAME), 'responses')
+
+
+def get_archive_key(method: str, url: str, request_kwargs: Mapping[str, Any]) -> str:
+    """Identifies request by what is requested, credentials are not part of the key."""
+    return json.dumps(
+        [
+            method,
+            url,
+            sorted((request_kwargs.get('params') or {}).items()),
+            request_kwargs.get('json'),
+        ],
+        default=str,
+    )
@@ -0,0 +1,142 @@
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional
+from urllib.parse import urlparse
+
+from requests import ConnectionError, RequestException, Response, Timeout
+
+from opensource_watchman.api.transport import SendCallable, TransportLayer
+from opensource_watchman.config import (
+    HTTP_POOL_SIZES, HTTP_RETRIES, HTTP_RETRY_BACKOFF_BASE_SECONDS,
+    HTTP_RETRY_BACKOFF_MAX_SECONDS, HTTP_RETRY_STATUSES,
+    CIRCUIT_BREAKER_FAILURES_THRESHOLD, CIRCUIT_BREAKER_RESET_SECONDS,
+)
+
+
+class HostUnavailable(RequestException):
+    """Raised when host fails after all retries or its circuit breaker is open."""
+
+
+class RetryWithBackoff(TransportLayer):
+    """
+    Retries idempotent GET requests, that failed with connection error or 5xx.
+
+    Delays between attempts grow exponentially and are fully jittered,
+    so concurrent requests to recovering host do not come in bursts.
+    """
+
+    def __init__(  # noqa: CFQ002
+        self,
+        retries: int = HTTP_RETRIES,
+        hosts: Iterable[str] = tuple(HTTP_POOL_SIZES),
+        backoff_base_seconds: float = HTTP_RETRY_BACKOFF_BASE_SECONDS,
+        backoff_max_seconds: float = HTTP_RETRY_BACKOFF_MAX_SECONDS,
+        sleep: Callable[[float], Any] = time.sleep,
+    ) -> None:
+        self.retries = retries
+        self.hosts = set(hosts)
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.sleep = sleep
+        self.counters: Counter = Counter()
+
+    def is_applicable(self, method: str, url: str, request_kwargs: Mapping[str, Any]) -> bool:
+        return method == 'GET' and urlparse(url).hostname in self.hosts
+
+    def send(self, send: SendCallable, method: str, url: str, **kwargs: Any) -> Response:
+        for attempt in range(self.retries):
+            try:
+                response = send(method, url, **kwargs)
+            except (ConnectionError, Timeout):
+                pass
+            else:
+                if response.status_code not in HTTP_RETRY_STATUSES:
+                    return response
+            self.counters['retries'] += 1
+            self.sleep(random.uniform(0, min(  # noqa: S311
+                self.backoff_max_seconds,
+                self.backoff_base_seconds * 2 ** attempt,
+            )))
+        return send(method, url, **kwargs)
+
+    def stat(self) -> Mapping[str, Any]:
+        return {'http_retries': self.counters['retries']}
+
+
+class CircuitBreaker:
+    def __init__(self) -> None:
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+
+
+class CircuitBreakers(TransportLayer):
+    """
+    Stops sending requests to host after several consecutive failures.
+
+    Failure is a connection error or 5xx response, both are raised as
+    HostUnavailable, so data of the host is treated as unknown. While circuit
+    of host is open, its requests fail immediately; after reset timeout single
+    request is let through to probe the host.
+    """
+
+    def __init__(
+        self,
+        hosts: Iterable[str] = tuple(HTTP_POOL_SIZES),
+        failures_threshold: int = CIRCUIT_BREAKER_FAILURES_THRESHOLD,
+        reset_seconds: float = CIRCUIT_BREAKER_RESET_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.hosts = set(hosts)
+        self.failures_threshold = failures_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.breakers: Dict[str, CircuitBreaker] = {h: CircuitBreaker() for h in self.hosts}
+        self._lock = threading.Lock()
+        self.counters: Counter = Counter()
+
+    def is_applicable(self, method: str, url: str, request_kwargs: Mapping[str, Any]) -> bool:
+        return urlparse(url).hostname in self.hosts
+
+    def send(self, send: SendCallable, method: str, url: str, **kwargs: Any) -> Response:
+        host = str(urlparse(url).hostname)
+        self._check_circuit(host)
+        try:
+            response = send(method, url, **kwargs)
+        except (ConnectionError, Timeout) as exc:
+            self._register_failure(host)
+            raise HostUnavailable(f'{host} is unavailable') from exc
+        if response.status_code >= 500:
+            self._register_failure(host)
+            raise HostUnavailable(f'{host} responded with {response.status_code}')
+        with self._lock:
+            self.breakers[host].consecutive_failures = 0
+            self.breakers[host].opened_at = None
+        return response
+
+    def stat(self) -> Mapping[str, Any]:
+        return {
+            'circuit_breaker_trips': self.counters['trips'],
+            'circuit_breaker_rejected_requests': self.counters['rejected'],
+        }
+
+    def _check_circuit(self, host: str) -> None:
+        with self._lock:
+            breaker = self.breakers[host]
+            if breaker.opened_at is None:
+                return
+            if self.clock() - breaker.opened_at >= self.reset_seconds:
+                breaker.opened_at = self.clock()  # half-open: single probe request
+                return
+            self.counters['rejected'] += 1
+        raise HostUnavailable(f'Circuit of {host} is open')
+
+    def _register_failure(self, host: str) -> None:
+        with self._lock:
+            breaker = self.breakers[host]
+            breaker.consecutive_failures += 1
+            if breaker.consecutive_failures >= self.failures_threshold:
+                if breaker.opened_at is None:
+                    self.counters['trips'] += 1
+                breaker.opened_at = self.clock()
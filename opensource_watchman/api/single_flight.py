@@ -0,0 +1,88 @@
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Mapping, Optional
+
+from requests import Response
+from requests.auth import HTTPBasicAuth
+
+from opensource_watchman.api.transport import SendCallable, TransportLayer
+from opensource_watchman.config import SINGLE_FLIGHT_MAX_MEMOIZED_RESPONSES
+
+
+class SingleFlight(TransportLayer):
+    """
+    Merges concurrent identical GET requests into one and memoizes their responses.
+
+    Only the most recently used responses are memoized, so a run over large
+    organisation does not keep all its payloads in memory: duplicates mostly
+    come from the same repo, processed at the same time.
+    Failed (raised) requests are not memoized. Responses are shared by threads,
+    so their bodies are read before they are shared: lazy reads of one body would race.
+    """
+
+    def __init__(self, max_memoized_responses: int = SINGLE_FLIGHT_MAX_MEMOIZED_RESPONSES) -> None:
+        self.max_memoized_responses = max_memoized_responses
+        self._lock = threading.Lock()
+        self._calls_in_flight: Dict[str, Future] = {}
+        self._responses: 'OrderedDict[str, Response]' = OrderedDict()
+        self.duplicates_avoided = 0
+
+    def is_applicable(self, method: str, url: str, request_kwargs: Mapping[str, Any]) -> bool:
+        return method == 'GET' and not request_kwargs.get('stream')
+
+    def send(self, send: SendCallable, method: str, url: str, **kwargs: Any) -> Response:
+        request_key = get_request_key(url, kwargs)
+        with self._lock:
+            memoized_response = self._get_memoized_response(request_key)
+            if memoized_response is not None:
+                self.duplicates_avoided += 1
+                return memoized_response
+            call = self._calls_in_flight.get(request_key)
+            is_first_call = call is None
+            if call is None:
+                call = self._calls_in_flight[request_key] = Future()
+            else:
+                self.duplicates_avoided += 1
+        if is_first_call:
+            try:
+                response = send(method, url, **kwargs)
+                response.content  # noqa: WPS428
+            except Exception as exc:  # noqa: B902
+                with self._lock:
+                    self._calls_in_flight.pop(request_key)
+                call.set_exception(exc)
+            else:
+                with self._lock:
+                    self._calls_in_flight.pop(request_key)
+                    self._memoize_response(request_key, response)
+                call.set_result(response)
+        return call.result()
+
+    def stat(self) -> Mapping[str, Any]:
+        return {'duplicate_requests_avoided': self.duplicates_avoided}
+
+    def _get_memoized_response(self, request_key: str) -> Optional[Response]:
+        response = self._responses.get(request_key)
+        if response is not None:
+            self._responses.move_to_end(request_key)
+        return response
+
+    def _memoize_response(self, request_key: str, response: Response) -> None:
+        self._responses[request_key] = response
+        while len(self._responses) > self.max_memoized_responses:
+            self._responses.popitem(last=False)
+
+
+def get_request_key(url: str, request_kwargs: Mapping[str, Any]) -> str:
+    auth = request_kwargs.get('auth')
+    return json.dumps(
+        [
+            url,
+            sorted((request_kwargs.get('params') or {}).items()),
+            sorted((request_kwargs.get('headers') or {}).items()),
+            [auth.username, auth.password] if isinstance(auth, HTTPBasicAuth) else repr(auth),
+        ],
+        default=str,
+    )
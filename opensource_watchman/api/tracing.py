@@ -0,0 +1,19 @@
+from typing import Any
+from urllib.parse import urlparse
+
+from requests import Response
+
+from opensource_watchman.api.transport import SendCallable, TransportLayer
+from opensource_watchman.tracing import span
+
+
+class HttpTracing(TransportLayer):
+    """Records span of every request, should be the last layer to trace each attempt."""
+
+    def send(self, send: SendCallable, method: str, url: str, **kwargs: Any) -> Response:
+        parsed_url = urlparse(url)
+        span_name = f'{method} {parsed_url.hostname}{parsed_url.path}'
+        with span(span_name, 'http', url=url) as attributes:
+            response = send(method, url, **kwargs)
+            attributes['status'] = response.status_code
+            return response
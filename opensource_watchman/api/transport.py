@@ -0,0 +1,148 @@
+import functools
+import io
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Mapping, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from opensource_watchman.config import (
+    HTTP_POOL_SIZES, DEFAULT_HTTP_POOL_SIZE, HTTP_TIMEOUT_SECONDS,
+)
+
+
+SendCallable = Callable[..., requests.Response]
+
+
+class TransportLayer:
+    """
+    Base class for transport middlewares (caches, retries, etc).
+
+    Layer gets request only if is_applicable returns True, and has to call send
+    (next layer or actual session) to pass request further.
+    """
+
+    def is_applicable(self, method: str, url: str, request_kwargs: Mapping[str, Any]) -> bool:
+        return True
+
+    def send(self, send: SendCallable, method: str, url: str, **kwargs: Any) -> requests.Response:
+        return send(method, url, **kwargs)
+
+    def stat(self) -> Mapping[str, Any]:
+        return {}
+
+
+class Transport:
+    """
+    Shared keep-alive HTTP session, used by all api wrappers.
+
+    Each known host gets its own connection pool of configured size,
+    rest of hosts (badges, etc) share pools of default size. Requests pass
+    through layers in given order before they are sent; requests without
+    explicit timeout get default one, so stalled host can't hang the run.
+    """
+
+    def __init__(
+        self,
+        pool_sizes: Optional[Mapping[str, int]] = None,
+        default_pool_size: int = DEFAULT_HTTP_POOL_SIZE,
+        layers: Iterable[TransportLayer] = (),
+        timeout: Tuple[float, float] = HTTP_TIMEOUT_SECONDS,
+    ) -> None:
+        self.timeout = timeout
+        self.layers: List[TransportLayer] = list(layers)
+        self.pool_sizes = dict(HTTP_POOL_SIZES if pool_sizes is None else pool_sizes)
+        self.session = requests.Session()
+        self.adapters: List[HTTPAdapter] = []
+        for prefix in ('https://', 'http://'):
+            self._mount(prefix, HTTPAdapter(pool_maxsize=default_pool_size))
+        for host, pool_size in self.pool_sizes.items():
+            self._mount(f'https://{host}', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        send: SendCallable = self._send
+        for layer in reversed(self.layers):
+            if layer.is_applicable(method, url, kwargs):
+                send = functools.partial(layer.send, send)
+        return send(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def warm_up(self, hosts: Optional[Iterable[str]] = None, timeout: float = 5) -> None:
+        hosts_to_warm_up = list(hosts or self.pool_sizes.keys())
+        if not hosts_to_warm_up:
+            return
+        with ThreadPoolExecutor(max_workers=len(hosts_to_warm_up)) as executor:
+            list(executor.map(lambda h: self._open_connection(h, timeout), hosts_to_warm_up))
+
+    def stat(self) -> Mapping[str, Any]:
+        connections_opened = 0
+        requests_sent = 0
+        for adapter in self.adapters:
+            pools = adapter.poolmanager.pools
+            for pool_key in pools.keys():
+                pool = pools[pool_key]
+                connections_opened += pool.num_connections
+                requests_sent += pool.num_requests
+        transport_stat = {
+            'connections_opened': connections_opened,
+            'connections_reused': requests_sent - connections_opened,
+        }
+        for layer in self.layers:
+            transport_stat.update(layer.stat())
+        return transport_stat
+
+    def _mount(self, prefix: str, adapter: HTTPAdapter) -> None:
+        self.session.mount(prefix, adapter)
+        self.adapters.append(adapter)
+
+    def _send(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def _open_connection(self, host: str, timeout: float) -> None:
+        try:
+            self.session.head(f'https://{host}/', timeout=timeout)
+        except requests.RequestException:
+            pass
+
+
+def build_response(
+    url: str,
+    status_code: int,
+    headers: Mapping[str, str],
+    content: bytes,
+) -> requests.Response:
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.raw = io.BytesIO(content)
+    return response
+
+
+_transport = Transport()
+
+
+def get_transport() -> Transport:
+    return _transport
+
+
+def set_transport(transport: Transport) -> None:
+    global _transport  # noqa: WPS420
+    _transport = transport
+
+
+def get(url: str, **kwargs: Any) -> requests.Response:
+    return _transport.get(url, **kwargs)
+
+
+def post(url: str, **kwargs: Any) -> requests.Response:
+    return _transport.post(url, **kwargs)
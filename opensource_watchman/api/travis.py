@@ -1,8 +1,23 @@
-import re
-from typing import Optional, Any, Mapping, NamedTuple, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Any, Mapping, NamedTuple, List, Iterator, Sequence
 
 import deal
-from requests import get
+
+from opensource_watchman.api.transport import get
+from opensource_watchman.config import TRAVIS_FINISHED_BUILD_STATES, TRAVIS_JOB_LOGS_JOBS
+from opensource_watchman.tracing import in_current_context
+from opensource_watchman.utils.logs_analiser import (
+    are_all_sections_found, iterate_build_commands, iterate_commands_until_found,
+)
+from opensource_watchman.utils.storage import SqliteStore
+
+
+_job_commands_cache: SqliteStore = SqliteStore(':memory:', 'travis_job_commands')
+
+
+def set_job_commands_cache(job_commands_cache: SqliteStore) -> None:
+    global _job_commands_cache  # noqa: WPS420
+    _job_commands_cache = job_commands_cache
 
 
 class TravisRepoAPI(NamedTuple):
@@ -10,49 +25,10 @@ class TravisRepoAPI(NamedTuple):
     repo_name: str
     travis_api_token: str
 
-    @staticmethod  # noqa: C901
+    @staticmethod
     @deal.pure
-    def _extract_commands_from_raw_log(raw_log: str) -> List[str]:  # noqa: C901
-        commands_with_subcommands = [
-            # those commands have subcommands that are logged as stdout,
-            # those commands should be extracted too
-            'make',
-        ]
-
-        commands = [
-            r.lstrip('\x1b[0K$ ')
-            for r in raw_log.splitlines()
-            if r.strip('\x1b[0K').startswith('$ ')
-        ]
-        lines = [r.lstrip('\x1b[0K$ ') for r in raw_log.splitlines()]
-
-        for mother_command in commands_with_subcommands:
-            start_section = None
-            end_section = None
-            for line_num, line in enumerate(lines):
-                if line.startswith(f'{mother_command} ') and start_section is None:
-                    start_section = line_num
-                    continue
-                if line.startswith('$ ') and start_section is not None and end_section is None:
-                    end_section = line_num
-                    break
-            if end_section is None:
-                end_section = len(lines) - 1
-            if start_section and end_section:
-                for line in lines[start_section:end_section]:
-                    if (
-                        not line.strip()
-                        or line.startswith('-')
-                        or line.startswith('=')
-                        or line.startswith('|')
-                        or line.startswith('+')
-                        or re.match(r'^make\[\d\]', line)
-                        or line.startswith('Warning')
-                        or line.startswith('Success')
-                    ):
-                        continue
-                    commands.append(line)
-        return commands
+    def _extract_commands_from_raw_log(raw_log: str) -> List[str]:
+        return list(iterate_build_commands(raw_log.splitlines()))
 
     def fetch_last_build_info(self) -> Mapping[str, Any]:
         builds = self._fetch_data_from_travis(relative_url='/builds')
@@ -69,19 +45,76 @@ class TravisRepoAPI(NamedTuple):
         )
         return log['content'] if log else None
 
-    def get_last_build_commands(self) -> List[str]:
+    def iterate_job_log_lines(self, job_id: int) -> Iterator[str]:
+        """Yields lines of plain text job log, while it is downloaded."""
+        with get(
+            f'https://api.travis-ci.org/job/{job_id}/log.txt',
+            headers=self._get_headers(),
+            stream=True,
+        ) as response:
+            if not response:
+                return
+            for line in response.iter_lines():
+                yield line.decode('utf-8', errors='replace')
+
+    def get_last_build_commands(
+        self,
+        required_commands_sections: Optional[Sequence[Sequence[str]]] = None,
+    ) -> List[str]:
         """
-        Fetches last build log and get commands-like strings to guess
-        what commands are included in build.
+        Streams logs of all jobs of last build concurrently and get commands-like
+        strings to guess what commands are included in build.
+
+        If required commands sections are given, log is read only until one
+        command of each section is found.
         """
         build_info = self.fetch_last_build_info()
-        if not build_info:
+        if not build_info or not build_info['jobs']:
             return []
-        last_job_id = build_info['jobs'][0]['id']
-        raw_log = self.fetch_job_log(last_job_id)
-        if raw_log is None:
-            return []
-        return self._extract_commands_from_raw_log(raw_log)
+        is_build_finished = build_info.get('state') in TRAVIS_FINISHED_BUILD_STATES
+        jobs_ids = [j['id'] for j in build_info['jobs']]
+        with ThreadPoolExecutor(max_workers=min(len(jobs_ids), TRAVIS_JOB_LOGS_JOBS)) as executor:
+            jobs_commands = list(executor.map(
+                in_current_context(lambda job_id: self.get_job_commands(
+                    job_id,
+                    required_commands_sections,
+                    is_build_finished,
+                )),
+                jobs_ids,
+            ))
+        return list(dict.fromkeys(c for commands in jobs_commands for c in commands))
+
+    def get_job_commands(
+        self,
+        job_id: int,
+        required_commands_sections: Optional[Sequence[Sequence[str]]] = None,
+        is_job_finished: bool = False,
+    ) -> List[str]:
+        """
+        Returns commands of job log, commands of finished jobs are cached by job id.
+
+        Commands of log, that was read only partially, are reused only if all
+        required commands sections are found in them.
+        """
+        cached_commands = _job_commands_cache.get(str(job_id))
+        if cached_commands and (
+            cached_commands['is_complete']
+            or are_all_sections_found(cached_commands['commands'], required_commands_sections)
+        ):
+            return cached_commands['commands']
+        commands = list(iterate_commands_until_found(
+            iterate_build_commands(self.iterate_job_log_lines(job_id)),
+            required_commands_sections,
+        ))
+        if is_job_finished and commands:
+            _job_commands_cache.set(str(job_id), {
+                'commands': commands,
+                'is_complete': not (
+                    required_commands_sections
+                    and are_all_sections_found(commands, required_commands_sections)
+                ),
+            })
+        return commands
 
     def _fetch_data_from_travis(
         self,
@@ -91,9 +124,12 @@ class TravisRepoAPI(NamedTuple):
         repo_prefix = f'/repo/{self.owner}%2F{self.repo_name}'
         raw_response = get(
             f'https://api.travis-ci.org{repo_prefix if with_repo_prefix else ""}{relative_url}',
-            headers={
-                'Authorization': f'token {self.travis_api_token}',
-                'Travis-API-Version': '3',
-            },
+            headers=self._get_headers(),
         )
         return raw_response.json() if raw_response else None
+
+    def _get_headers(self) -> Mapping[str, str]:
+        return {
+            'Authorization': f'token {self.travis_api_token}',
+            'Travis-API-Version': '3',
+        }
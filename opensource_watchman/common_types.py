@@ -20,12 +20,14 @@ class RepoResult(NamedTuple):
     badges_urls: List[str]
     repo_name: str
     errors: Dict[str, List[str]]
+    unknown_checks: List[str] = []
 
     @property
     def status(self) -> str:
-        if not self.errors:
+        """Repo is ok only if all checks are passed: unknown checks are warnings."""
+        if not self.errors and not self.unknown_checks:
             return 'ok'
-        severities = {ERRORS_SEVERITY[e] for e in self. errors.keys()}
+        severities = {ERRORS_SEVERITY[e] for e in self.errors.keys()}
         return 'critical' if 'critical' in severities else 'warning'
 
     @property
@@ -53,6 +55,10 @@ class OpensourceWatchmanConfig(NamedTuple):
     min_number_of_actual_issues: int
     max_issue_update_age_months: int
     max_ok_pr_age_days: int
+    github_data_source: str = 'rest'
+    pipeline_jobs: int = 1
+    checks_to_run: Optional[List[str]] = None
+    github_api_tokens: Optional[List[str]] = None
 
 
 class GithubIssue(TypedDict):
@@ -1,8 +1,126 @@
-from typing import Any, Mapping
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Set
 
 from fn_graph import Composer
+from fn_graph.calculation import coalesce_arguments
+from requests import RequestException
+
+from opensource_watchman.tracing import in_current_context, span
+
+
+logger = logging.getLogger(__name__)
+
+NodeHook = Callable[[str, float, Optional[BaseException]], Any]
+_node_hooks: List[NodeHook] = []
+
+
+def add_node_hook(hook: NodeHook) -> None:
+    """Hook is called after each node calculation with node name, duration and exception."""
+    _node_hooks.append(hook)
+
+
+def remove_node_hook(hook: NodeHook) -> None:
+    _node_hooks.remove(hook)
 
 
 class AdvancedComposer(Composer):
-    def run_all(self) -> Mapping[str, Any]:
-        return self.calculate(self._functions.keys(), intermediates=True)
+    def run_all(
+        self,
+        max_workers: int = 1,
+        outputs: Optional[Iterable[str]] = None,
+        unavailable_nodes: Iterable[str] = (),
+    ) -> Mapping[str, Any]:
+        """
+        Calculates all nodes or only given outputs with all their ancestors.
+
+        Results of all calculated nodes are returned. Nodes, that failed to get
+        their data over network, given unavailable nodes and all their descendants
+        are not calculated and are absent in results.
+        """
+        outputs = list(self._functions.keys() if outputs is None else outputs)
+        return self.calculate_parallel(outputs, max_workers, unavailable_nodes)
+
+    def calculate_parallel(
+        self,
+        outputs: Iterable[str],
+        max_workers: int,
+        unavailable_nodes: Iterable[str] = (),
+    ) -> Dict[str, Any]:
+        """
+        Calculates outputs with all their ancestors on a thread pool.
+
+        Each node is started as soon as all its predecessors are calculated,
+        so independent api calls are made concurrently.
+        """
+        outputs = list(outputs)
+        for error in self.check(outputs):
+            raise Exception(error['message'])
+        dag = self.ancestor_dag(outputs)
+        pending_predecessors = {node: set(dag.predecessors(node)) for node in dag.nodes}
+        unavailable: Set[str] = set(unavailable_nodes)
+        results: Dict[str, Any] = {}
+        running: Dict[Future, str] = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending_predecessors or running:
+                for node in self._pop_ready_nodes(pending_predecessors, unavailable):
+                    calculate_node = in_current_context(self._calculate_node)
+                    running[executor.submit(calculate_node, node, results)] = node
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    try:
+                        results[node] = future.result()
+                    except RequestException:
+                        logger.warning(f'Data of {node} is unavailable', exc_info=True)
+                        unavailable.add(node)
+                    for predecessors in pending_predecessors.values():
+                        predecessors.discard(node)
+        return results
+
+    def _pop_ready_nodes(
+        self,
+        pending_predecessors: Dict[str, Set[str]],
+        unavailable: Set[str],
+    ) -> List[str]:
+        """Pops nodes, ready to be calculated, skipping ones with unavailable predecessors."""
+        ready_nodes: List[str] = []
+        while True:
+            skipped_nodes: Set[str] = set()
+            for node in [n for n, p in pending_predecessors.items() if not p]:
+                pending_predecessors.pop(node)
+                if node in unavailable or unavailable.intersection(self._predecessors(node)):
+                    unavailable.add(node)
+                    skipped_nodes.add(node)
+                else:
+                    ready_nodes.append(node)
+            if not skipped_nodes:
+                return ready_nodes
+            for predecessors in pending_predecessors.values():
+                predecessors.difference_update(skipped_nodes)
+
+    def _predecessors(self, node: str) -> Set[str]:
+        return {predecessor for _, predecessor in self._resolve_predecessors(node)}
+
+    def _calculate_node(self, node: str, results: Mapping[str, Any]) -> Any:
+        function = self._functions[node]
+        predecessor_results = {
+            parameter: results[predecessor]
+            for parameter, predecessor in self._resolve_predecessors(node)
+        }
+        positional, args, keywords, kwargs = coalesce_arguments(function, predecessor_results)
+        started_at = time.perf_counter()
+        try:
+            with span(node, 'node'):
+                node_result = function(*positional, *args, **keywords, **kwargs)
+        except Exception as exc:  # noqa: B902
+            call_node_hooks(node, time.perf_counter() - started_at, exc)
+            raise
+        call_node_hooks(node, time.perf_counter() - started_at, None)
+        return node_result
+
+
+def call_node_hooks(node: str, duration_seconds: float, exception: Optional[BaseException]) -> None:
+    for hook in list(_node_hooks):
+        hook(node, duration_seconds, exception)
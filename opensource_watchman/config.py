@@ -26,3 +26,66 @@ SEVERITY_COLORS = {
 }
 
 DEFAULT_HTML_REPORT_FILE_NAME = 'report.html'
+HTML_TEMPLATES_CACHE_DIR_NAME = 'html_templates'
+
+HTTP_POOL_SIZES = {
+    'api.github.com': 20,
+    'raw.githubusercontent.com': 20,
+    'api.travis-ci.org': 10,
+    'api.codeclimate.com': 10,
+    'pypi.org': 5,
+    'pypistats.org': 5,
+}
+DEFAULT_HTTP_POOL_SIZE = 10
+# Connect and read timeouts of requests, that are sent without explicit timeout.
+HTTP_TIMEOUT_SECONDS = (10, 60)
+
+GITHUB_API_PAGE_SIZE = 100
+# Repos, submitted for processing ahead of each job, while rest of listing is not fetched yet
+REPOS_QUEUED_PER_JOB = 2
+GITHUB_PAGES_PREFETCH_JOBS = 8
+
+CACHE_DB_FILE_NAME = 'opensource_watchman_cache.sqlite'
+CONDITIONAL_CACHE_HOSTS = ('api.github.com', 'raw.githubusercontent.com')
+
+IMAGE_PROBE_CHUNK_SIZE = 4 * 1024
+IMAGE_PROBE_MAX_BYTES = 64 * 1024
+IMAGE_SIZE_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+IMAGE_SIZE_FAILURE_CACHE_TTL_SECONDS = 60 * 60
+BADGES_PROBE_JOBS = 8
+
+CLOCK_DEPENDENT_CHECKS = ['S01', 'I01', 'M01']
+INCREMENTAL_STATE_MAX_AGE_SECONDS = 7 * 24 * 60 * 60
+
+GITHUB_API_HOSTS = ('api.github.com',)
+# Documented secondary rate limits: 100 concurrent requests, 900 points per minute
+# for REST and 2000 for GraphQL api; REST requests, that are not GET, cost 5 points.
+GITHUB_MAX_CONCURRENT_REQUESTS = 50
+GITHUB_SECONDARY_RATE_LIMIT_POINTS_PER_MINUTE = {'rest': 900, 'graphql': 2000}
+GITHUB_MUTATING_REQUEST_POINTS = 5
+GITHUB_RATE_LIMIT_MAX_ATTEMPTS = 5
+# Documented wait after secondary rate limit response without Retry-After
+GITHUB_SECONDARY_RATE_LIMIT_WAIT_SECONDS = 60
+GITHUB_RATE_LIMIT_RESET_MARGIN_SECONDS = 1
+
+HTTP_RETRIES = 3
+HTTP_RETRY_STATUSES = {500, 502, 503, 504}
+HTTP_RETRY_BACKOFF_BASE_SECONDS = 0.5
+HTTP_RETRY_BACKOFF_MAX_SECONDS = 8
+CIRCUIT_BREAKER_FAILURES_THRESHOLD = 5
+CIRCUIT_BREAKER_RESET_SECONDS = 60
+SINGLE_FLIGHT_MAX_MEMOIZED_RESPONSES = 256
+
+COMMANDS_WITH_SUBCOMMANDS = ('make',)
+
+TRAVIS_JOB_LOGS_JOBS = 8
+TRAVIS_FINISHED_BUILD_STATES = ('passed', 'failed', 'errored', 'canceled')
+
+HTTP_ARCHIVE_FILE_NAME = 'http_archive.sqlite'
+
+PROFILE_SAMPLING_INTERVAL_SECONDS = 0.005
+PROFILE_MEMORY_TOP_ALLOCATION_SITES = 30
+PROFILE_DEFAULT_FILE_NAMES = {
+    'cpu': 'watchman_profile.collapsed',
+    'memory': 'watchman_profile_memory.txt',
+}
@@ -0,0 +1,129 @@
+import datetime
+from typing import Any, Dict, Mapping, NamedTuple, Optional
+
+from opensource_watchman.api.github import GithubRepoAPI
+from opensource_watchman.api.pypistats import get_pypi_latest_version
+from opensource_watchman.api.travis import TravisRepoAPI
+from opensource_watchman.common_types import RepoResult
+from opensource_watchman.config import INCREMENTAL_STATE_MAX_AGE_SECONDS
+from opensource_watchman.utils.storage import SqliteStore
+
+
+class RepoState(NamedTuple):
+    pushed_at: Optional[str]
+    updated_at: Optional[str]
+    result: RepoResult
+    clock_dependent_data: Mapping[str, Any]
+    inputs_versions: Optional[Mapping[str, Any]] = None
+    evaluated_at: float = 0
+
+
+class RepoStateStore:
+    """
+    Persistent state of repos between runs, one row per repo.
+
+    Row keeps repo timestamps from repos listing, versions of inputs, that change
+    without push, last result of repo and github data, required to re-evaluate
+    clock-dependent checks.
+    """
+
+    def __init__(self, store: SqliteStore) -> None:
+        self.store = store
+
+    def get(self, owner: str, repo_name: str) -> Optional[RepoState]:
+        raw_state = self.store.get(f'{owner}/{repo_name}')
+        if raw_state is None:
+            return None
+        return RepoState(
+            pushed_at=raw_state['pushed_at'],
+            updated_at=raw_state['updated_at'],
+            result=RepoResult(**raw_state['result']),
+            clock_dependent_data=deserialize_github_data(raw_state['clock_dependent_data']),
+            inputs_versions=raw_state.get('inputs_versions'),
+            evaluated_at=raw_state.get('evaluated_at', 0),
+        )
+
+    def save(self, owner: str, repo_name: str, repo_state: RepoState) -> None:
+        self.store.set(f'{owner}/{repo_name}', {
+            'pushed_at': repo_state.pushed_at,
+            'updated_at': repo_state.updated_at,
+            'result': repo_state.result._asdict(),
+            'clock_dependent_data': serialize_github_data(repo_state.clock_dependent_data),
+            'inputs_versions': repo_state.inputs_versions,
+            'evaluated_at': repo_state.evaluated_at,
+        })
+
+
+def fetch_listed_repo_info(owner: str, repo_name: str, config) -> Mapping[str, Any]:
+    """
+    Info of repo, given by name, with timestamps, that repos listing has.
+
+    Github pipeline requests the same repo info, so it is not requested twice.
+    """
+    github_api = GithubRepoAPI(owner, repo_name, config.github_login, config.github_api_token)
+    return github_api.fetch_repo_info() or {'name': repo_name}
+
+
+def fetch_repo_inputs_versions(
+    owner: str,
+    repo_name: str,
+    package_name: Optional[str],
+    config,
+) -> Mapping[str, Any]:
+    """
+    Versions of repo inputs, that change without push: issues and pull requests
+    (with their comments), last Travis build (cron builds too) and PyPI release.
+
+    Rest of such inputs (CodeClimate coverage, Travis crons) are refreshed by
+    full processing of repo, when its state gets older than max age.
+    """
+    github_api = GithubRepoAPI(owner, repo_name, config.github_login, config.github_api_token)
+    last_updated_issue = github_api.fetch_last_updated_issue() or {}
+    last_build = TravisRepoAPI(owner, repo_name, config.travis_api_login).fetch_last_build_info()
+    return {
+        'last_issue_updated_at': last_updated_issue.get('updated_at'),
+        'last_build': {
+            k: v for k, v in (last_build or {}).items() if k in {'id', 'state', 'finished_at'}
+        },
+        'pypi_version': get_pypi_latest_version(package_name) if package_name else None,
+    }
+
+
+def is_repo_unchanged(
+    repo_state: RepoState,
+    repo_info: Mapping[str, Any],
+    inputs_versions: Mapping[str, Any],
+    now: float,
+) -> bool:
+    return (
+        repo_info.get('pushed_at') is not None
+        and repo_state.pushed_at == repo_info.get('pushed_at')
+        and repo_state.updated_at == repo_info.get('updated_at')
+        and repo_state.inputs_versions == inputs_versions
+        and now - repo_state.evaluated_at < INCREMENTAL_STATE_MAX_AGE_SECONDS
+    )
+
+
+INT_KEYED_GITHUB_DATA = ('issues_comments', 'pull_request_details', 'detailed_pull_requests')
+
+
+def serialize_github_data(github_data: Mapping[str, Any]) -> Dict[str, Any]:
+    serialized_data = dict(github_data)
+    for key in INT_KEYED_GITHUB_DATA:
+        if key in serialized_data:
+            serialized_data[key] = {str(k): v for k, v in serialized_data[key].items()}
+    if isinstance(serialized_data.get('last_commit_date'), datetime.datetime):
+        serialized_data['last_commit_date'] = serialized_data['last_commit_date'].isoformat()
+    return serialized_data
+
+
+def deserialize_github_data(serialized_data: Mapping[str, Any]) -> Dict[str, Any]:
+    github_data = dict(serialized_data)
+    for key in INT_KEYED_GITHUB_DATA:
+        if key in github_data:
+            github_data[key] = {int(k): v for k, v in github_data[key].items()}
+    if github_data.get('last_commit_date'):
+        github_data['last_commit_date'] = datetime.datetime.fromisoformat(
+            github_data['last_commit_date'],
+        )
+    return github_data
@@ -0,0 +1,52 @@
+from typing import List, NamedTuple, Optional
+
+from opensource_watchman.api.metrics import HttpMetrics
+from opensource_watchman.api.quota import QuotaAccounting
+from opensource_watchman.api.tracing import HttpTracing
+from opensource_watchman.api.transport import TransportLayer
+from opensource_watchman.composer import add_node_hook
+from opensource_watchman.metrics import Metrics, export_metrics
+from opensource_watchman.quota import QuotaUsage
+from opensource_watchman.tracing import Tracer, export_trace, set_tracer
+
+
+class Instrumentation(NamedTuple):
+    metrics: Optional[Metrics] = None
+    tracer: Optional[Tracer] = None
+    quota_usage: Optional[QuotaUsage] = None
+
+    def get_transport_layers(self) -> List[TransportLayer]:
+        """Layers to record requests with, they should be the last layers of transport."""
+        layers: List[TransportLayer] = []
+        if self.metrics is not None:
+            layers.append(HttpMetrics(self.metrics))
+        if self.tracer is not None:
+            layers.append(HttpTracing())
+        if self.quota_usage is not None:
+            layers.append(QuotaAccounting(self.quota_usage))
+        return layers
+
+
+def set_up_instrumentation(
+    metrics_file: Optional[str],
+    trace_file: Optional[str],
+    quota_by_checks: bool,
+) -> Instrumentation:
+    metrics = Metrics() if metrics_file else None
+    if metrics is not None:
+        add_node_hook(metrics.observe_node)
+    tracer = Tracer() if trace_file else None
+    if tracer is not None:
+        set_tracer(tracer)
+    return Instrumentation(metrics, tracer, QuotaUsage() if quota_by_checks else None)
+
+
+def export_instrumentation(
+    instrumentation: Instrumentation,
+    metrics_file: Optional[str],
+    trace_file: Optional[str],
+) -> None:
+    if instrumentation.metrics and metrics_file:
+        export_metrics(instrumentation.metrics, metrics_file)
+    if instrumentation.tracer and trace_file:
+        export_trace(instrumentation.tracer, trace_file)
@@ -0,0 +1,149 @@
+import json
+import os
+import tempfile
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+
+METRICS_PREFIX = 'opensource_watchman'
+
+
+class NodeStat:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.exceptions = 0
+        self.seconds_total: float = 0
+        self.seconds_max: float = 0
+
+
+class HostStat:
+    def __init__(self) -> None:
+        self.statuses: Counter = Counter()
+        self.seconds_total: float = 0
+        self.response_bytes = 0
+
+
+class Metrics:
+    """
+    Run metrics: duration and exceptions of pipeline nodes, requests of each host.
+
+    Collected by composer node hook and HttpMetrics transport layer, exported
+    at the end of run as json or Prometheus textfile for node-exporter.
+    """
+
+    def __init__(self) -> None:
+        self.nodes: Dict[str, NodeStat] = {}
+        self.hosts: Dict[str, HostStat] = {}
+        self._lock = threading.Lock()
+
+    def observe_node(
+        self,
+        node: str,
+        duration_seconds: float,
+        exception: Optional[BaseException],
+    ) -> None:
+        with self._lock:
+            node_stat = self.nodes.setdefault(node, NodeStat())
+            node_stat.calls += 1
+            node_stat.exceptions += exception is not None
+            node_stat.seconds_total += duration_seconds
+            node_stat.seconds_max = max(node_stat.seconds_max, duration_seconds)
+
+    def observe_request(
+        self,
+        host: str,
+        status: str,
+        duration_seconds: float,
+        response_bytes: int,
+    ) -> None:
+        """Registers request to host; status is response code or 'error' if request failed."""
+        with self._lock:
+            host_stat = self.hosts.setdefault(host, HostStat())
+            host_stat.statuses[status] += 1
+            host_stat.seconds_total += duration_seconds
+            host_stat.response_bytes += response_bytes
+
+    def to_json(self) -> Mapping[str, Any]:
+        with self._lock:
+            return {
+                'nodes': {
+                    node: {
+                        'calls': s.calls,
+                        'exceptions': s.exceptions,
+                        'seconds_total': round(s.seconds_total, 6),
+                        'seconds_max': round(s.seconds_max, 6),
+                    }
+                    for node, s in sorted(self.nodes.items())
+                },
+                'hosts': {
+                    host: {
+                        'requests': dict(sorted(s.statuses.items())),
+                        'seconds_total': round(s.seconds_total, 6),
+                        'response_bytes': s.response_bytes,
+                    }
+                    for host, s in sorted(self.hosts.items())
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        metrics_json = self.to_json()
+        nodes, hosts = metrics_json['nodes'], metrics_json['hosts']
+        lines: List[str] = []
+        for name, help_text, field in [
+            ('node_calls_total', 'Calculations of pipeline node.', 'calls'),
+            ('node_exceptions_total', 'Calculations of pipeline node, that raised.', 'exceptions'),
+            ('node_duration_seconds_total', 'Time spent in pipeline node.', 'seconds_total'),
+            ('node_duration_seconds_max', 'Longest calculation of pipeline node.', 'seconds_max'),
+        ]:
+            lines.extend(format_metric(name, help_text, [
+                ((('node', node),), node_stat[field]) for node, node_stat in nodes.items()
+            ]))
+        lines.extend(format_metric('http_requests_total', 'HTTP requests by host and status.', [
+            ((('host', host), ('status', status)), requests_number)
+            for host, host_stat in hosts.items()
+            for status, requests_number in host_stat['requests'].items()
+        ]))
+        for name, help_text, field in [
+            ('http_request_duration_seconds_total', 'Time spent in requests.', 'seconds_total'),
+            ('http_response_bytes_total', 'Size of response bodies.', 'response_bytes'),
+        ]:
+            lines.extend(format_metric(name, help_text, [
+                ((('host', host),), host_stat[field]) for host, host_stat in hosts.items()
+            ]))
+        return ''.join(f'{line}\n' for line in lines)
+
+
+def format_metric(
+    name: str,
+    help_text: str,
+    samples: List[Tuple[Tuple[Tuple[str, str], ...], float]],
+) -> List[str]:
+    metric_type = 'gauge' if name.endswith('_max') else 'counter'
+    full_name = f'{METRICS_PREFIX}_{name}'
+    lines = [f'# HELP {full_name} {help_text}', f'# TYPE {full_name} {metric_type}']
+    for labels, sample_value in samples:
+        labels_line = ','.join(f'{k}="{escape_label_value(v)}"' for k, v in labels)
+        lines.append(f'{full_name}{{{labels_line}}} {sample_value}')
+    return lines
+
+
+def escape_label_value(label_value: str) -> str:
+    return label_value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def export_metrics(metrics: Metrics, file_path: str) -> None:
+    """
+    Writes metrics as json if file has .json extension, as Prometheus textfile otherwise.
+
+    File is replaced atomically, so node-exporter never reads half-written file.
+    """
+    if file_path.endswith('.json'):
+        content = json.dumps(metrics.to_json(), indent=2)
+    else:
+        content = metrics.to_prometheus()
+    file_dir = os.path.dirname(os.path.abspath(file_path))
+    with tempfile.NamedTemporaryFile('w', dir=file_dir, delete=False) as metrics_file:
+        metrics_file.write(content)
+    os.chmod(metrics_file.name, 0o644)  # noqa: S103
+    os.replace(metrics_file.name, file_path)
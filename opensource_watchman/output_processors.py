@@ -1,49 +1,126 @@
+import functools
 import importlib
+import json
+import math
 import os
-from typing import Any, Mapping, List, Optional
+import sys
+from typing import Any, Mapping, List, Optional, Tuple
 
 from colored import fg, attr
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
 
 from opensource_watchman.pipelines.extended_repo_info import fetch_downloads_stat
 from opensource_watchman.common_types import RepoResult
 from opensource_watchman.config import SEVERITY_COLORS, ERRORS_SEVERITY
 
 
+_templates_bytecode_cache_dir: Optional[str] = None
+
+
+class ResultsStream:
+    """Base class for outputs, that emit result of each repo as soon as it is processed."""
+
+    def __enter__(self) -> 'ResultsStream':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+    def observe_repo(self, repo_stat: RepoResult) -> None:
+        pass
+
+
+class TermResultsStream(ResultsStream):
+    """Prints errors of each repo, summary is printed at exit from running aggregate."""
+
+    def __init__(self) -> None:
+        self.repos_number = 0
+        self.ok_repos_number = 0
+
+    def __exit__(self, *args: Any) -> None:
+        ok_repos_percent = self.ok_repos_number / max(self.repos_number, 1) * 100
+        print(  # noqa: T001
+            f'{ok_repos_percent:.2f}% of all repos are ok '
+            f'({self.ok_repos_number} of {self.repos_number})',
+        )
+
+    def observe_repo(self, repo_stat: RepoResult) -> None:
+        self.repos_number += 1
+        self.ok_repos_number += print_repo_errors(repo_stat)
+        sys.stdout.flush()
+
+
+class JsonLinesResultsStream(ResultsStream):
+    """Prints result of each repo as json object on its own line."""
+
+    def observe_repo(self, repo_stat: RepoResult) -> None:
+        print(json.dumps({**repo_stat._asdict(), 'status': repo_stat.status}), flush=True)  # noqa: T001
+
+
+def create_results_stream(output_type: str) -> ResultsStream:
+    if output_type == 'term':
+        return TermResultsStream()
+    if output_type == 'jsonl':
+        return JsonLinesResultsStream()
+    return ResultsStream()
+
+
 def print_errors_data(repos_stat: List[RepoResult]) -> None:
-    ok_repos_number = 0
-    for repo_stat in repos_stat:
-        print(repo_stat.repo_name)  # noqa: T001
-        for error_slug, error_texts in sorted(repo_stat.errors.items()):
-            error_color = SEVERITY_COLORS[ERRORS_SEVERITY[error_slug]]
-            for error_text in error_texts:
-                print(f'\t{error_color}{error_slug}: {error_text}{attr(0)}')  # noqa: T001
-        if not repo_stat.errors:
-            ok_repos_number += 1
-            print(f'\t{fg(2)}ok{attr(0)}')  # noqa: T001
-    ok_repos_percent = ok_repos_number / len(repos_stat) * 100
-    print(  # noqa: T001
-        f'{ok_repos_percent:.2f}% of all repos are ok ({ok_repos_number} of {len(repos_stat)})',
-    )
+    with TermResultsStream() as results_stream:
+        for repo_stat in repos_stat:
+            results_stream.observe_repo(repo_stat)
+
+
+def print_repo_errors(repo_stat: RepoResult) -> bool:
+    """Prints errors of repo, returns if repo is ok."""
+    print(repo_stat.repo_name)  # noqa: T001
+    for error_slug, error_texts in sorted(repo_stat.errors.items()):
+        error_color = SEVERITY_COLORS[ERRORS_SEVERITY[error_slug]]
+        for error_text in error_texts:
+            print(f'\t{error_color}{error_slug}: {error_text}{attr(0)}')  # noqa: T001
+    for check_code in repo_stat.unknown_checks:
+        print(f'\t{fg(8)}{check_code}: unknown, data is unavailable{attr(0)}')  # noqa: T001
+    is_ok = repo_stat.status == 'ok'
+    if is_ok:
+        print(f'\t{fg(2)}ok{attr(0)}')  # noqa: T001
+    return is_ok
+
+
+def print_http_stat(http_stat: Mapping[str, Any]) -> None:
+    stat_line = ', '.join(f'{k}={v}' for k, v in http_stat.items())
+    print(f'HTTP stat: {stat_line}', file=sys.stderr)  # noqa: T001
 
 
-def prepare_html_report(
+def print_usage_by_checks(usage_by_checks: Mapping[str, Mapping[str, Mapping[str, Any]]]) -> None:
+    """Prints api usage of checks, most expensive first; exclusive requests are saved by --skip."""
+    print('API usage by checks:', file=sys.stderr)  # noqa: T001
+    for check, hosts_usage in sorted(
+        usage_by_checks.items(),
+        key=lambda c: -sum(u['requests'] for u in c[1].values()),
+    ):
+        for host, usage in hosts_usage.items():
+            usage_line = ', '.join(f'{k}={v}' for k, v in usage.items())
+            print(f'\t{check} {host}: {usage_line}', file=sys.stderr)  # noqa: T001
+
+
+def prepare_html_report(  # noqa: CFQ002
     owner: str,
     repos_stat: List[RepoResult],
     html_template_path: str,
     extra_context_provider_py_name: Optional[str],
     result_filename: str,
     config,
+    page_size: Optional[int] = None,
 ) -> None:
     context = {
         'owner': owner,
-        'repos': sorted(repos_stat, key=lambda r: len(r.errors)),
+        'repos': sorted(repos_stat, key=lambda r: len(r.errors) + len(r.unknown_checks)),
         'severity_colors': {'ok': 'green', 'warning': 'yellow', 'critical': 'red'},
         'downloads_last_week_stat': fetch_downloads_stat(repos_stat),
         **get_total_stat(repos_stat),
         **get_extra_context_from_provider(extra_context_provider_py_name),
     }
-    render_html_report(context, html_template_path, result_filename)
+    render_html_report(context, html_template_path, result_filename, page_size)
 
 
 def get_total_stat(repos_stat: List[RepoResult]) -> Mapping[str, Any]:
@@ -55,11 +132,55 @@ def get_total_stat(repos_stat: List[RepoResult]) -> Mapping[str, Any]:
     }
 
 
+def set_templates_bytecode_cache_dir(bytecode_cache_dir: Optional[str]) -> None:
+    global _templates_bytecode_cache_dir  # noqa: WPS420
+    _templates_bytecode_cache_dir = bytecode_cache_dir
+
+
 def render_html_report(
     context: Mapping[str, Any],
     template_file_path: str,
     result_file: str,
+    page_size: Optional[int] = None,
 ) -> None:
+    """
+    Streams rendered template to result file, without building whole report in memory.
+
+    With page size, repos are split to pages: result file is the first page and
+    the rest are rendered to numbered files next to it. Each page is rendered with
+    the same template and gets names of all pages as `report_pages` to link them,
+    so browser loads details of repos of opened page only.
+    """
+    template = get_template(template_file_path)
+    repos = context['repos']
+    report_pages = get_report_pages_files(result_file, len(repos), page_size)
+    pages_size = page_size or len(repos)
+    for page_index, page_file in enumerate(report_pages):
+        page_context = {
+            **context,
+            'repos': repos[page_index * pages_size:(page_index + 1) * pages_size],
+            'report_pages': [os.path.basename(f) for f in report_pages],
+            'current_page_index': page_index,
+        }
+        template.stream(page_context).dump(page_file, encoding='utf-8')
+
+
+def get_report_pages_files(
+    result_file: str,
+    repos_number: int,
+    page_size: Optional[int],
+) -> List[str]:
+    if not page_size:
+        return [result_file]
+    pages_number = max(math.ceil(repos_number / page_size), 1)
+    file_name, extension = os.path.splitext(result_file)
+    return [
+        result_file,
+        *(f'{file_name}-{page_number}{extension}' for page_number in range(2, pages_number + 1)),
+    ]
+
+
+def get_template(template_file_path: str) -> Template:
     templates_pathes = [
         os.path.dirname(os.path.dirname(__file__)),
         os.path.join(os.path.dirname(__file__), 'templates'),
@@ -74,15 +195,24 @@ def render_html_report(
             os.path.join(os.path.abspath(os.getcwd()), os.path.dirname(template_file_path)),
         )
         template_name = os.path.basename(template_file_path)
+    env = get_templates_environment(tuple(templates_pathes), _templates_bytecode_cache_dir)
+    return env.get_template(template_name)
 
-    env = Environment(
-        loader=FileSystemLoader(templates_pathes),
-    )
-    template = env.get_template(template_name)
-    rendered_template = template.render(**context)
 
-    with open(result_file, 'w') as file_handler:
-        file_handler.write(rendered_template)
+@functools.lru_cache(maxsize=None)
+def get_templates_environment(
+    templates_pathes: Tuple[str, ...],
+    bytecode_cache_dir: Optional[str],
+) -> Environment:
+    """Environment keeps compiled templates; bytecode cache keeps them between runs."""
+    bytecode_cache = None
+    if bytecode_cache_dir:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+    return Environment(
+        loader=FileSystemLoader(list(templates_pathes)),
+        bytecode_cache=bytecode_cache,
+    )
 
 
 def get_extra_context_from_provider(extra_context_provider_py_name: Optional[str]):
@@ -2,13 +2,15 @@ import configparser
 import datetime
 import operator
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Mapping, Dict, Any
 
 import deal
-from PIL import UnidentifiedImageError
 
 from opensource_watchman.api.github import GithubRepoAPI
 from opensource_watchman.composer import AdvancedComposer
+from opensource_watchman.config import BADGES_PROBE_JOBS
+from opensource_watchman.tracing import in_current_context
 from opensource_watchman.utils.images import get_image_height_in_pixels
 
 
@@ -43,10 +45,10 @@ def fetch_repo_info(api: GithubRepoAPI):
 
 
 def fetch_last_commit_date(api: GithubRepoAPI):
-    commits = api.fetch_commits()
+    last_commit = api.fetch_last_commit()
     last_commit_date = None
-    if commits:
-        raw_date = commits[0]['commit']['committer']['date']
+    if last_commit:
+        raw_date = last_commit['commit']['committer']['date']
         last_commit_date = datetime.datetime.fromisoformat(raw_date[:-1])
     return last_commit_date
 
@@ -112,22 +114,22 @@ def fetch_ow_repo_config(api: GithubRepoAPI, config_file_name: str, config_secti
     return config
 
 
+def is_badge_image(url: str) -> bool:
+    max_badge_height = 60
+    height = get_image_height_in_pixels(url)
+    return bool(height and height < max_badge_height)
+
+
 @deal.post(lambda r: all(u.startswith('http') for u in r))
 def fetch_badges_urls(readme_content: str):
     if not readme_content:
         return []
     image_urls = re.findall(r'(?:!\[.*?\]\((.*?)\))', readme_content)
-    max_badge_height = 60
-    badges_urls = []
-    for url in image_urls:
-        try:
-            height = get_image_height_in_pixels(url)
-        except UnidentifiedImageError:  # this happens with svg, should parse it and get height
-            badges_urls.append(url)
-            continue
-        if height and height < max_badge_height:
-            badges_urls.append(url)
-    return badges_urls
+    if not image_urls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(image_urls), BADGES_PROBE_JOBS)) as executor:
+        are_badges = list(executor.map(in_current_context(is_badge_image), image_urls))
+    return [url for url, is_badge in zip(image_urls, are_badges) if is_badge]
 
 
 @deal.pure
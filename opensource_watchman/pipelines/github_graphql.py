@@ -0,0 +1,146 @@
+import operator
+from typing import Any, Dict, List, Mapping, Optional
+
+import deal
+
+from opensource_watchman.api.github_graphql import GithubGraphQLAPI
+from opensource_watchman.common_types import (
+    GithubIssue, GithubComment, GithubPullRequest, GithubPullRequestDetails,
+)
+from opensource_watchman.composer import AdvancedComposer
+
+
+def create_graphql_api(
+    owner: str,
+    repo_name: str,
+    github_login: str,
+    github_api_token: str,
+) -> GithubGraphQLAPI:
+    return GithubGraphQLAPI(owner, repo_name, github_login, github_api_token)
+
+
+def fetch_graphql_open_issues(graphql_api: GithubGraphQLAPI) -> List[Mapping[str, Any]]:
+    return list(graphql_api.iterate_open_issues())
+
+
+def fetch_graphql_open_pull_requests(graphql_api: GithubGraphQLAPI) -> List[Mapping[str, Any]]:
+    return list(graphql_api.iterate_open_pull_requests())
+
+
+@deal.pure
+def fetch_open_issues(
+    graphql_open_issues: List[Mapping[str, Any]],
+    graphql_open_pull_requests: List[Mapping[str, Any]],
+) -> List[GithubIssue]:
+    """Open pull requests are open issues as well, as they are for REST issues listing."""
+    return [
+        {
+            'number': i['number'],
+            'updated_at': i['updatedAt'],
+            'comments': i['comments']['totalCount'],
+        }
+        for i in sorted(
+            [*graphql_open_issues, *graphql_open_pull_requests],
+            key=operator.itemgetter('number'),
+            reverse=True,
+        )
+    ]
+
+
+@deal.pure
+def fetch_issues_comments(
+    graphql_open_issues: List[Mapping[str, Any]],
+    graphql_open_pull_requests: List[Mapping[str, Any]],
+) -> Mapping[int, List[GithubComment]]:
+    return {
+        i['number']: [{'updated_at': c['updatedAt']} for c in i['comments']['nodes']]
+        for i in [*graphql_open_issues, *graphql_open_pull_requests]
+    }
+
+
+@deal.pure
+def fetch_open_pull_requests(
+    graphql_open_pull_requests: List[Mapping[str, Any]],
+) -> List[GithubPullRequest]:
+    return [
+        {'number': p['number'], 'updated_at': p['updatedAt']}
+        for p in graphql_open_pull_requests
+    ]
+
+
+@deal.pure
+def fetch_detailed_pull_requests(
+    open_pull_requests: List[GithubPullRequest],
+) -> Mapping[int, GithubPullRequest]:
+    return {p['number']: p for p in open_pull_requests}
+
+
+@deal.pure
+def fetch_pull_request_details(
+    graphql_open_pull_requests: List[Mapping[str, Any]],
+) -> Mapping[int, GithubPullRequestDetails]:
+    """
+    Details of pull requests, as REST backend collects them.
+
+    Statuses of last commit are latest statuses of its contexts, newest first,
+    last review is the latest review of last commit.
+    """
+    pull_request_details: Dict[int, Any] = {}
+    for pull_request in graphql_open_pull_requests:
+        commits = pull_request['commits']['nodes']
+        last_commit = commits[-1]['commit'] if commits else None
+        last_commit_sha = last_commit['oid'] if last_commit else None
+        last_commit_reviews = [
+            r for r in pull_request['reviews']['nodes']
+            if r['commit'] and r['commit']['oid'] == last_commit_sha
+        ]
+        last_review = (
+            max(last_commit_reviews, key=operator.itemgetter('submittedAt'))
+            if last_commit_reviews
+            else None
+        )
+        pull_request_details[pull_request['number']] = {
+            'last_commit_sha': last_commit_sha,
+            'statuses_info': get_statuses_info(last_commit['status'] if last_commit else None),
+            'last_review': (
+                {'state': last_review['state'], 'submitted_at': last_review['submittedAt']}
+                if last_review
+                else None
+            ),
+            'comments': [
+                {'updated_at': c['updatedAt']}
+                for t in pull_request['reviewThreads']['nodes']
+                for c in t['comments']['nodes']
+            ],
+        }
+    return pull_request_details
+
+
+@deal.pure
+def get_statuses_info(commit_status: Optional[Mapping[str, Any]]) -> List[Mapping[str, str]]:
+    if not commit_status:
+        return []
+    contexts = sorted(commit_status['contexts'], key=operator.itemgetter('createdAt'), reverse=True)
+    return [{'state': c['state'].lower()} for c in contexts]
+
+
+@deal.pure
+@deal.post(lambda r: r._functions)
+def update_with_graphql_data_source(github_pipeline: AdvancedComposer) -> AdvancedComposer:
+    """
+    Replaces per-issue and per-pull-request REST calls of github pipeline
+    with a few paginated GraphQL queries, that produce the same pipeline data.
+    """
+    return github_pipeline.update_without_prefix(
+        'create_',
+        create_graphql_api,
+    ).update_without_prefix(
+        'fetch_',
+        fetch_graphql_open_issues,
+        fetch_graphql_open_pull_requests,
+        fetch_open_issues,
+        fetch_issues_comments,
+        fetch_open_pull_requests,
+        fetch_detailed_pull_requests,
+        fetch_pull_request_details,
+    )
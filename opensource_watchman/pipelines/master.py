@@ -4,16 +4,16 @@ import operator
 import deal
 import yaml
 
-from requests import get
-from typing import List, Mapping, Any, Optional
+from typing import Iterable, List, Mapping, Any, Optional, Set, Tuple
 
 from opensource_watchman.api.codeclimate_api import CodeClimateAPI
+from opensource_watchman.api.transport import get
 from opensource_watchman.common_types import (
     GithubPipelineData, TravisPipelineData, RequiredCICommandsConfig,
 )
 from opensource_watchman.composer import AdvancedComposer
 from opensource_watchman.utils.dates import parse_iso_datetime
-from opensource_watchman.utils.logs_analiser import if_logs_has_any_of_commands
+from opensource_watchman.utils.logs_analiser import CommandsMatcher
 
 
 @deal.pure
@@ -63,6 +63,18 @@ def is_ci_bild_status_ok(travis_data: TravisPipelineData, C01: List[str]) -> Lis
     return errors
 
 
+@deal.pure
+def get_required_commands_sections(
+    required_commands_to_run_in_build: List[RequiredCICommandsConfig],
+    repo_config: Mapping[str, str],
+) -> List[List[str]]:
+    """Returns commands sections, one command of each should be found in build of the repo."""
+    return [
+        section_info['cmd'] for section_info in required_commands_to_run_in_build
+        if section_info['cmd'] and all(p(repo_config) for p in section_info['prerequisites'])
+    ]
+
+
 # this one is actually pure, but deal has bug, that fires on this function on make deal_test
 def has_all_required_commands_in_build(
     required_commands_to_run_in_build: List[RequiredCICommandsConfig],
@@ -70,14 +82,15 @@ def has_all_required_commands_in_build(
     travis_data: TravisPipelineData,
 ) -> List[str]:
     errors: List[str] = []
-    for section_info in required_commands_to_run_in_build:
-        if not all(p(github_data['ow_repo_config']) for p in section_info['prerequisites']):
-            continue
-
-        section = section_info['cmd']
-        if not section:
-            continue
-        if not if_logs_has_any_of_commands(travis_data['last_build_commands'], section):
+    sections = get_required_commands_sections(
+        required_commands_to_run_in_build,
+        github_data['ow_repo_config'],
+    )
+    found_commands = CommandsMatcher(c for s in sections for c in s).find_in_log(
+        travis_data['last_build_commands'],
+    )
+    for section in sections:
+        if not found_commands.intersection(section):
             error_perfix = f'None of {",".join(section)} is' if len(
                 section) > 1 else f'{section[0]} is not'
             errors.append(f'{error_perfix} found in build')
@@ -214,28 +227,24 @@ def has_commits_in_last_n_months(
     return errors
 
 
-def fetch_code_climate_repo_id(
+def create_code_climate_api(
     owner: str,
     repo_name: str,
     code_climate_api_token: str,
-) -> Optional[str]:
-    cc_api = CodeClimateAPI.create(owner, repo_name, code_climate_api_token)
-    return cc_api.code_climate_repo_id
+) -> CodeClimateAPI:
+    return CodeClimateAPI.create(owner, repo_name, code_climate_api_token)
 
 
-def fetch_test_coverage(owner: str, repo_name: str, code_climate_api_token: str):
-    cc_api = CodeClimateAPI.create(owner, repo_name, code_climate_api_token)
-    return cc_api.get_test_coverage()
+def fetch_code_climate_repo_id(code_climate_api: CodeClimateAPI) -> Optional[str]:
+    return code_climate_api.code_climate_repo_id
 
 
-def fetch_code_climate_badge_token(
-    owner: str,
-    repo_name: str,
-    code_climate_api_token: str,
-) -> Optional[str]:
-    cc_api = CodeClimateAPI.create(owner, repo_name, code_climate_api_token)
-    badge_token = cc_api.get_badge_token()
-    return badge_token
+def fetch_test_coverage(code_climate_api: CodeClimateAPI):
+    return code_climate_api.get_test_coverage()
+
+
+def fetch_code_climate_badge_token(code_climate_api: CodeClimateAPI) -> Optional[str]:
+    return code_climate_api.get_badge_token()
 
 
 @deal.pure
@@ -446,6 +455,9 @@ def create_master_pipeline(**kwargs: Any) -> AdvancedComposer:
         'M01': has_no_stale_pull_requests,
     }
     return AdvancedComposer().update_parameters(**kwargs).update_without_prefix(  # noqa: ECE001
+        'create_',
+        create_code_climate_api,
+    ).update_without_prefix(
         'fetch_',
         fetch_code_climate_repo_id,
         fetch_test_coverage,
@@ -461,3 +473,59 @@ def create_master_pipeline(**kwargs: Any) -> AdvancedComposer:
         'compose_',
         compose_pull_requests_updated_at,
     ).update(**pipes)
+
+
+GITHUB_DATA_USAGE: Mapping[str, List[str]] = {
+    'D01': ['readme_file_name', 'readme_content'],
+    'D02': ['ow_repo_config', 'readme_content'],
+    'C01': ['ci_config_file_name', 'ci_config_content'],
+    'C03': ['ow_repo_config'],
+    'C04': ['readme_file_name', 'readme_content'],
+    'P01': ['ow_repo_config', 'ci_config_content'],
+    'package_name': ['file_with_package_name_content'],
+    'is_pypi_response_ok': ['ow_repo_config'],
+    'R01': ['ow_repo_config'],
+    'R02': ['ow_repo_config'],
+    'S01': ['last_commit_date'],
+    'T01': ['ow_repo_config'],
+    'T03': ['ow_repo_config'],
+    'T04': ['readme_file_name', 'readme_content'],
+    'issues_stale_days': ['open_issues', 'issues_comments'],
+    'I01': ['ow_repo_config', 'open_issues'],
+    'is_prs_ok_to_merge': ['open_pull_requests', 'pull_request_details'],
+    'pull_requests_updated_at': ['open_pull_requests', 'pull_request_details'],
+    'M01': ['open_pull_requests', 'detailed_pull_requests'],
+}
+TRAVIS_DATA_USAGE: Mapping[str, List[str]] = {
+    'C02': ['last_build'],
+    'C03': ['last_build_commands'],
+    'C04': ['badge_url'],
+    'C05': ['crontabs_info'],
+}
+
+
+@deal.pure
+def get_pipelines_data_usage(
+    master_pipeline: AdvancedComposer,
+    outputs: Iterable[str],
+) -> Tuple[Set[str], Set[str]]:
+    """Returns keys of github_data and travis_data, that are required to calculate outputs."""
+    nodes = master_pipeline.ancestor_dag(list(outputs)).nodes
+    github_data_keys = {k for n in nodes for k in GITHUB_DATA_USAGE.get(n, [])}
+    travis_data_keys = {k for n in nodes for k in TRAVIS_DATA_USAGE.get(n, [])}
+    return github_data_keys, travis_data_keys
+
+
+@deal.pure
+def get_nodes_with_unavailable_data(
+    github_data: Mapping[str, Any],
+    travis_data: Mapping[str, Any],
+) -> Set[str]:
+    """Returns nodes, that use github_data or travis_data keys, that failed to be fetched."""
+    data_with_usage = [(github_data, GITHUB_DATA_USAGE), (travis_data, TRAVIS_DATA_USAGE)]
+    return {
+        node
+        for (data, data_usage) in data_with_usage
+        for node, keys in data_usage.items()
+        if any(k not in data for k in keys)
+    }
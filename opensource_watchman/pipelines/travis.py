@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, List, Optional
 
 import deal
 
@@ -14,8 +14,11 @@ def fetch_last_build(api: TravisRepoAPI):
     return api.fetch_last_build_info()
 
 
-def fetch_last_build_commands(api: TravisRepoAPI):
-    return api.get_last_build_commands()
+def fetch_last_build_commands(
+    api: TravisRepoAPI,
+    required_commands_sections: Optional[List[List[str]]],
+):
+    return api.get_last_build_commands(required_commands_sections)
 
 
 def create_badge_url(owner: str, repo_name: str):
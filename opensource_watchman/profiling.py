@@ -0,0 +1,156 @@
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from types import FrameType
+from typing import Any, List, Optional, Tuple
+
+from opensource_watchman.common_types import RepoResult
+from opensource_watchman.config import (
+    PROFILE_DEFAULT_FILE_NAMES, PROFILE_MEMORY_TOP_ALLOCATION_SITES,
+    PROFILE_SAMPLING_INTERVAL_SECONDS,
+)
+
+
+class Profiler:
+    """Base class for profilers of run: context manager, notified about each processed repo."""
+
+    def __enter__(self) -> 'Profiler':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+    def observe_repo(self, repo_result: RepoResult) -> None:
+        pass
+
+
+class CpuProfiler(Profiler):
+    """
+    Sampling profiler, writes collapsed stacks of all threads for flamegraph tools.
+
+    Stacks are sampled by wall clock, so threads waiting for network or locks
+    are counted as well: it shows where repos processing waits, not only computes.
+    """
+
+    def __init__(
+        self,
+        output_path: str,
+        interval_seconds: float = PROFILE_SAMPLING_INTERVAL_SECONDS,
+    ) -> None:
+        self.output_path = output_path
+        self.interval_seconds = interval_seconds
+        self.stacks: Counter = Counter()
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_until_stopped, daemon=True)
+
+    def __enter__(self) -> 'CpuProfiler':
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self._stopped.set()
+        self._sampler.join()
+        with open(self.output_path, 'w') as output_file:
+            for stack, samples in sorted(self.stacks.items()):
+                output_file.write(f'{stack} {samples}\n')
+
+    def sample(self) -> None:
+        for thread_id, frame in sys._current_frames().items():  # noqa: WPS437
+            if thread_id != self._sampler.ident:
+                self.stacks[';'.join(reversed(get_frames_names(frame)))] += 1
+
+    def _sample_until_stopped(self) -> None:
+        while not self._stopped.wait(self.interval_seconds):
+            self.sample()
+
+
+class MemoryProfiler(Profiler):
+    """
+    Traces allocations with tracemalloc, reports memory after each repo and top allocation sites.
+
+    Allocation sites are taken from snapshot at the largest memory usage, observed
+    after repo was processed, so data, retained by repos in progress, is shown.
+    Full snapshot is taken only when usage grows, not after each repo.
+    """
+
+    def __init__(
+        self,
+        output_path: str,
+        top_allocation_sites: int = PROFILE_MEMORY_TOP_ALLOCATION_SITES,
+    ) -> None:
+        self.output_path = output_path
+        self.top_allocation_sites = top_allocation_sites
+        self.repos_memory: List[Tuple[str, int, int]] = []
+        self.largest_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._largest_memory = 0
+
+    def __enter__(self) -> 'MemoryProfiler':
+        tracemalloc.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        current_memory, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        with open(self.output_path, 'w') as output_file:
+            output_file.write(self.format_report(current_memory, peak_memory))
+
+    def observe_repo(self, repo_result: RepoResult) -> None:
+        current_memory, peak_memory = tracemalloc.get_traced_memory()
+        self.repos_memory.append(
+            (f'{repo_result.owner}/{repo_result.repo_name}', current_memory, peak_memory),
+        )
+        if current_memory > self._largest_memory:
+            self._largest_memory = current_memory
+            self.largest_snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(inclusive=False, filename_pattern=tracemalloc.__file__),
+            ])
+
+    def format_report(self, current_memory: int, peak_memory: int) -> str:
+        report_lines = [
+            f'Peak traced memory: {format_size(peak_memory)}',
+            f'Traced memory at the end of run: {format_size(current_memory)}',
+            '',
+            'Traced memory after each repo (current / peak so far):',
+            *(
+                f'  {repo} {format_size(current)} / {format_size(peak)}'
+                for repo, current, peak in self.repos_memory
+            ),
+        ]
+        if self.largest_snapshot is not None:
+            report_lines.extend([
+                '',
+                f'Top allocation sites at the largest usage ({format_size(self._largest_memory)}):',
+                *(
+                    f'  {s.traceback[0].filename}:{s.traceback[0].lineno} '
+                    f'{format_size(s.size)} in {s.count} blocks'
+                    for s in self.largest_snapshot.statistics('lineno')[:self.top_allocation_sites]
+                ),
+            ])
+        return '\n'.join([*report_lines, ''])
+
+
+def create_profiler(profile: Optional[str], output_path: Optional[str] = None) -> Profiler:
+    if profile == 'cpu':
+        return CpuProfiler(output_path or PROFILE_DEFAULT_FILE_NAMES['cpu'])
+    if profile == 'memory':
+        return MemoryProfiler(output_path or PROFILE_DEFAULT_FILE_NAMES['memory'])
+    return Profiler()
+
+
+def get_frames_names(frame: Optional[FrameType]) -> List[str]:
+    """Names of frame and its callers, innermost first, as module:function:line."""
+    frames_names = []
+    while frame is not None:
+        code = frame.f_code
+        module_name = frame.f_globals.get('__name__') or os.path.basename(code.co_filename)
+        frames_names.append(f'{module_name}:{code.co_name}:{code.co_firstlineno}')
+        frame = frame.f_back
+    return frames_names
+
+
+def format_size(size_bytes: int) -> str:
+    if size_bytes < 1024 * 1024:
+        return f'{size_bytes / 1024:.1f} KB'
+    return f'{size_bytes / 1024 / 1024:.1f} MB'
@@ -0,0 +1,111 @@
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Mapping, Optional, Set, Tuple
+
+from opensource_watchman.composer import AdvancedComposer
+from opensource_watchman.pipelines.master import get_pipelines_data_usage
+
+
+NOT_BY_CHECKS = 'not_by_checks'
+
+NodeKey = Tuple[Optional[str], Optional[str]]
+
+
+class RequestsUsage:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.exclusive_requests = 0
+        self.not_modified = 0
+        self.response_bytes = 0
+        self.seconds: float = 0
+
+    def add(self, other: 'RequestsUsage', is_exclusive: bool) -> None:
+        self.requests += other.requests
+        self.exclusive_requests += other.requests if is_exclusive else 0
+        self.not_modified += other.not_modified
+        self.response_bytes += other.response_bytes
+        self.seconds += other.seconds
+
+    def to_json(self) -> Mapping[str, Any]:
+        return {
+            'requests': self.requests,
+            'exclusive_requests': self.exclusive_requests,
+            'not_modified': self.not_modified,
+            'response_bytes': self.response_bytes,
+            'seconds': round(self.seconds, 3),
+        }
+
+
+class QuotaUsage:
+    """
+    Api usage of each host by pipeline nodes, that caused requests.
+
+    Usage of node is attributed to all checks, that depend on the node. Requests,
+    needed by single check only, are exclusive: skipping the check saves them.
+    Not modified (304) responses of conditional requests do not cost GitHub quota.
+    """
+
+    def __init__(self) -> None:
+        self.usage: Dict[Tuple[NodeKey, str], RequestsUsage] = {}
+        self._lock = threading.Lock()
+
+    def observe_request(  # noqa: CFQ002
+        self,
+        node_key: NodeKey,
+        host: str,
+        status_code: int,
+        response_bytes: int,
+        seconds: float,
+    ) -> None:
+        with self._lock:
+            node_usage = self.usage.setdefault((node_key, host), RequestsUsage())
+            node_usage.requests += 1
+            node_usage.not_modified += status_code == 304
+            node_usage.response_bytes += response_bytes
+            node_usage.seconds += seconds
+
+    def get_usage_by_checks(
+        self,
+        checks_by_nodes: Mapping[NodeKey, Set[str]],
+    ) -> Mapping[str, Mapping[str, Mapping[str, Any]]]:
+        checks_usage: Dict[str, Dict[str, RequestsUsage]] = defaultdict(dict)
+        with self._lock:
+            for (node_key, host), node_usage in self.usage.items():
+                checks = checks_by_nodes.get(node_key) or {NOT_BY_CHECKS}
+                for check in checks:
+                    checks_usage[check].setdefault(host, RequestsUsage()).add(
+                        node_usage,
+                        is_exclusive=len(checks) == 1,
+                    )
+        return {
+            check: {host: u.to_json() for host, u in sorted(hosts_usage.items())}
+            for check, hosts_usage in sorted(checks_usage.items())
+        }
+
+
+def get_checks_by_nodes(
+    master_pipeline: AdvancedComposer,
+    data_pipelines: Mapping[str, AdvancedComposer],
+    checks: Iterable[str],
+) -> Mapping[NodeKey, Set[str]]:
+    """
+    Returns checks, that depend on each node of master, github and travis pipelines.
+
+    Data pipelines are keyed by names of pipelines, which data is used by master
+    pipeline: github and travis.
+    """
+    checks_by_nodes: Dict[NodeKey, Set[str]] = defaultdict(set)
+    for check in checks:
+        for node in master_pipeline.ancestor_dag([check]).nodes:
+            checks_by_nodes[('master', node)].add(check)
+        github_data_keys, travis_data_keys = get_pipelines_data_usage(master_pipeline, [check])
+        for pipeline_name, data_keys in [
+            ('github', github_data_keys),
+            ('travis', travis_data_keys),
+        ]:
+            pipeline = data_pipelines[pipeline_name]
+            pipeline_nodes = set(pipeline.dag().nodes)
+            outputs = [k for k in data_keys if k in pipeline_nodes]
+            for node in pipeline.ancestor_dag(outputs).nodes if outputs else []:
+                checks_by_nodes[(pipeline_name, node)].add(check)
+    return checks_by_nodes
@@ -1,21 +1,71 @@
+import asyncio
+import contextlib
+import functools
 import json
 import logging
-import operator
 import os
-from typing import Optional, List
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait,
+)
+from typing import (
+    Any, Callable, ContextManager, Dict, Iterable, Iterator, Mapping, Optional, List, Set, Tuple,
+    Union,
+)
 
-from click import command, option, argument, Choice
+import deal
+from click import (
+    command, option, argument, Choice, IntRange, Context, Parameter, BadParameter, UsageError,
+)
 
 from opensource_watchman.common_types import RepoResult, OpensourceWatchmanConfig
-from opensource_watchman.config import DEFAULT_HTML_REPORT_FILE_NAME
-from opensource_watchman.output_processors import print_errors_data, prepare_html_report
+from opensource_watchman.composer import AdvancedComposer
+from opensource_watchman.config import (
+    DEFAULT_HTML_REPORT_FILE_NAME, CACHE_DB_FILE_NAME, ERRORS_SEVERITY, CLOCK_DEPENDENT_CHECKS,
+    HTTP_RETRIES, HTML_TEMPLATES_CACHE_DIR_NAME, PROFILE_DEFAULT_FILE_NAMES,
+    GITHUB_SECONDARY_RATE_LIMIT_POINTS_PER_MINUTE, REPOS_QUEUED_PER_JOB,
+)
+from opensource_watchman.incremental import (
+    RepoState, RepoStateStore, fetch_listed_repo_info, fetch_repo_inputs_versions,
+    is_repo_unchanged,
+)
+from opensource_watchman.instrumentation import (
+    Instrumentation, export_instrumentation, set_up_instrumentation,
+)
+from opensource_watchman.profiling import Profiler, create_profiler
+from opensource_watchman.quota import NodeKey, get_checks_by_nodes
+from opensource_watchman.tracing import in_current_context, span
+from opensource_watchman.output_processors import (
+    ResultsStream, create_results_stream, prepare_html_report, print_http_stat,
+    print_usage_by_checks, set_templates_bytecode_cache_dir,
+)
 from opensource_watchman.pipelines.github import create_github_pipeline
+from opensource_watchman.pipelines.github_graphql import update_with_graphql_data_source
 from opensource_watchman.pipelines.travis import create_travis_pipeline
-from opensource_watchman.pipelines.master import create_master_pipeline
+from opensource_watchman.pipelines.master import (
+    create_master_pipeline, get_pipelines_data_usage, get_nodes_with_unavailable_data,
+    get_required_commands_sections,
+)
 from opensource_watchman.prerequisites import python_only, rus_only
 from opensource_watchman.api.github import GithubRepoAPI
+from opensource_watchman.api.http_cache import ConditionalRequestsCache
+from opensource_watchman.api.recording import HttpRecorder, HttpReplayer, get_http_archive
+from opensource_watchman.api.rate_limit import GithubRateLimiter, get_github_api_tokens
+from opensource_watchman.api.retries import CircuitBreakers, RetryWithBackoff
+from opensource_watchman.api.single_flight import SingleFlight
+from opensource_watchman.api.transport import Transport, TransportLayer, set_transport
+from opensource_watchman.api.travis import set_job_commands_cache
+from opensource_watchman.utils.images import set_image_size_cache
+from opensource_watchman.utils.storage import SqliteStore
 
 
+DEFAULT_HTML_TEMPLATE_PATH = os.path.join(
+    os.path.dirname(__file__),
+    'templates',
+    'report_template.html',
+)
+
 logger = logging.getLogger('super_mario')
 logger.setLevel(logging.DEBUG)
 
@@ -29,6 +79,10 @@ def load_config() -> OpensourceWatchmanConfig:
         package_name_path='setup.py:package_name',
         github_login=os.environ['GITHUB_USERNAME'],
         github_api_token=os.environ['GITHUB_API_TOKEN'],
+        github_api_tokens=get_github_api_tokens(
+            os.environ.get('GITHUB_API_TOKENS'),
+            os.environ['GITHUB_API_TOKEN'],
+        ),
         travis_api_login=os.environ['TRAVIS_CI_ORG_ACCESS_TOKEN'],
         required_readme_sections=[
             ['installation'],
@@ -53,88 +107,409 @@ def load_config() -> OpensourceWatchmanConfig:
     )
 
 
+def get_repos(
+    owner: str,
+    github_login: str,
+    github_token: str,
+    skip_archived: bool,
+) -> Iterator[Mapping[str, Any]]:
+    """Yields repos info, most recently updated first, while listing is still fetched."""
+    for repo in GithubRepoAPI(owner, None, github_login, github_token).iterate_repos_list():
+        if skip_archived and repo['archived']:
+            continue
+        yield repo
+
+
 def get_repos_names(
     owner: str,
     github_login: str,
     github_token: str,
     skip_archived: bool,
-) -> List[str]:
-    repos = GithubRepoAPI(owner, None, github_login, github_token).fetch_repos_list() or []
-    if skip_archived:
-        repos = [r for r in repos if not r['archived']]
-    repos.sort(key=operator.itemgetter('updated_at'))
-    return [r['name'] for r in reversed(repos)]
+) -> Iterator[str]:
+    return (r['name'] for r in get_repos(owner, github_login, github_token, skip_archived))
+
+
+def get_checks_to_run(only: Iterable[str], skip: Iterable[str]) -> Optional[List[str]]:
+    if not only and not skip:
+        return None
+    return [c for c in (only or ERRORS_SEVERITY.keys()) if c not in skip]
+
+
+def create_repo_master_pipeline(owner: str, repo_name: str, config) -> AdvancedComposer:
+    return create_master_pipeline(
+        owner=owner,
+        repo_name=repo_name,
+        package_name_path=config.package_name_path,
+        required_readme_sections=config.required_readme_sections,
+        required_commands_to_run_in_build=config.required_commands_to_run_in_build,
+        required_python_versions=config.required_python_versions,
+        max_age_of_last_commit_in_months=config.max_age_of_last_commit_in_months,
+        code_climate_api_token=config.code_climate_api_token,
+        min_test_coverage_percents=config.min_test_coverage_percents,
+        min_number_of_actual_issues=config.min_number_of_actual_issues,
+        max_issue_update_age_months=config.max_issue_update_age_months,
+        max_ok_pr_age_days=config.max_ok_pr_age_days,
+    )
+
+
+def create_repo_github_pipeline(owner: str, repo_name: str, config) -> AdvancedComposer:
+    github_pipeline = create_github_pipeline(
+        owner=owner,
+        repo_name=repo_name,
+        config_file_name=config.config_file_name,
+        config_section_name=config.config_section_name,
+        readme_file_name=config.readme_file_name,
+        ci_config_file_name=config.ci_config_file_name,
+        package_name_path=config.package_name_path,
+        github_login=config.github_login,
+        github_api_token=config.github_api_token,
+    )
+    if config.github_data_source == 'graphql':
+        return update_with_graphql_data_source(github_pipeline)
+    return github_pipeline
+
+
+def create_repo_travis_pipeline(
+    owner: str,
+    repo_name: str,
+    config,
+    required_commands_sections: Optional[List[List[str]]] = None,
+) -> AdvancedComposer:
+    return create_travis_pipeline(
+        owner=owner,
+        repo_name=repo_name,
+        travis_api_login=config.travis_api_login,
+        required_commands_sections=required_commands_sections,
+    )
+
+
+def run_github_pipeline(
+    owner: str,
+    repo_name: str,
+    config,
+    outputs: Optional[Iterable[str]],
+) -> Mapping[str, Any]:
+    github_pipeline = create_repo_github_pipeline(owner, repo_name, config)
+    with span('github', 'pipeline'):
+        return github_pipeline.run_all(config.pipeline_jobs, outputs)
+
+
+def run_travis_pipeline(
+    owner: str,
+    repo_name: str,
+    config,
+    outputs: Optional[Iterable[str]],
+    required_commands_sections: Optional[List[List[str]]] = None,
+) -> Mapping[str, Any]:
+    if outputs is not None and not outputs:
+        return {}
+    travis_pipeline = create_repo_travis_pipeline(
+        owner, repo_name, config, required_commands_sections,
+    )
+    with span('travis', 'pipeline'):
+        return travis_pipeline.run_all(config.pipeline_jobs, outputs)
+
+
+def process_repo(owner: str, repo_name: str, config) -> RepoResult:
+    return evaluate_repo(owner, repo_name, config)[0]
+
 
+def evaluate_repo(
+    owner: str,
+    repo_name: str,
+    config,
+) -> Tuple[RepoResult, Mapping[str, Any]]:
+    pipeline = create_repo_master_pipeline(owner, repo_name, config)
+    master_outputs = None
+    github_outputs: Optional[Set[str]] = None
+    travis_outputs: Optional[Set[str]] = None
+    if config.checks_to_run is not None:
+        master_outputs = ['package_name', *config.checks_to_run]
+        github_outputs, travis_outputs = get_pipelines_data_usage(pipeline, master_outputs)
+        github_outputs.add('project_description')
 
-def run_watchman(  # noqa: CFQ001
+    github_results = run_github_pipeline(owner, repo_name, config, github_outputs)
+    travis_results = run_travis_pipeline(
+        owner,
+        repo_name,
+        config,
+        travis_outputs,
+        required_commands_sections=get_required_commands_sections(
+            config.required_commands_to_run_in_build,
+            github_results['ow_repo_config'],
+        ) if 'ow_repo_config' in github_results else None,
+    )
+    with span('master', 'pipeline'):
+        pipeline_results = pipeline.update_parameters(
+            github_data=github_results,
+            travis_data=travis_results,
+        ).run_all(
+            config.pipeline_jobs,
+            master_outputs,
+            unavailable_nodes=get_nodes_with_unavailable_data(github_results, travis_results),
+        )
+
+    errors_info = {c: e for (c, e) in pipeline_results.items() if len(c) == 3 and e}
+    repo_result = RepoResult(
+        owner=owner,
+        package_name=pipeline_results.get('package_name'),
+        description=github_results.get('project_description'),
+        badges_urls=github_results.get('badges_urls', []),
+        repo_name=repo_name,
+        errors=errors_info,
+        unknown_checks=[
+            c for c in (config.checks_to_run or ERRORS_SEVERITY.keys())
+            if c not in pipeline_results
+        ],
+    )
+    return repo_result, github_results
+
+
+def reevaluate_clock_dependent_checks(
+    owner: str,
+    repo_state: RepoState,
+    config,
+) -> RepoResult:
+    with span('master', 'pipeline', reevaluated=True):
+        pipeline_results = create_repo_master_pipeline(
+            owner,
+            repo_state.result.repo_name,
+            config,
+        ).update_parameters(
+            github_data=repo_state.clock_dependent_data,
+            travis_data={},
+        ).run_all(config.pipeline_jobs, CLOCK_DEPENDENT_CHECKS)
+    errors_info = {
+        c: e for (c, e) in repo_state.result.errors.items()
+        if c not in CLOCK_DEPENDENT_CHECKS
+    }
+    errors_info.update({
+        c: pipeline_results[c] for c in CLOCK_DEPENDENT_CHECKS if pipeline_results[c]
+    })
+    return repo_state.result._replace(errors=errors_info)
+
+
+def process_repo_incrementally(
+    owner: str,
+    repo_info: Mapping[str, Any],
+    config,
+    state_store: RepoStateStore,
+) -> RepoResult:
+    """
+    Fully processes repo only if it or its inputs were changed since last run.
+
+    Clock-dependent checks of unchanged repo are re-evaluated against stored data.
+    State older than max age is not trusted: repo is fully processed.
+    """
+    repo_name = repo_info['name']
+    if 'pushed_at' not in repo_info:  # repo is given by name, not listed
+        repo_info = fetch_listed_repo_info(owner, repo_name, config)
+    repo_state = state_store.get(owner, repo_name)
+    evaluated_at = time.time()
+    package_name = repo_state.result.package_name if repo_state else None
+    inputs_versions = fetch_repo_inputs_versions(owner, repo_name, package_name, config)
+    if repo_state and is_repo_unchanged(repo_state, repo_info, inputs_versions, evaluated_at):
+        return reevaluate_clock_dependent_checks(owner, repo_state, config)
+
+    repo_result, github_results = evaluate_repo(owner, repo_name, config)
+    if repo_result.unknown_checks:
+        return repo_result
+    if repo_result.package_name != package_name:
+        inputs_versions = fetch_repo_inputs_versions(
+            owner, repo_name, repo_result.package_name, config,
+        )
+    clock_dependent_keys = get_pipelines_data_usage(
+        create_repo_master_pipeline(owner, repo_name, config),
+        CLOCK_DEPENDENT_CHECKS,
+    )[0]
+    state_store.save(owner, repo_name, RepoState(
+        pushed_at=repo_info.get('pushed_at'),
+        updated_at=repo_info.get('updated_at'),
+        result=repo_result,
+        clock_dependent_data={k: github_results[k] for k in clock_dependent_keys},
+        inputs_versions=inputs_versions,
+        evaluated_at=evaluated_at,
+    ))
+    return repo_result
+
+
+def process_listed_repo(
+    owner: str,
+    repo_info: Mapping[str, Any],
+    config,
+    state_store: Optional[RepoStateStore],
+) -> RepoResult:
+    with span(f'{owner}/{repo_info["name"]}', 'repo'):
+        if state_store is None:
+            return process_repo(owner, repo_info['name'], config)
+        return process_repo_incrementally(owner, repo_info, config, state_store)
+
+
+def get_repos_to_process(
     owner: str,
     repo_name: Optional[str],
     exclude_list: List[str],
     config,
-) -> List[RepoResult]:
-    repos_info = []
-
-    repos_to_process = (
-        [repo_name]
-        if repo_name else
-        [
-            r for r in get_repos_names(
-                owner,
-                config.github_login,
-                config.github_api_token,
-                skip_archived=True,
-            )
-            if r not in exclude_list
-        ]
-    )
-    for repo_to_process in repos_to_process:
-        github_pipeline = create_github_pipeline(
-            owner=owner,
-            repo_name=repo_to_process,
-            config_file_name=config.config_file_name,
-            config_section_name=config.config_section_name,
-            readme_file_name=config.readme_file_name,
-            ci_config_file_name=config.ci_config_file_name,
-            package_name_path=config.package_name_path,
-            github_login=config.github_login,
-            github_api_token=config.github_api_token,
+) -> Iterator[Mapping[str, Any]]:
+    if repo_name:
+        return iter([{'name': repo_name}])
+    return (
+        r for r in get_repos(
+            owner,
+            config.github_login,
+            config.github_api_token,
+            skip_archived=True,
         )
-        github_results = github_pipeline.run_all()
-        travis_pipeline = create_travis_pipeline(
-            owner=owner,
-            repo_name=repo_to_process,
-            travis_api_login=config.travis_api_login,
+        if r['name'] not in exclude_list
+    )
+
+
+def run_watchman(
+    owner: str,
+    repo_name: Optional[str],
+    exclude_list: List[str],
+    config,
+    jobs: int = 1,
+    state_store: Optional[RepoStateStore] = None,
+    on_repo_processed: Optional[Callable[[RepoResult], Any]] = None,
+) -> List[RepoResult]:
+    """
+    Processes repos concurrently, returns their results in order of repos listing.
+
+    on_repo_processed is called in calling thread with result of each repo
+    as soon as the repo is processed, so results can be emitted while run goes on.
+    """
+    if state_store is not None and config.checks_to_run is not None:
+        logger.warning(
+            'Incremental mode is bypassed: stored results of all checks can not be updated, '
+            'when only some of checks are selected (--only, --skip)',
         )
-        travis_results = travis_pipeline.run_all()
+        state_store = None
+    repos_to_process = get_repos_to_process(owner, repo_name, exclude_list, config)
+    futures: List[Future] = []
+    repos_results: Dict[Future, RepoResult] = {}
 
-        pipeline = create_master_pipeline(
-            owner=owner,
-            repo_name=repo_to_process,
-            package_name_path=config.package_name_path,
-            github_data=github_results,
-            travis_data=travis_results,
-            required_readme_sections=config.required_readme_sections,
-            required_commands_to_run_in_build=config.required_commands_to_run_in_build,
-            required_python_versions=config.required_python_versions,
-            max_age_of_last_commit_in_months=config.max_age_of_last_commit_in_months,
-            code_climate_api_token=config.code_climate_api_token,
-            min_test_coverage_percents=config.min_test_coverage_percents,
-            min_number_of_actual_issues=config.min_number_of_actual_issues,
-            max_issue_update_age_months=config.max_issue_update_age_months,
-            max_ok_pr_age_days=config.max_ok_pr_age_days,
+    def collect_result(future: Future, processed_repo_name: str) -> None:
+        try:
+            repos_results[future] = future.result()
+        except Exception:  # noqa: B902
+            logger.exception(f'Failed to process {owner}/{processed_repo_name}')
+            return
+        if on_repo_processed is not None:
+            on_repo_processed(repos_results[future])
+
+    with contextlib.ExitStack() as run_stack:
+        run_stack.enter_context(contracts_disabled())
+        run_stack.enter_context(span(owner, 'run', jobs=jobs))
+        executor = run_stack.enter_context(ThreadPoolExecutor(max_workers=jobs))
+        process_repo_in_worker = in_current_context(process_listed_repo)
+        # Listing is consumed lazily: results are passed on while its next pages are fetched.
+        not_done: Dict[Future, str] = {}
+        for repo_info in repos_to_process:
+            future = executor.submit(process_repo_in_worker, owner, repo_info, config, state_store)
+            futures.append(future)
+            not_done[future] = repo_info['name']
+            if len(not_done) >= jobs * REPOS_QUEUED_PER_JOB:
+                done, _ = wait(not_done, return_when=FIRST_COMPLETED)
+                for done_future in done:
+                    collect_result(done_future, not_done.pop(done_future))
+        for future in as_completed(not_done):
+            collect_result(future, not_done[future])
+    return [repos_results[f] for f in futures if f in repos_results]
+
+
+def run_watchman_with_observers(  # noqa: CFQ002
+    owner: str,
+    repo_name: Optional[str],
+    exclude_list: List[str],
+    config,
+    jobs: int,
+    state_store: Optional[RepoStateStore],
+    observers: List[Union[Profiler, ResultsStream]],
+) -> List[RepoResult]:
+    """Runs watchman within observers (profilers, results streams), notified about each repo."""
+
+    def observe_repo(repo_result: RepoResult) -> None:
+        for observer in observers:
+            observer.observe_repo(repo_result)
+
+    with contextlib.ExitStack() as observers_stack:
+        for observer in observers:
+            observers_stack.enter_context(observer)
+        return run_watchman(
+            owner, repo_name, exclude_list, config, jobs, state_store, observe_repo,
         )
-        pipeline_results = pipeline.run_all()
 
-        errors_info = {c: e for (c, e) in pipeline_results.items() if len(c) == 3 and e}
-        repos_info.append(RepoResult(
-            owner=owner,
-            package_name=pipeline_results['package_name'],
-            description=github_results['project_description'],
-            badges_urls=github_results['badges_urls'],
-            repo_name=repo_to_process,
-            errors=errors_info,
+
+async def run_watchman_async(  # noqa: CFQ002
+    owner: str,
+    repo_name: Optional[str],
+    exclude_list: List[str],
+    config,
+    jobs: int = 1,
+    state_store: Optional[RepoStateStore] = None,
+    on_repo_processed: Optional[Callable[[RepoResult], Any]] = None,
+) -> List[RepoResult]:
+    """
+    Runs run_watchman in a thread of default executor, so asyncio application can await it.
+
+    This is only thread offload wrapper, not asyncio backend: api requests are made with
+    blocking transport, each repo in progress takes one of jobs worker threads.
+    on_repo_processed is called in event loop thread, before the run is awaited.
+    """
+    loop = asyncio.get_running_loop()
+
+    def on_repo_processed_in_loop(repo_result: RepoResult) -> None:
+        if on_repo_processed is not None:
+            loop.call_soon_threadsafe(on_repo_processed, repo_result)
+
+    return await loop.run_in_executor(None, functools.partial(
+        run_watchman,
+        owner, repo_name, exclude_list, config, jobs, state_store, on_repo_processed_in_loop,
+    ))
+
+
+def get_cache_db_path(cache_dir: str) -> str:
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, CACHE_DB_FILE_NAME)
+
+
+def create_transport(  # noqa: CFQ002
+    warm_up_connections: bool,
+    cache_dir: Optional[str],
+    github_api_tokens: Optional[List[str]] = None,
+    http_retries: int = HTTP_RETRIES,
+    record_dir: Optional[str] = None,
+    replay_dir: Optional[str] = None,
+    instrumentation_layers: Iterable[TransportLayer] = (),
+    github_points_per_minute: Mapping[str, int] = GITHUB_SECONDARY_RATE_LIMIT_POINTS_PER_MINUTE,
+) -> Transport:
+    """
+    Creates transport with all layers, configured by cli options.
+
+    github_points_per_minute paces requests to each github api within its
+    secondary rate limit; empty mapping disables pacing (fake api servers, etc).
+    """
+    if replay_dir:
+        return Transport(layers=[
+            SingleFlight(), *instrumentation_layers, HttpReplayer(get_http_archive(replay_dir)),
+        ])
+    layers: List[TransportLayer] = [SingleFlight()]
+    if record_dir:
+        layers.append(HttpRecorder(get_http_archive(record_dir)))
+    layers.extend([CircuitBreakers(), RetryWithBackoff(http_retries)])
+    if cache_dir:
+        layers.append(ConditionalRequestsCache(
+            SqliteStore(get_cache_db_path(cache_dir), 'conditional_requests'),
         ))
-    return repos_info
+    layers.append(GithubRateLimiter(
+        github_api_tokens or [],
+        points_per_minute=github_points_per_minute,
+    ))
+    transport = Transport(layers=[*layers, *instrumentation_layers])
+    if warm_up_connections:
+        transport.warm_up()
+    return transport
 
 
 def process_results(  # noqa: CFQ002
@@ -145,10 +520,10 @@ def process_results(  # noqa: CFQ002
     extra_context_provider_py_name: Optional[str],
     result_filename: Optional[str],
     config,
+    html_report_page_size: Optional[int] = None,
 ):
-    if output_type == 'term':
-        print_errors_data(repos_stat)
-    elif output_type == 'json':
+    """Outputs results, that need all repos at once; term and jsonl results are streamed."""
+    if output_type == 'json':
         print(json.dumps(repos_stat))  # noqa: T001
     elif output_type == 'html' and html_template_path:
         prepare_html_report(
@@ -158,50 +533,256 @@ def process_results(  # noqa: CFQ002
             extra_context_provider_py_name=extra_context_provider_py_name,
             result_filename=result_filename or DEFAULT_HTML_REPORT_FILE_NAME,
             config=config,
+            page_size=html_report_page_size,
         )
 
 
+def validate_options(
+    incremental: bool,
+    cache_dir: Optional[str],
+    record_dir: Optional[str],
+    replay_dir: Optional[str],
+) -> None:
+    if incremental and not cache_dir:
+        raise UsageError('--incremental requires --cache_dir')
+    if record_dir and replay_dir:
+        raise UsageError('--record and --replay can not be used together')
+
+
+def set_up_caches(cache_dir: Optional[str], incremental: bool) -> Optional[RepoStateStore]:
+    """Makes persistent caches live in cache dir, returns repos state store for incremental run."""
+    if not cache_dir:
+        return None
+    set_image_size_cache(SqliteStore(get_cache_db_path(cache_dir), 'image_sizes'))
+    set_job_commands_cache(SqliteStore(get_cache_db_path(cache_dir), 'travis_job_commands'))
+    set_templates_bytecode_cache_dir(os.path.join(cache_dir, HTML_TEMPLATES_CACHE_DIR_NAME))
+    if not incremental:
+        return None
+    return RepoStateStore(SqliteStore(get_cache_db_path(cache_dir), 'repos_state'))
+
+
+def get_checks_by_nodes_of_pipelines(owner: str, config) -> Mapping[NodeKey, Set[str]]:
+    """Checks, that depend on each pipeline node; pipelines of all repos have same nodes."""
+    return get_checks_by_nodes(
+        create_repo_master_pipeline(owner, '', config),
+        {
+            'github': create_repo_github_pipeline(owner, '', config),
+            'travis': create_repo_travis_pipeline(owner, '', config),
+        },
+        config.checks_to_run or ERRORS_SEVERITY.keys(),
+    )
+
+
+def report_run_stat(  # noqa: CFQ002
+    owner: str,
+    config,
+    transport: Transport,
+    instrumentation: Instrumentation,
+    metrics_file: Optional[str],
+    trace_file: Optional[str],
+) -> None:
+    print_http_stat(transport.stat())
+    if instrumentation.quota_usage is not None:
+        print_usage_by_checks(instrumentation.quota_usage.get_usage_by_checks(
+            get_checks_by_nodes_of_pipelines(owner, config),
+        ))
+    export_instrumentation(instrumentation, metrics_file, trace_file)
+
+
+class ContractsSwitch:
+    """
+    Turns runtime contracts checks off while at least one run is in progress.
+
+    Every run processes data in threads (repos, pipeline nodes, badges probes, travis jobs,
+    pages prefetch). deal checks purity by swapping sys.stdout, sys.stderr and socket.socket
+    and keeps originals on shared decorator, so concurrent checks may leave them swapped.
+    Contracts are checked by tests and `deal test` instead. The switch of deal is process-wide,
+    so runs are counted: contracts are restored only when the last of overlapping runs finishes.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._runs_in_progress = 0
+        self._were_enabled = False
+
+    @contextlib.contextmanager
+    def disabled(self) -> Iterator[None]:
+        with self._lock:
+            if not self._runs_in_progress:
+                self._were_enabled = deal.state.debug
+                deal.disable()
+            self._runs_in_progress += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._runs_in_progress -= 1
+                if not self._runs_in_progress and self._were_enabled:
+                    deal.enable()
+
+
+_contracts_switch = ContractsSwitch()
+
+
+def contracts_disabled() -> ContextManager[None]:
+    """Turns runtime contracts checks off for the run, see ContractsSwitch."""
+    return _contracts_switch.disabled()
+
+
+def parse_checks_codes(ctx: Context, param: Parameter, values: Iterable[str]) -> List[str]:
+    checks_codes = [c.strip().upper() for v in values for c in v.split(',') if c.strip()]
+    unknown_checks_codes = [c for c in checks_codes if c not in ERRORS_SEVERITY]
+    if unknown_checks_codes:
+        raise BadParameter(f'unknown validators: {", ".join(unknown_checks_codes)}')
+    return checks_codes
+
+
 @command()
 @argument('owner')
 @option('--repo_name', help='name of exact repo to check')
 @option('--config_path', help='path to cfg file')
-@option('--skip', 'exclude_list', help='list of validators to skip', multiple=True)
+@option('--exclude_repo', 'exclude_list', help='name of repo to skip', multiple=True)
 @option(
-    '--output_type', help='output format', type=Choice(['term', 'json', 'html']), default='term')
+    '--only',
+    help='comma-separated list of validators to run, e.g. C02,S01',
+    multiple=True,
+    callback=parse_checks_codes,
+)
+@option(
+    '--skip',
+    help='comma-separated list of validators to skip, e.g. I01,M01',
+    multiple=True,
+    callback=parse_checks_codes,
+)
+@option(
+    '--output_type',
+    help='output format, term and jsonl are printed as soon as each repo is processed',
+    type=Choice(['term', 'json', 'jsonl', 'html']),
+    default='term',
+)
 @option('--html_template_path', help='path to result html jinja template to render')
 @option(
     '--extra_context_provider_py_name',
     help='importable path of callable, that provides additional context for html template',
 )
 @option('--result_filename', help='result filename')
+@option(
+    '--html_report_page_size',
+    help='split html report to pages of given number of repos, result file is the first page',
+    type=IntRange(min=1),
+)
+@option('--jobs', help='number of repos to process concurrently', type=IntRange(min=1), default=1)
+@option(
+    '--warm_up_connections',
+    help='open connections to all api hosts before run',
+    is_flag=True,
+    default=False,
+)
+@option(
+    '--pipeline_jobs',
+    help='number of pipeline steps of single repo to run concurrently',
+    type=IntRange(min=1),
+    default=1,
+)
+@option('--cache_dir', help='directory to keep persistent http and badges caches in')
+@option(
+    '--github_data_source',
+    help='api to fetch issues and pull requests with',
+    type=Choice(['rest', 'graphql']),
+    default='rest',
+)
+@option(
+    '--http_retries',
+    help='number of retries of failed idempotent api requests',
+    type=IntRange(min=0),
+    default=HTTP_RETRIES,
+)
+@option('--record', 'record_dir', help='directory to record all api responses to')
+@option(
+    '--replay',
+    'replay_dir',
+    help='directory with recorded api responses to run from, without network',
+)
+@option(
+    '--incremental',
+    help='fully process only repos changed since previous run, requires --cache_dir',
+    is_flag=True,
+    default=False,
+)
+@option(
+    '--metrics_file',
+    help='file to export nodes and http metrics to: json if it ends with .json, '
+    'Prometheus textfile otherwise',
+)
+@option(
+    '--trace',
+    'trace_file',
+    help='file to write spans of repos, pipelines, nodes and http requests to, '
+    'in Chrome trace format (can be opened in Perfetto)',
+)
+@option(
+    '--profile',
+    help='profile run: cpu writes collapsed stacks for flamegraphs, '
+    'memory writes tracemalloc report with usage after each repo and top allocation sites',
+    type=Choice(list(PROFILE_DEFAULT_FILE_NAMES)),
+)
+@option('--profile_file', help='file to write profile to')
+@option(
+    '--quota_by_checks',
+    help='print api requests, traffic and time, spent on each check, per host',
+    is_flag=True,
+    default=False,
+)
 def main(  # noqa: CFQ002
     owner: str,
     repo_name: Optional[str],
     config_path: Optional[str],
     exclude_list: List[str],
+    only: List[str],
+    skip: List[str],
     output_type: str,
     html_template_path: Optional[str],
     extra_context_provider_py_name: Optional[str],
     result_filename: Optional[str],
+    html_report_page_size: Optional[int],
+    jobs: int,
+    warm_up_connections: bool,
+    pipeline_jobs: int,
+    cache_dir: Optional[str],
+    github_data_source: str,
+    http_retries: int,
+    record_dir: Optional[str],
+    replay_dir: Optional[str],
+    incremental: bool,
+    metrics_file: Optional[str],
+    trace_file: Optional[str],
+    profile: Optional[str],
+    profile_file: Optional[str],
+    quota_by_checks: bool,
 ):
     """Run opensource watchman"""
-    config = load_config()
-    repos_stat = run_watchman(owner, repo_name, exclude_list, config)
-    default_template_path = os.path.join(
-        os.path.dirname(__file__),
-        'templates',
-        'report_template.html',
+    validate_options(incremental, cache_dir, record_dir, replay_dir)
+    config = load_config()._replace(
+        github_data_source=github_data_source,
+        pipeline_jobs=pipeline_jobs,
+        checks_to_run=get_checks_to_run(only, skip),
+    )
+    instrumentation = set_up_instrumentation(metrics_file, trace_file, quota_by_checks)
+    transport = create_transport(
+        warm_up_connections and not replay_dir, cache_dir, config.github_api_tokens,
+        http_retries, record_dir, replay_dir, instrumentation.get_transport_layers(),
+    )
+    set_transport(transport)
+    state_store = set_up_caches(cache_dir, incremental)
+    repos_stat = run_watchman_with_observers(
+        owner, repo_name, exclude_list, config, jobs, state_store,
+        [create_profiler(profile, profile_file), create_results_stream(output_type)],
     )
-    html_template_path = html_template_path or default_template_path
     process_results(
-        owner,
-        repos_stat,
-        output_type,
-        html_template_path,
-        extra_context_provider_py_name,
-        result_filename,
-        config,
+        owner, repos_stat, output_type, html_template_path or DEFAULT_HTML_TEMPLATE_PATH,
+        extra_context_provider_py_name, result_filename, config, html_report_page_size,
     )
+    report_run_stat(owner, config, transport, instrumentation, metrics_file, trace_file)
 
 
 if __name__ == '__main__':
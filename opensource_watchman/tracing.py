@@ -0,0 +1,127 @@
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, TypeVar
+
+
+T = TypeVar('T')
+
+_enclosing_spans: contextvars.ContextVar[Mapping[str, Any]] = contextvars.ContextVar(
+    'enclosing_spans',
+    default={},
+)
+
+
+class Tracer:
+    """
+    Records spans of run, repos, pipelines, nodes and http requests as Chrome trace events.
+
+    Spans are drawn on tracks of threads they were run in. Each span gets
+    attributes of its enclosing spans (run, repo, pipeline) even if it runs
+    in other thread, so spans of a repo can be found and filtered in Perfetto.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.clock = clock
+        self.started_at = clock()
+        self.events: List[Dict[str, Any]] = []
+        self.threads_names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def add_span(
+        self,
+        name: str,
+        category: str,
+        started_at: float,
+        finished_at: float,
+        attributes: Mapping[str, Any],
+    ) -> None:
+        thread = threading.current_thread()
+        with self._lock:
+            self.threads_names.setdefault(thread.ident or 0, thread.name)
+            self.events.append({
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': round((started_at - self.started_at) * 10 ** 6, 3),
+                'dur': round((finished_at - started_at) * 10 ** 6, 3),
+                'pid': os.getpid(),
+                'tid': thread.ident or 0,
+                'args': dict(attributes),
+            })
+
+    def to_chrome_trace(self) -> Mapping[str, Any]:
+        with self._lock:
+            threads_events = [
+                {
+                    'name': 'thread_name',
+                    'ph': 'M',
+                    'pid': os.getpid(),
+                    'tid': thread_id,
+                    'args': {'name': thread_name},
+                }
+                for thread_id, thread_name in self.threads_names.items()
+            ]
+            return {
+                'traceEvents': [*threads_events, *self.events],
+                'displayTimeUnit': 'ms',
+            }
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    global _tracer  # noqa: WPS420
+    _tracer = tracer
+
+
+@contextlib.contextmanager
+def span(name: str, category: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Records span to current tracer, if tracing is on.
+
+    Yields attributes of span, that can be extended inside span. Nested spans
+    get only name of span as attribute, keyed by span category; enclosing
+    spans are known even if tracing is off, e.g. to attribute requests to nodes.
+    """
+    tracer = _tracer
+    enclosing_spans = _enclosing_spans.get()
+    span_attributes = {**enclosing_spans, **attributes}
+    context_token = _enclosing_spans.set({**enclosing_spans, category: name})
+    started_at = tracer.clock() if tracer else 0
+    try:
+        yield span_attributes
+    except Exception as exc:
+        span_attributes['exception'] = repr(exc)
+        raise
+    finally:
+        _enclosing_spans.reset(context_token)
+        if tracer is not None:
+            tracer.add_span(name, category, started_at, tracer.clock(), span_attributes)
+
+
+def get_enclosing_spans() -> Mapping[str, Any]:
+    """Names of spans, enclosing current code, keyed by their categories."""
+    return _enclosing_spans.get()
+
+
+def in_current_context(function: Callable[..., T]) -> Callable[..., T]:
+    """Wraps function to run in other threads with context (and spans) of caller."""
+    caller_context = contextvars.copy_context()
+
+    def run_in_caller_context(*args: Any, **kwargs: Any) -> T:
+        return caller_context.copy().run(function, *args, **kwargs)
+    return run_in_caller_context
+
+
+def export_trace(tracer: Tracer, file_path: str) -> None:
+    with open(file_path, 'w') as trace_file:
+        json.dump(tracer.to_chrome_trace(), trace_file)
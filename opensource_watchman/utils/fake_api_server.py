@@ -0,0 +1,177 @@
+import base64
+import json
+import math
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import urlparse
+
+
+class FakeResponse:
+    def __init__(
+        self,
+        payload: Any = None,
+        status: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        self.payload = payload
+        self.status = status
+        self.headers = dict(headers or {})
+
+
+class FakeApiServer:
+    """
+    Local GitHub-like api server with per-token rate limits, for tests and benchmarks.
+
+    Serves registered payloads by path (with or without query), tracks quota of
+    each token (passed with basic auth or bearer header) in fixed windows and
+    answers with X-RateLimit-* headers like GitHub does. String payloads are
+    served as plain text, rest of payloads as json.
+    """
+
+    def __init__(
+        self,
+        rate_limit: int = 5000,
+        rate_limit_window_seconds: int = 3600,
+        latency_seconds: float = 0,
+    ) -> None:
+        self.rate_limit = rate_limit
+        self.rate_limit_window_seconds = rate_limit_window_seconds
+        self.latency_seconds = latency_seconds
+        self.routes: Dict[str, FakeResponse] = {}
+        self.forced_responses: Deque[FakeResponse] = deque()
+        self.requests_log: List[Tuple[str, Optional[str]]] = []
+        self.tokens_usage: Counter = Counter()
+        self._windows: Dict[Optional[str], Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+        self._server = _FakeHttpServer(('127.0.0.1', 0), _create_handler(self))
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self._server.server_port}'
+
+    @property
+    def host(self) -> str:
+        return str(self._server.server_address[0])
+
+    def add_route(
+        self,
+        path: str,
+        payload: Any,
+        status: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        self.routes[path] = FakeResponse(payload, status, headers)
+
+    def force_next_response(
+        self,
+        payload: Any,
+        status: int,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        """Next request (of any path and token) gets given response, e.g. secondary limit."""
+        self.forced_responses.append(FakeResponse(payload, status, headers))
+
+    def start(self) -> 'FakeApiServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'FakeApiServer':
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def respond(self, path: str, token: Optional[str]) -> FakeResponse:
+        with self._lock:
+            self.requests_log.append((path, token))
+            if self.forced_responses:
+                return self.forced_responses.popleft()
+            remaining, reset_at = self._use_quota(token)
+        rate_limit_headers = {
+            'X-RateLimit-Limit': str(self.rate_limit),
+            'X-RateLimit-Remaining': str(max(remaining, 0)),
+            'X-RateLimit-Reset': str(reset_at),
+        }
+        if remaining < 0:
+            return FakeResponse(
+                {'message': 'API rate limit exceeded'},
+                403,
+                rate_limit_headers,
+            )
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        route = self.routes.get(path) or self.routes.get(urlparse(path).path)
+        if route is None:
+            return FakeResponse({'message': 'Not Found'}, 404, rate_limit_headers)
+        return FakeResponse(route.payload, route.status, {**rate_limit_headers, **route.headers})
+
+    def _use_quota(self, token: Optional[str]) -> Tuple[int, int]:
+        now = time.time()
+        used, reset_at = self._windows.get(token, (0, 0))
+        if now >= reset_at:
+            used, reset_at = 0, math.ceil(now) + self.rate_limit_window_seconds
+        used += 1
+        self._windows[token] = (used, reset_at)
+        if used <= self.rate_limit:
+            self.tokens_usage[token] += 1
+        return self.rate_limit - used, reset_at
+
+
+class _FakeHttpServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        """Connections, dropped by clients (e.g. with overflown pools), are not errors."""
+
+
+def get_request_token(authorization: Optional[str]) -> Optional[str]:
+    if not authorization:
+        return None
+    scheme, _, credentials = authorization.partition(' ')
+    if scheme.lower() == 'basic':
+        return base64.b64decode(credentials).decode().partition(':')[2]
+    return credentials
+
+
+def _create_handler(server: FakeApiServer) -> type:
+    class FakeApiRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # headers and body are sent separately, so they must not wait for delayed ack
+        disable_nagle_algorithm = True
+
+        def do_GET(self) -> None:  # noqa: N802
+            self._respond()
+
+        def do_POST(self) -> None:  # noqa: N802
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            self._respond()
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+        def _respond(self) -> None:
+            response = server.respond(self.path, get_request_token(self.headers['Authorization']))
+            is_text = isinstance(response.payload, str)
+            body = (response.payload if is_text else json.dumps(response.payload)).encode()
+            self.send_response(response.status)
+            self.send_header(
+                'Content-Type',
+                f'{"text/plain" if is_text else "application/json"}; charset=utf-8',
+            )
+            self.send_header('Content-Length', str(len(body)))
+            for header_name, header_value in response.headers.items():
+                self.send_header(header_name, header_value)
+            self.end_headers()
+            self.wfile.write(body)
+
+    return FakeApiRequestHandler
@@ -1,18 +1,155 @@
 import io
-from typing import Optional
+import itertools
+import re
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+from xml.parsers import expat
 
 import deal
-from requests import get
+from requests import Response
 from requests.exceptions import MissingSchema
-from PIL import Image
+from PIL import Image, UnidentifiedImageError
+
+from opensource_watchman.api.transport import get
+from opensource_watchman.config import (
+    IMAGE_PROBE_CHUNK_SIZE, IMAGE_PROBE_MAX_BYTES, IMAGE_SIZE_CACHE_TTL_SECONDS,
+    IMAGE_SIZE_FAILURE_CACHE_TTL_SECONDS,
+)
+from opensource_watchman.utils.storage import SqliteStore
+
+
+ImageSize = Tuple[int, int]
+
+SVG_SIGNATURES = (b'<?xml', b'<svg', b'<!--', b'<!DOCTYPE svg')
+
+_image_size_cache: Optional[SqliteStore] = SqliteStore(':memory:', 'image_sizes')
+
+
+def set_image_size_cache(image_size_cache: Optional[SqliteStore]) -> None:
+    global _image_size_cache  # noqa: WPS420
+    _image_size_cache = image_size_cache
 
 
 @deal.pre(lambda url: url.startswith('http'))
 @deal.post(lambda r: r is None or r > 0)
 def get_image_height_in_pixels(url: str) -> Optional[int]:
+    image_size = get_image_size(url)
+    return image_size[1] if image_size else None
+
+
+def get_image_size(url: str) -> Optional[ImageSize]:
+    """Returns image size, probed by its first bytes and cached by url."""
+    image_info = get_cached_image_info(url)
+    if image_info is None:
+        image_info = {'size': probe_image_size(url)}
+        if _image_size_cache:
+            _image_size_cache.set(url, image_info)
+    return tuple(image_info['size']) if image_info['size'] else None  # type: ignore
+
+
+def get_cached_image_info(url: str) -> Optional[Mapping[str, Any]]:
+    """Failed probes (error responses, not images) are cached shortly: failure may be transient."""
+    if _image_size_cache is None:
+        return None
+    image_info = _image_size_cache.get(url, max_age=IMAGE_SIZE_CACHE_TTL_SECONDS)
+    if image_info and image_info['size'] is None:
+        return _image_size_cache.get(url, max_age=IMAGE_SIZE_FAILURE_CACHE_TTL_SECONDS)
+    return image_info
+
+
+def probe_image_size(url: str) -> Optional[ImageSize]:
     try:
-        img_data = get(url).content
+        response = get(
+            url,
+            stream=True,
+            headers={'Range': f'bytes=0-{IMAGE_PROBE_MAX_BYTES - 1}'},
+        )
     except MissingSchema:
         return None
-    im = Image.open(io.BytesIO(img_data))
-    return im.size[1]
+    with response:
+        if not response.ok:
+            return None
+        chunks = response.iter_content(IMAGE_PROBE_CHUNK_SIZE)
+        first_chunk = next(chunks, b'')
+        chunks = itertools.chain([first_chunk], chunks)
+        if is_svg(response, first_chunk):
+            return read_svg_size(chunks)
+        try:
+            return read_image_size(chunks)
+        except UnidentifiedImageError:
+            return None
+
+
+def is_svg(response: Response, first_chunk: bytes) -> bool:
+    return (
+        'svg' in response.headers.get('Content-Type', '')
+        or first_chunk.lstrip().startswith(SVG_SIGNATURES)
+    )
+
+
+@deal.raises(UnidentifiedImageError)
+def read_image_size(
+    chunks: Iterable[bytes],
+    max_bytes: int = IMAGE_PROBE_MAX_BYTES,
+) -> ImageSize:
+    """Reads image size from image header, consuming only as many chunks as needed."""
+    header = b''
+    for chunk in chunks:
+        header += chunk
+        try:
+            with Image.open(io.BytesIO(header)) as image:
+                return image.size
+        except (UnidentifiedImageError, OSError):
+            if len(header) >= max_bytes:
+                break
+    raise UnidentifiedImageError('cannot identify image by its header')
+
+
+class _SvgRootElementFound(Exception):
+    pass
+
+
+def read_svg_size(
+    chunks: Iterable[bytes],
+    max_bytes: int = IMAGE_PROBE_MAX_BYTES,
+) -> Optional[ImageSize]:
+    """Reads size of svg image from its root element, stops parsing right after it."""
+    root_attributes: Dict[str, str] = {}
+
+    def handle_start_element(name: str, attributes: Mapping[str, str]) -> None:
+        root_attributes.update(attributes)
+        raise _SvgRootElementFound()
+
+    parser = expat.ParserCreate()
+    parser.StartElementHandler = handle_start_element
+    bytes_read = 0
+    for chunk in chunks:
+        try:
+            parser.Parse(chunk, False)
+        except _SvgRootElementFound:
+            return get_svg_size_from_attributes(root_attributes)
+        except expat.ExpatError:
+            return None
+        bytes_read += len(chunk)
+        if bytes_read >= max_bytes:
+            break
+    return None
+
+
+@deal.pure
+def get_svg_size_from_attributes(attributes: Mapping[str, str]) -> Optional[ImageSize]:
+    width = parse_svg_length(attributes.get('width', ''))
+    height = parse_svg_length(attributes.get('height', ''))
+    view_box = [v for v in re.split(r'[\s,]+', attributes.get('viewBox', '').strip()) if v]
+    if (width is None or height is None) and len(view_box) == 4:
+        view_box_width, view_box_height = (parse_svg_length(v) for v in view_box[2:])
+        width = width if width is not None else view_box_width
+        height = height if height is not None else view_box_height
+    if not width or not height:
+        return None
+    return width, height
+
+
+@deal.pure
+def parse_svg_length(raw_length: str) -> Optional[int]:
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*(?:px)?\s*', raw_length)
+    return round(float(match.group(1))) if match else None
@@ -1,18 +1,119 @@
-from typing import List
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
 import deal
 
+from opensource_watchman.config import COMMANDS_WITH_SUBCOMMANDS
+
+
+class CommandsMatcher:
+    """
+    Index of commands, that finds all of them in log lines in a single pass.
+
+    Command is found in line if line is the command, starts with the command
+    followed by space or has the command surrounded with spaces. Commands are
+    indexed by their first space-separated token, so each line costs a split
+    and a set intersection, whatever the number of commands is.
+    """
+
+    def __init__(self, commands: Iterable[str]) -> None:
+        self.commands = set(commands)
+        self._commands_by_first_token: Dict[str, List[Tuple[str, List[str]]]] = {}
+        for command in self.commands:
+            tokens = command.split(' ')
+            self._commands_by_first_token.setdefault(tokens[0], []).append((command, tokens))
+        self._first_tokens = set(self._commands_by_first_token.keys())
+
+    def find_in_line(self, line: str) -> Set[str]:
+        found_commands = {line} if line in self.commands else set()
+        # leading space makes "starts with command" a case of "has command surrounded with spaces"
+        tokens = f' {line}'.split(' ')
+        candidate_first_tokens = self._first_tokens.intersection(tokens[1:-1])
+        if not candidate_first_tokens:
+            return found_commands
+        for token_index, token in enumerate(tokens[1:-1], start=1):
+            if token in candidate_first_tokens:
+                found_commands.update(self._find_at(tokens, token_index))
+        return found_commands
+
+    def find_in_log(self, log: Iterable[str]) -> Set[str]:
+        found_commands: Set[str] = set()
+        for line in log:
+            found_commands.update(self.find_in_line(line))
+        return found_commands
+
+    def _find_at(self, tokens: List[str], token_index: int) -> Iterator[str]:
+        """Yields commands, that start at given token and are followed by space."""
+        for command, command_tokens in self._commands_by_first_token[tokens[token_index]]:
+            command_end = token_index + len(command_tokens)
+            if command_end < len(tokens) and tokens[token_index:command_end] == command_tokens:
+                yield command
+
 
 @deal.pure
 def if_logs_has_any_of_commands(log: List[str], commands: List[str]) -> bool:
-    is_section_present = False
-    for required_command in commands:
-        for base_command in log:
-            if (
-                base_command.startswith(f'{required_command} ')
-                or f' {required_command} ' in base_command
-                or base_command == required_command
-            ):
-                is_section_present = True
-                break
-    return is_section_present
+    return bool(CommandsMatcher(commands).find_in_log(log))
+
+
+def iterate_build_commands(
+    log_lines: Iterable[str],
+    commands_with_subcommands: Sequence[str] = COMMANDS_WITH_SUBCOMMANDS,
+) -> Iterator[str]:
+    """
+    Yields commands-like strings from build log lines in a single pass.
+
+    Commands are lines, that start with `$ `. Subcommands of commands like make
+    are logged as stdout, so all meaningful lines from such command till the end
+    of log (except for the very last line) are yielded as well.
+    """
+    started_sections: Dict[str, Optional[bool]] = {c: None for c in commands_with_subcommands}
+    held_back_lines: List[str] = []
+    for line_number, raw_line in enumerate(log_lines):
+        yield from held_back_lines
+        line = raw_line.lstrip('\x1b[0K$ ')
+        if raw_line.strip('\x1b[0K').startswith('$ '):
+            yield line
+        for mother_command, is_started in started_sections.items():
+            if is_started is None and line.startswith(f'{mother_command} '):
+                # section, that starts at the very first line, is skipped, as it always was
+                started_sections[mother_command] = line_number > 0
+        active_sections_number = sum(1 for s in started_sections.values() if s)
+        held_back_lines = (
+            [] if is_noise_line(line) else [line] * active_sections_number
+        )
+
+
+def iterate_commands_until_found(
+    commands: Iterable[str],
+    required_commands_sections: Optional[Sequence[Sequence[str]]],
+) -> Iterator[str]:
+    """Yields commands until each of sections has at least one of its commands found."""
+    sections_to_find = [set(s) for s in required_commands_sections or []]
+    matcher = CommandsMatcher(c for s in sections_to_find for c in s)
+    for command in commands:
+        yield command
+        found_commands = matcher.find_in_line(command)
+        if found_commands:
+            sections_to_find = [s for s in sections_to_find if not s & found_commands]
+        if required_commands_sections and not sections_to_find:
+            return
+
+
+def are_all_sections_found(
+    commands: Iterable[str],
+    required_commands_sections: Optional[Sequence[Sequence[str]]],
+) -> bool:
+    if not required_commands_sections:
+        return False
+    found_commands = CommandsMatcher(
+        c for s in required_commands_sections for c in s
+    ).find_in_log(commands)
+    return all(found_commands.intersection(s) for s in required_commands_sections)
+
+
+def is_noise_line(line: str) -> bool:
+    return (
+        not line.strip()
+        or line.startswith(('-', '=', '|', '+', 'Warning', 'Success'))
+        or re.match(r'^make\[\d\]', line) is not None
+    )
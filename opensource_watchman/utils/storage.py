@@ -0,0 +1,43 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+
+class SqliteStore:
+    """Thread safe persistent key-value storage for json-serializable values."""
+
+    def __init__(self, db_path: str, table_name: str) -> None:
+        self.table_name = table_name
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                f'CREATE TABLE IF NOT EXISTS {table_name} '  # noqa: S608
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL)',
+            )
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[Any]:
+        with self._lock:
+            row = self._connection.execute(
+                f'SELECT value, updated_at FROM {self.table_name} WHERE key = ?',  # noqa: S608
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        value, updated_at = row
+        if max_age is not None and time.time() - updated_at > max_age:
+            return None
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                f'INSERT OR REPLACE INTO {self.table_name} VALUES (?, ?, ?)',  # noqa: S608
+                (key, json.dumps(value), time.time()),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
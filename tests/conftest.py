@@ -6,9 +6,12 @@ import responses
 
 from opensource_watchman.api.codeclimate_api import CodeClimateAPI
 from opensource_watchman.api.github import GithubRepoAPI
+from opensource_watchman.api.travis import set_job_commands_cache
 from opensource_watchman.common_types import (
     RepoResult, OpensourceWatchmanConfig, GithubPipelineData,
 )
+from opensource_watchman.utils.fake_api_server import FakeApiServer
+from opensource_watchman.utils.storage import SqliteStore
 
 
 class AdvancedRequestsMock(responses.RequestsMock):
@@ -51,6 +54,20 @@ def mocked_responses():
         yield rsps
 
 
+@pytest.fixture
+def fake_api_server(enable_network):
+    with FakeApiServer(rate_limit=2, rate_limit_window_seconds=1) as server:
+        yield server
+
+
+@pytest.fixture
+def job_commands_cache():
+    job_commands_cache = SqliteStore(':memory:', 'travis_job_commands')
+    set_job_commands_cache(job_commands_cache)
+    yield job_commands_cache
+    set_job_commands_cache(SqliteStore(':memory:', 'travis_job_commands'))
+
+
 @pytest.fixture
 def owner():
     return 'owner'
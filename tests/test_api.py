@@ -1,6 +1,14 @@
 import datetime
+import json
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch
 
+import pytest
+import requests
 import responses
 from deal import cases
 from hypothesis import given
@@ -8,14 +16,36 @@ from hypothesis.provisional import urls
 from hypothesis.strategies import builds, lists, text, integers, one_of
 
 from opensource_watchman.api.codeclimate_api import CodeClimateAPI
+from opensource_watchman.api.github_graphql import GithubGraphQLAPI, GraphQLError
+from opensource_watchman.api.host_overrides import HostOverrides
+from opensource_watchman.api.http_cache import ConditionalRequestsCache
+from opensource_watchman.api.metrics import HttpMetrics
 from opensource_watchman.api.pypistats import get_pypi_downloads_stat
+from opensource_watchman.api.quota import QuotaAccounting
+from opensource_watchman.api.rate_limit import (
+    GithubRateLimiter, RateLimitExceeded, get_github_api_tokens,
+)
+from opensource_watchman.api.recording import (
+    HttpRecorder, HttpReplayer, NotRecorded, get_http_archive,
+)
+from opensource_watchman.api.retries import CircuitBreakers, HostUnavailable, RetryWithBackoff
+from opensource_watchman.api.single_flight import SingleFlight
+from opensource_watchman.api.transport import (
+    Transport, TransportLayer, build_response, set_transport,
+)
+from opensource_watchman.api.tracing import HttpTracing
 from opensource_watchman.api.travis import TravisRepoAPI
 from opensource_watchman.pipelines.extended_repo_info import fetch_downloads_stat
 from opensource_watchman.pipelines.github import (
     fetch_last_commit_date, fetch_detailed_pull_requests,
     fetch_ow_repo_config, fetch_badges_urls,
 )
+from opensource_watchman.metrics import Metrics, export_metrics
 from opensource_watchman.pipelines.master import analyze_is_pypi_response_ok
+from opensource_watchman.quota import NOT_BY_CHECKS, QuotaUsage
+from opensource_watchman.tracing import Tracer, set_tracer, span
+from opensource_watchman.utils.fake_api_server import FakeApiServer
+from opensource_watchman.utils.storage import SqliteStore
 
 
 test_travis_extract_commands_from_raw_log = cases(TravisRepoAPI._extract_commands_from_raw_log)
@@ -117,3 +147,486 @@ def test_fetch_badges_urls(sample_readme_text, height):
         return_value=height,
     ):
         fetch_badges_urls(sample_readme_text)
+
+
+def test_transport_mounts_pools_per_host():
+    transport = Transport(pool_sizes={'api.github.com': 3})
+
+    adapter = transport.session.get_adapter('https://api.github.com/users/test/repos')
+
+    assert adapter._pool_maxsize == 3
+    assert transport.stat() == {'connections_opened': 0, 'connections_reused': 0}
+
+
+def test_transport_times_out_requests_to_stalled_host(enable_network):
+    transport = Transport(timeout=(1, 0.1))
+    with socket.socket() as stalled_server:
+        stalled_server.bind(('127.0.0.1', 0))
+        stalled_server.listen()
+
+        with pytest.raises(requests.Timeout):
+            transport.get(f'http://127.0.0.1:{stalled_server.getsockname()[1]}/')
+
+
+def test_build_response_reads_content_as_received_one():
+    response = build_response(
+        url='https://api.github.com/repos/test/test',
+        status_code=200,
+        headers={'Content-Type': 'application/json; charset=utf-8'},
+        content='{"name": "тест"}'.encode(),
+    )
+
+    assert response.json() == {'name': 'тест'}
+    assert response.content == '{"name": "тест"}'.encode()
+
+
+def test_transport_warm_up_ignores_unavailable_hosts(mocker):
+    transport = Transport(pool_sizes={'api.github.com': 3, 'pypi.org': 1})
+    head_mock = mocker.patch.object(
+        transport.session,
+        'head',
+        side_effect=requests.ConnectionError,
+    )
+
+    transport.warm_up()
+
+    assert head_mock.call_count == 2
+
+
+def test_github_listing_follows_link_headers(mocked_responses, github_api):
+    mocked_responses.add(
+        responses.GET,
+        'https://api.github.com/repos/test/test/issues',
+        json=[{'number': 1}, {'number': 2}],
+        headers={'Link': '<https://api.github.com/repositories/1/issues?page=2>; rel="next"'},
+    )
+    mocked_responses.add(
+        responses.GET,
+        'https://api.github.com/repositories/1/issues',
+        json=[{'number': 3}],
+    )
+
+    assert [i['number'] for i in github_api.fetch_open_issues()] == [1, 2, 3]
+    assert 'per_page=100' in mocked_responses.calls[0].request.url
+
+
+def test_github_listing_raises_on_failed_next_page(mocked_responses, github_api):
+    mocked_responses.add(
+        responses.GET,
+        'https://api.github.com/repos/test/test/issues',
+        json=[{'number': 1}],
+        headers={'Link': '<https://api.github.com/repositories/1/issues?page=2>; rel="next"'},
+    )
+    mocked_responses.add(
+        responses.GET,
+        'https://api.github.com/repositories/1/issues',
+        status=502,
+    )
+
+    with pytest.raises(requests.HTTPError):
+        github_api.fetch_open_issues()
+
+
+def test_github_listing_takes_first_item_with_single_call(mocked_responses, github_api):
+    mocked_responses.add(
+        responses.GET,
+        'https://api.github.com/repos/test/test/pulls',
+        json=[{'number': 1}],
+        headers={'Link': '<https://api.github.com/repositories/1/pulls?page=2>; rel="next"'},
+    )
+
+    assert next(github_api.iterate_open_pull_requests()) == {'number': 1}
+    assert len(mocked_responses.calls) == 1
+
+
+def test_conditional_cache_serves_stored_body_on_not_modified(mocked_responses, tmp_path):
+    url = 'https://raw.githubusercontent.com/test/test/master/README.md'
+    mocked_responses.add(responses.GET, url, body='readme', headers={'ETag': '"v1"'})
+    mocked_responses.add(responses.GET, url, status=304)
+    transport = Transport(layers=[ConditionalRequestsCache(
+        SqliteStore(str(tmp_path / 'cache.sqlite'), 'conditional_requests'),
+    )])
+
+    first_response = transport.get(url)
+    second_response = transport.get(url)
+
+    assert first_response.text == second_response.text == 'readme'
+    assert mocked_responses.calls[1].request.headers['If-None-Match'] == '"v1"'
+    assert transport.stat()['conditional_cache_hits'] == 1
+    assert transport.stat()['conditional_cache_misses'] == 1
+
+
+def test_graphql_api_paginates_with_cursor(mocked_responses):
+    def page(nodes, has_next_page):
+        return {'data': {'repository': {'items': {
+            'pageInfo': {'hasNextPage': has_next_page, 'endCursor': 'cursor1'},
+            'nodes': [{'number': n} for n in nodes],
+        }}}}
+
+    mocked_responses.add(responses.POST, 'https://api.github.com/graphql', json=page([1, 2], True))
+    mocked_responses.add(responses.POST, 'https://api.github.com/graphql', json=page([3], False))
+
+    api = GithubGraphQLAPI('test', 'test', 'test', '123')
+
+    assert [i['number'] for i in api.iterate_open_issues()] == [1, 2, 3]
+    assert json.loads(mocked_responses.calls[1].request.body)['variables']['cursor'] == 'cursor1'
+
+
+def test_graphql_api_fetches_all_pages_of_nested_connections(mocked_responses):
+    def comments(updated_at, has_next_page):
+        return {
+            'pageInfo': {'hasNextPage': has_next_page, 'endCursor': updated_at},
+            'nodes': [{'updatedAt': updated_at}],
+        }
+
+    mocked_responses.add(responses.POST, 'https://api.github.com/graphql', json={
+        'data': {'repository': {'items': {
+            'pageInfo': {'hasNextPage': False, 'endCursor': None},
+            'nodes': [{
+                '__typename': 'Issue', 'id': 'issue1', 'comments': comments('2021-01-01', True),
+            }],
+        }}},
+    })
+    mocked_responses.add(responses.POST, 'https://api.github.com/graphql', json={
+        'data': {'node': {'items': comments('2021-01-02', False)}},
+    })
+
+    api = GithubGraphQLAPI('test', 'test', 'test', '123')
+    issue = list(api.iterate_open_issues())[0]
+
+    assert issue['comments']['nodes'] == [{'updatedAt': '2021-01-01'}, {'updatedAt': '2021-01-02'}]
+    assert json.loads(mocked_responses.calls[1].request.body)['variables'] == {
+        'id': 'issue1', 'cursor': '2021-01-01',
+    }
+
+
+@pytest.mark.parametrize('response_payload', [
+    {'data': None, 'errors': [{'type': 'RATE_LIMITED'}]},
+    {'data': {'repository': None}, 'errors': [{'type': 'NOT_FOUND'}]},
+    {'data': {'repository': None}},
+])
+def test_graphql_api_raises_on_errors(mocked_responses, response_payload):
+    mocked_responses.add(responses.POST, 'https://api.github.com/graphql', json=response_payload)
+
+    api = GithubGraphQLAPI('test', 'test', 'test', '123')
+
+    with pytest.raises(GraphQLError):
+        list(api.iterate_open_pull_requests())
+
+
+def test_single_flight_memoizes_identical_requests(mocked_responses):
+    mocked_responses.add(
+        responses.GET,
+        'https://api.codeclimate.com/v1/repos?github_slug=owner/test_repo',
+        json={'data': [{'id': 123, 'attributes': {'badge_token': 'token'}}]},
+    )
+    transport = Transport(layers=[SingleFlight()])
+    set_transport(transport)
+    try:
+        api = CodeClimateAPI.create('owner', 'test_repo', 'secret')
+        badge_token = api.get_badge_token()
+    finally:
+        set_transport(Transport())
+
+    assert (api.code_climate_repo_id, badge_token) == (123, 'token')
+    assert transport.stat()['duplicate_requests_avoided'] == 1
+
+
+def test_single_flight_shares_responses_with_read_bodies():
+    class ReplayedResponses(TransportLayer):
+        def send(self, send, method, url, **kwargs):
+            return build_response(url, 200, {}, json.dumps(list(range(10 ** 5))).encode())
+
+    transport = Transport(layers=[SingleFlight(), ReplayedResponses()])
+    threads_barrier = threading.Barrier(4)
+
+    def read_shared_response(url):
+        response = transport.get(url)
+        threads_barrier.wait()
+        return response.json()
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads often to make lazy body reads race
+    try:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for trial in range(30):
+                url = f'https://api.github.com/repos/owner/test{trial}'
+                payloads = list(executor.map(read_shared_response, [url] * 4))
+
+                assert payloads == [list(range(10 ** 5))] * 4
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+
+def test_single_flight_keeps_only_recently_used_responses(mocked_responses):
+    for repo_name in ['first', 'second']:
+        mocked_responses.add(responses.GET, f'https://api.github.com/repos/owner/{repo_name}')
+    transport = Transport(layers=[SingleFlight(max_memoized_responses=1)])
+
+    for repo_name in ['first', 'first', 'second', 'first']:
+        transport.get(f'https://api.github.com/repos/owner/{repo_name}')
+
+    assert len(mocked_responses.calls) == 3
+    assert transport.stat()['duplicate_requests_avoided'] == 1
+
+
+def test_rate_limiter_rotates_tokens_and_waits_for_reset(fake_api_server):
+    fake_api_server.add_route('/repos/owner/test', {'description': 'Test'})
+    rate_limiter = GithubRateLimiter(['first', 'second'], hosts=[fake_api_server.host])
+    transport = Transport(layers=[rate_limiter])
+
+    responses_statuses = [
+        transport.get(
+            f'{fake_api_server.url}/repos/owner/test',
+            auth=requests.auth.HTTPBasicAuth('login', 'first'),
+        ).status_code
+        for _ in range(5)
+    ]
+
+    assert responses_statuses == [200] * 5
+    assert fake_api_server.tokens_usage['first'] >= 2
+    assert fake_api_server.tokens_usage['second'] == 2
+    assert transport.stat()['rate_limit_waits'] == 1
+
+
+def test_rate_limiter_respects_retry_after(fake_api_server):
+    fake_api_server.add_route('/graphql', {'data': {}})
+    fake_api_server.force_next_response(
+        {'message': 'secondary rate limit'}, 403, {'Retry-After': '0.01'},
+    )
+    transport = Transport(layers=[GithubRateLimiter(['token'], hosts=[fake_api_server.host])])
+
+    response = transport.post(
+        f'{fake_api_server.url}/graphql',
+        json={},
+        headers={'Authorization': 'bearer other'},
+    )
+
+    assert response.json() == {'data': {}}
+    assert [t for (_, t) in fake_api_server.requests_log] == ['token', 'token']
+    assert transport.stat()['rate_limited_responses'] == 1
+
+
+def test_rate_limiter_waits_a_minute_after_secondary_limit_without_retry_after(fake_api_server):
+    fake_api_server.add_route('/repos/owner/test', {'description': 'Test'})
+    fake_api_server.force_next_response(
+        {'message': 'You have exceeded a secondary rate limit'},
+        403,
+        {'X-RateLimit-Remaining': '10'},
+    )
+    sleeps = []
+    transport = Transport(layers=[GithubRateLimiter(
+        ['token'], hosts=[fake_api_server.host], points_per_minute={}, sleep=sleeps.append,
+    )])
+
+    response = transport.get(f'{fake_api_server.url}/repos/owner/test')
+
+    assert response.json() == {'description': 'Test'}
+    assert sleeps == [60]
+    assert transport.stat()['rate_limited_responses'] == 1
+
+
+def test_rate_limiter_tracks_quotas_of_each_resource(fake_api_server):
+    fake_api_server.add_route('/repos/owner/test', {'description': 'Test'})
+    fake_api_server.force_next_response({'data': {}}, 200, {
+        'X-RateLimit-Remaining': '0',
+        'X-RateLimit-Reset': str(int(time.time()) + 3600),
+        'X-RateLimit-Resource': 'graphql',
+    })
+    sleeps = []
+    transport = Transport(layers=[GithubRateLimiter(
+        ['token'], hosts=[fake_api_server.host], points_per_minute={}, sleep=sleeps.append,
+    )])
+
+    transport.post(f'{fake_api_server.url}/graphql', json={}, headers={'Authorization': 'bearer x'})
+    response = transport.get(f'{fake_api_server.url}/repos/owner/test')
+
+    assert response.json() == {'description': 'Test'}
+    assert sleeps == []
+
+
+def test_rate_limiter_paces_requests_within_secondary_rate_limits(enable_network):
+    sleeps = []
+    with FakeApiServer(rate_limit=10) as fake_api_server:
+        fake_api_server.add_route('/repos/owner/test', {'description': 'Test'})
+        fake_api_server.add_route('/graphql', {'data': {}})
+        transport = Transport(layers=[GithubRateLimiter(
+            ['token'],
+            hosts=[fake_api_server.host],
+            points_per_minute={'rest': 600, 'graphql': 60},
+            clock=lambda: 0,
+            sleep=sleeps.append,
+        )])
+
+        transport.get(f'{fake_api_server.url}/repos/owner/test')
+        transport.post(f'{fake_api_server.url}/repos/owner/test', json={})
+        transport.post(f'{fake_api_server.url}/graphql', json={})
+        transport.get(f'{fake_api_server.url}/repos/owner/test')
+
+    assert sleeps == [pytest.approx(0.1), pytest.approx(0.6)]
+
+
+def test_rate_limiter_raises_instead_of_returning_limited_response(fake_api_server):
+    for _ in range(5):
+        fake_api_server.force_next_response({}, 429, {'Retry-After': '0'})
+    transport = Transport(layers=[GithubRateLimiter([], hosts=[fake_api_server.host])])
+
+    with pytest.raises(RateLimitExceeded):
+        transport.get(f'{fake_api_server.url}/repos/owner/test')
+
+
+def test_host_overrides_sends_requests_to_fake_api_server(fake_api_server):
+    fake_api_server.add_route('/v1/repos?github_slug=owner/test', {'data': []})
+    fake_api_server.add_route('/owner/test/master/README.md', '# test')
+    transport = Transport(layers=[HostOverrides({
+        'api.codeclimate.com': fake_api_server.url,
+        'raw.githubusercontent.com': fake_api_server.url,
+    })])
+
+    api_response = transport.get('https://api.codeclimate.com/v1/repos?github_slug=owner/test')
+    raw_response = transport.get('https://raw.githubusercontent.com/owner/test/master/README.md')
+
+    assert api_response.json() == {'data': []}
+    assert raw_response.text == '# test'
+
+
+def test_http_metrics_records_requests_of_each_host(fake_api_server, tmp_path):
+    fake_api_server.add_route('/repos/owner/test', {'description': 'Test'})
+    metrics = Metrics()
+    transport = Transport(layers=[HttpMetrics(metrics)])
+
+    transport.get(f'{fake_api_server.url}/repos/owner/test')
+    transport.get(f'{fake_api_server.url}/repos/owner/unknown')
+    export_metrics(metrics, str(tmp_path / 'metrics.json'))
+
+    exported_metrics = json.loads((tmp_path / 'metrics.json').read_text())
+    host_metrics = exported_metrics['hosts'][fake_api_server.host]
+    assert host_metrics['requests'] == {'200': 1, '404': 1}
+    assert host_metrics['response_bytes'] == len(b'{"description": "Test"}{"message": "Not Found"}')
+
+
+def test_http_tracing_records_span_of_each_request(fake_api_server):
+    fake_api_server.add_route('/repos/owner/test', {'description': 'Test'})
+    tracer = Tracer()
+    set_tracer(tracer)
+    try:
+        Transport(layers=[HttpTracing()]).get(f'{fake_api_server.url}/repos/owner/test')
+    finally:
+        set_tracer(None)
+
+    trace_events = tracer.to_chrome_trace()['traceEvents']
+    assert [(e['name'], e['cat'], e['args']['status']) for e in trace_events if e['ph'] == 'X'] == [
+        (f'GET {fake_api_server.host}/repos/owner/test', 'http', 200),
+    ]
+
+
+def test_quota_accounting_attributes_requests_to_checks_of_nodes(fake_api_server):
+    fake_api_server.add_route('/repos/owner/test/issues', [])
+    fake_api_server.add_route('/repos/owner/test', {'description': 'Test'})
+    quota_usage = QuotaUsage()
+    transport = Transport(layers=[QuotaAccounting(quota_usage)])
+
+    with span('github', 'pipeline'), span('open_issues', 'node'):
+        transport.get(f'{fake_api_server.url}/repos/owner/test/issues')
+    transport.get(f'{fake_api_server.url}/repos/owner/test')
+
+    usage_by_checks = quota_usage.get_usage_by_checks({('github', 'open_issues'): {'I01'}})
+    assert {c: u[fake_api_server.host]['requests'] for c, u in usage_by_checks.items()} == {
+        'I01': 1,
+        NOT_BY_CHECKS: 1,
+    }
+    assert usage_by_checks['I01'][fake_api_server.host]['response_bytes'] == 2
+
+
+def test_get_github_api_tokens():
+    assert get_github_api_tokens('a, b,,c', 'default') == ['a', 'b', 'c']
+    assert get_github_api_tokens(None, 'default') == ['default']
+
+
+def test_retry_with_backoff_retries_server_errors(mocked_responses):
+    url = 'https://api.travis-ci.org/repo/owner%2Ftest/builds'
+    mocked_responses.add(responses.GET, url, status=502)
+    mocked_responses.add(responses.GET, url, status=502)
+    mocked_responses.add(responses.GET, url, json={'builds': []})
+    delays = []
+    transport = Transport(layers=[RetryWithBackoff(retries=3, sleep=delays.append)])
+
+    response = transport.get(url)
+
+    assert response.json() == {'builds': []}
+    assert len(delays) == 2
+    assert all(0 <= d <= 1 for d in delays)
+
+
+def test_circuit_breaker_rejects_requests_to_failing_host(mocked_responses):
+    url = 'https://api.codeclimate.com/v1/repos'
+    mocked_responses.add(responses.GET, url, status=503)
+    transport = Transport(layers=[CircuitBreakers(failures_threshold=2)])
+
+    for _ in range(3):
+        with pytest.raises(HostUnavailable):
+            transport.get(url)
+
+    assert len(mocked_responses.calls) == 2
+    assert transport.stat()['circuit_breaker_rejected_requests'] == 1
+
+
+def test_travis_last_build_commands_are_extracted_from_streamed_log(
+    mocked_responses, job_commands_cache,
+):
+    mocked_responses.mock_calls([
+        ('https://api.travis-ci.org/repo/owner%2Ftest/builds', {'builds': [{'jobs': [{'id': 1}]}]}),
+        ('https://api.travis-ci.org/job/1/log.txt', '$ flake8 .\n$ pytest\n$ mdl README.md\n'),
+    ])
+    api = TravisRepoAPI('owner', 'test', 'token')
+
+    assert api.get_last_build_commands() == ['flake8 .', 'pytest', 'mdl README.md']
+    assert api.get_last_build_commands([['flake8'], ['pytest']]) == ['flake8 .', 'pytest']
+
+
+def test_travis_last_build_commands_are_collected_from_all_jobs(
+    mocked_responses, job_commands_cache,
+):
+    mocked_responses.mock_calls([
+        (
+            'https://api.travis-ci.org/repo/owner%2Ftest/builds',
+            {'builds': [{'state': 'passed', 'jobs': [{'id': 1}, {'id': 2}]}]},
+        ),
+        ('https://api.travis-ci.org/job/1/log.txt', '$ pytest\n$ flake8 .\n'),
+        ('https://api.travis-ci.org/job/2/log.txt', '$ pytest\n$ safety check\n'),
+    ])
+    api = TravisRepoAPI('owner', 'test', 'token')
+
+    first_commands = api.get_last_build_commands()
+    second_commands = api.get_last_build_commands()
+
+    assert set(first_commands) == {'pytest', 'flake8 .', 'safety check'}
+    assert len(first_commands) == 3
+    assert set(second_commands) == set(first_commands)
+    assert len(mocked_responses.calls) == 4
+
+
+def test_recorded_responses_are_replayed_without_network(tmp_path):
+    with responses.RequestsMock() as mocked_responses:
+        mocked_responses.add(
+            responses.GET, 'https://api.github.com/repos/owner/test', json={'description': 'Test'},
+        )
+        mocked_responses.add(
+            responses.GET, 'https://api.travis-ci.org/job/1/log.txt', body='$ flake8\n$ pytest\n',
+        )
+        recording_transport = Transport(layers=[HttpRecorder(get_http_archive(str(tmp_path)))])
+        recording_transport.get('https://api.github.com/repos/owner/test', params={'a': 1})
+        recording_transport.get('https://api.travis-ci.org/job/1/log.txt', stream=True)
+    replaying_transport = Transport(layers=[HttpReplayer(get_http_archive(str(tmp_path)))])
+
+    repo_response = replaying_transport.get(
+        'https://api.github.com/repos/owner/test', params={'a': 1},
+    )
+    log_response = replaying_transport.get('https://api.travis-ci.org/job/1/log.txt', stream=True)
+
+    assert repo_response.json() == {'description': 'Test'}
+    assert list(log_response.iter_lines()) == [b'$ flake8', b'$ pytest']
+    with pytest.raises(NotRecorded):
+        replaying_transport.get('https://api.github.com/repos/owner/test')
+    assert replaying_transport.stat()['replayed_responses'] == 2
+    assert replaying_transport.stat()['connections_opened'] == 0
@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+import requests
+
+from opensource_watchman.composer import AdvancedComposer, add_node_hook, remove_node_hook
+from opensource_watchman.metrics import Metrics
+from opensource_watchman.tracing import Tracer, set_tracer, span
+
+
+def test_calculate_parallel_matches_sequential_run():
+    def total(first, second):
+        return first + second
+
+    composer = AdvancedComposer().update_parameters(first=1, second=2).update(total=total)
+
+    assert composer.run_all(max_workers=4) == composer.run_all()
+
+
+def test_calculate_parallel_runs_independent_nodes_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def first():
+        barrier.wait()
+        return 1
+
+    def second():
+        barrier.wait()
+        return 2
+
+    def total(first, second):
+        return first + second
+
+    composer = AdvancedComposer().update(first=first, second=second, total=total)
+
+    assert composer.run_all(max_workers=2)['total'] == 3
+
+
+def test_run_all_skips_descendants_of_nodes_with_unavailable_data():
+    def fetched():
+        raise requests.ConnectionError()
+
+    def check(fetched):
+        return fetched
+
+    def other():
+        return 1
+
+    composer = AdvancedComposer().update(fetched=fetched, check=check, other=other)
+
+    assert composer.run_all() == {'other': 1}
+    assert composer.run_all(unavailable_nodes=['other']) == {}
+
+
+def test_node_hooks_record_duration_and_exceptions_of_nodes():
+    def fetched():
+        raise requests.ConnectionError()
+
+    def other():
+        return 1
+
+    metrics = Metrics()
+    composer = AdvancedComposer().update(fetched=fetched, other=other)
+    add_node_hook(metrics.observe_node)
+    try:
+        composer.run_all()
+    finally:
+        remove_node_hook(metrics.observe_node)
+
+    nodes_metrics = metrics.to_json()['nodes']
+    assert {n: (m['calls'], m['exceptions']) for n, m in nodes_metrics.items()} == {
+        'fetched': (1, 1),
+        'other': (1, 0),
+    }
+    assert 'opensource_watchman_node_exceptions_total{node="fetched"} 1' in (
+        metrics.to_prometheus().splitlines()
+    )
+
+
+def test_spans_of_nodes_in_worker_threads_get_enclosing_spans():
+    def first():
+        return 1
+
+    def total(first):
+        raise ValueError()
+
+    tracer = Tracer()
+    composer = AdvancedComposer().update(first=first, total=total)
+    set_tracer(tracer)
+    try:
+        with pytest.raises(ValueError), span('github', 'pipeline', repo_id=1):
+            composer.run_all(max_workers=2)
+    finally:
+        set_tracer(None)
+
+    spans = {e['name']: e for e in tracer.to_chrome_trace()['traceEvents'] if e['ph'] == 'X'}
+    assert spans['github']['args'] == {'repo_id': 1, 'exception': 'ValueError()'}
+    assert spans['first']['args'] == {'pipeline': 'github'}
+    assert spans['total']['args'] == {'pipeline': 'github', 'exception': 'ValueError()'}
+    assert spans['first']['tid'] != threading.get_ident()
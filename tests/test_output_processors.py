@@ -1,4 +1,11 @@
-from opensource_watchman.output_processors import print_errors_data
+import json
+import os
+
+from opensource_watchman.output_processors import (
+    JsonLinesResultsStream, TermResultsStream, get_total_stat, print_errors_data,
+    render_html_report, set_templates_bytecode_cache_dir,
+)
+from opensource_watchman.run import DEFAULT_HTML_TEMPLATE_PATH
 
 
 def test_print_errors_data_without_errors(repos_stat_without_errors, capsys):
@@ -15,3 +22,77 @@ def test_print_errors_data_with_errors(repos_stat_with_errors, capsys):
     assert captured.out == (
         'test\n\t\x1b[38;5;3mD02: error\x1b[0m\n0.00% of all repos are ok (0 of 1)\n'
     )
+
+
+def test_unknown_checks_make_repo_not_ok_in_all_outputs(repos_stat_without_errors, capsys):
+    repo_stat = repos_stat_without_errors._replace(unknown_checks=['D02'])
+
+    with JsonLinesResultsStream() as results_stream:
+        results_stream.observe_repo(repo_stat)
+    print_errors_data([repo_stat])
+
+    json_line, *term_lines = capsys.readouterr().out.splitlines()
+    assert repo_stat.status == 'warning'
+    assert json.loads(json_line)['status'] == 'warning'
+    assert term_lines[-1] == '0.00% of all repos are ok (0 of 1)'
+    assert get_total_stat([repo_stat])['ok_repos_number'] == 0
+    assert get_total_stat([repo_stat])['repos_with_warnings_number'] == 1
+
+
+def test_json_lines_results_stream_prints_keyed_object_per_repo(
+    repos_stat_without_errors, repos_stat_with_errors, capsys,
+):
+    with JsonLinesResultsStream() as results_stream:
+        results_stream.observe_repo(repos_stat_without_errors)
+        results_stream.observe_repo(repos_stat_with_errors)
+
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line['errors'] for line in lines] == [{}, {'D02': ['error']}]
+    assert lines[0]['repo_name'] == repos_stat_without_errors.repo_name
+
+
+def test_term_results_stream_prints_each_repo_before_summary(repos_stat_with_errors, capsys):
+    with TermResultsStream() as results_stream:
+        results_stream.observe_repo(repos_stat_with_errors)
+        assert capsys.readouterr().out == 'test\n\t\x1b[38;5;3mD02: error\x1b[0m\n'
+
+    assert capsys.readouterr().out == '0.00% of all repos are ok (0 of 1)\n'
+
+
+def get_report_context(repos_stat):
+    return {
+        'owner': 'test',
+        'repos': repos_stat,
+        'severity_colors': {'ok': 'green', 'warning': 'yellow', 'critical': 'red'},
+        'downloads_last_week_stat': {},
+    }
+
+
+def test_render_html_report_splits_repos_to_linked_pages(repos_stat_without_errors, tmpdir):
+    repos_stat = [repos_stat_without_errors._replace(repo_name=f'repo{n}') for n in range(5)]
+    result_file = str(tmpdir.join('report.html'))
+
+    render_html_report(get_report_context(repos_stat), DEFAULT_HTML_TEMPLATE_PATH, result_file, 2)
+
+    assert sorted(os.listdir(tmpdir)) == ['report-2.html', 'report-3.html', 'report.html']
+    last_page = tmpdir.join('report-3.html').read_text('utf-8')
+    assert 'repo4' in last_page and 'repo3' not in last_page
+    assert 'href="report.html"' in last_page and 'href="report-2.html"' in last_page
+
+
+def test_render_html_report_keeps_compiled_template_in_bytecode_cache(
+    repos_stat_without_errors, tmpdir,
+):
+    bytecode_cache_dir = str(tmpdir.join('html_templates'))
+    set_templates_bytecode_cache_dir(bytecode_cache_dir)
+    try:
+        render_html_report(
+            get_report_context([repos_stat_without_errors]),
+            DEFAULT_HTML_TEMPLATE_PATH,
+            str(tmpdir.join('report.html')),
+        )
+    finally:
+        set_templates_bytecode_cache_dir(None)
+
+    assert len(os.listdir(bytecode_cache_dir)) == 1
+    assert 'report-2.html' not in tmpdir.join('report.html').read_text('utf-8')
@@ -1,4 +1,11 @@
+import ast
+import datetime
+import inspect
+import sys
+import textwrap
+
 import deal
+import pytest
 from hypothesis.strategies import lists, from_type
 
 from opensource_watchman.common_types import RequiredCICommandsConfig
@@ -13,7 +20,12 @@ from opensource_watchman.pipelines.master import (
     has_test_coverage_info, is_test_coverage_fine, is_test_coverage_badge_exists,
     fetch_issues_stale_days, has_enough_actual_issues, analyze_is_prs_ok_to_merge,
     compose_pull_requests_updated_at, has_no_stale_pull_requests, create_master_pipeline,
-    has_all_required_commands_in_build,
+    has_all_required_commands_in_build, get_pipelines_data_usage,
+    get_nodes_with_unavailable_data, GITHUB_DATA_USAGE, TRAVIS_DATA_USAGE,
+)
+from opensource_watchman.pipelines.github_graphql import (
+    fetch_pull_request_details as graphql_fetch_pull_request_details,
+    update_with_graphql_data_source,
 )
 from opensource_watchman.pipelines.travis import create_travis_pipeline
 from opensource_watchman.utils.test_strategies import cases
@@ -75,3 +87,136 @@ def test_fetch_pull_request_details(github_api, detailed_pull_requests, mocked_r
             'comments': [],
         },
     }
+
+
+def test_graphql_pull_request_details():
+    graphql_open_pull_requests = [{
+        'number': 1,
+        'updatedAt': '2021-01-20T00:00:00Z',
+        'commits': {'nodes': [{'commit': {'oid': '123', 'status': {'contexts': [
+            {'state': 'FAILURE', 'createdAt': '2021-01-20T00:00:00Z'},
+            {'state': 'SUCCESS', 'createdAt': '2021-01-21T00:00:00Z'},
+        ]}}}]},
+        'reviews': {'nodes': [
+            {'state': 'APPROVED', 'submittedAt': '2021-01-21T00:00:00Z', 'commit': {'oid': '123'}},
+            {'state': 'COMMENTED', 'submittedAt': '2021-01-22T00:00:00Z', 'commit': {'oid': '1'}},
+        ]},
+        'reviewThreads': {'nodes': [
+            {'comments': {'nodes': [{'updatedAt': '2021-01-22T00:00:00Z'}]}},
+        ]},
+    }]
+
+    actual_result = graphql_fetch_pull_request_details(graphql_open_pull_requests)
+
+    assert actual_result == {
+        1: {
+            'last_commit_sha': '123',
+            'statuses_info': [{'state': 'success'}, {'state': 'failure'}],
+            'last_review': {'state': 'APPROVED', 'submitted_at': '2021-01-21T00:00:00Z'},
+            'comments': [{'updated_at': '2021-01-22T00:00:00Z'}],
+        },
+    }
+
+
+def test_rest_and_graphql_pull_requests_updated_at_match(
+    github_api, detailed_pull_requests, mocked_responses,
+):
+    threads_comments_updated_at = [
+        ['2021-01-21T00:00:00Z', '2021-01-25T00:00:00Z'],
+        ['2021-01-22T00:00:00Z', '2021-01-23T00:00:00Z'],
+    ]
+    mocked_responses.mock_calls([
+        ('https://api.github.com/repos/test/test/pulls/1/commits', [{'sha': '123123'}]),
+        'https://api.github.com/repos/test/test/commits/123123/statuses',
+        'https://api.github.com/repos/test/test/commits/123123/reviews',
+        (
+            'https://api.github.com/repos/test/test/pulls/1/comments',
+            [{'updated_at': u} for thread in threads_comments_updated_at for u in thread],
+        ),
+    ])
+    graphql_open_pull_requests = [{
+        'number': 1,
+        'updatedAt': '2021-01-20T00:00:00Z',
+        'commits': {'nodes': [{'commit': {'oid': '123123', 'status': None}}]},
+        'reviews': {'nodes': []},
+        'reviewThreads': {'nodes': [
+            {'comments': {'nodes': [{'updatedAt': u} for u in thread]}}
+            for thread in threads_comments_updated_at
+        ]},
+    }]
+    open_pull_requests = [{'number': 1, 'updated_at': '2021-01-20T00:00:00Z'}]
+
+    rest_updated_at = compose_pull_requests_updated_at({
+        'open_pull_requests': open_pull_requests,
+        'pull_request_details': fetch_pull_request_details(github_api, detailed_pull_requests),
+    })
+    graphql_updated_at = compose_pull_requests_updated_at({
+        'open_pull_requests': open_pull_requests,
+        'pull_request_details': graphql_fetch_pull_request_details(graphql_open_pull_requests),
+    })
+
+    assert rest_updated_at == graphql_updated_at == {1: datetime.datetime(2021, 1, 25)}
+
+
+def test_update_with_graphql_data_source_drops_rest_crawl():
+    pipeline = update_with_graphql_data_source(create_github_pipeline())
+
+    dag = pipeline.dag()
+
+    assert set(dag.predecessors('pull_request_details')) == {'graphql_open_pull_requests'}
+    assert set(dag.predecessors('issues_comments')) == {
+        'graphql_open_issues', 'graphql_open_pull_requests',
+    }
+
+
+def test_get_pipelines_data_usage_prunes_unused_data():
+    pipeline = create_master_pipeline()
+
+    assert get_pipelines_data_usage(pipeline, ['S01']) == ({'last_commit_date'}, set())
+    assert get_pipelines_data_usage(pipeline, ['C02']) == (
+        {'ci_config_file_name', 'ci_config_content'},
+        {'last_build'},
+    )
+
+
+def test_get_nodes_with_unavailable_data(github_pipeline_result):
+    travis_data = {'last_build': None, 'last_build_commands': [], 'crontabs_info': []}
+
+    assert get_nodes_with_unavailable_data(github_pipeline_result, travis_data) == {'C04'}
+
+
+def get_data_keys_read_by(func, data_name):
+    """Keys of data parameter, read by function as data['key'] or data.get('key')."""
+    function_node = ast.parse(textwrap.dedent(inspect.getsource(inspect.unwrap(func)))).body[0]
+    keys_reads = {}
+    for node in ast.walk(function_node):
+        if isinstance(node, ast.Subscript):
+            subscript_slice = node.slice
+            if sys.version_info < (3, 9):  # slice is wrapped with ast.Index
+                subscript_slice = subscript_slice.value
+            if isinstance(subscript_slice, ast.Constant):
+                keys_reads[node.value] = subscript_slice.value
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            if node.func.attr == 'get' and isinstance(node.args[0], ast.Constant):
+                keys_reads[node.func.value] = node.args[0].value
+    data_usages = [
+        n for n in ast.walk(function_node) if isinstance(n, ast.Name) and n.id == data_name
+    ]
+    assert all(n in keys_reads for n in data_usages), f'{func.__name__} passes {data_name} on'
+    return {keys_reads[n] for n in data_usages}
+
+
+@pytest.mark.parametrize('data_name, data_usage', [
+    ('github_data', GITHUB_DATA_USAGE),
+    ('travis_data', TRAVIS_DATA_USAGE),
+])
+def test_data_usage_declares_keys_read_by_master_pipeline_nodes(data_name, data_usage):
+    nodes_functions = create_master_pipeline()._functions
+
+    actual_data_usage = {
+        node: get_data_keys_read_by(func, data_name)
+        for node, func in nodes_functions.items()
+        if data_name in inspect.signature(func).parameters
+    }
+
+    assert actual_data_usage == {node: set(keys) for node, keys in data_usage.items()}
@@ -1,6 +1,28 @@
+import asyncio
+import datetime
+import json
+import threading
+import time
+
+import deal
+import pytest
+import responses
+
 from opensource_watchman.api.github import GithubRepoAPI
+from opensource_watchman.api.rate_limit import GithubRateLimiter
+from opensource_watchman.common_types import RepoResult
 from opensource_watchman.composer import AdvancedComposer
-from opensource_watchman.run import run_watchman, get_repos_names
+from opensource_watchman.config import INCREMENTAL_STATE_MAX_AGE_SECONDS
+from opensource_watchman.incremental import (
+    RepoState, RepoStateStore, fetch_repo_inputs_versions,
+)
+from opensource_watchman.profiling import CpuProfiler, MemoryProfiler
+from opensource_watchman.run import (
+    run_watchman, run_watchman_async, get_repos_names, process_repo, process_repo_incrementally,
+    get_checks_by_nodes_of_pipelines, contracts_disabled, create_repo_master_pipeline,
+    evaluate_repo, create_transport,
+)
+from opensource_watchman.utils.storage import SqliteStore
 
 
 def test_run_calls_pipelines(owner, repo_name, ow_config, pipeline_result, mocker):
@@ -17,12 +39,602 @@ def test_run_calls_pipelines(owner, repo_name, ow_config, pipeline_result, mocke
 def test_get_repos_names(mocker, owner, github_login, github_token):
     mocker.patch.object(
         GithubRepoAPI,
-        'fetch_repos_list',
-        return_value=[
-            {'archived': True, 'updated_at': '2021-01-20T00:00:00Z', 'name': 'test2'},
+        'iterate_repos_list',
+        return_value=iter([
             {'archived': False, 'updated_at': '2021-01-22T00:00:00Z', 'name': 'test'},
-        ]
+            {'archived': True, 'updated_at': '2021-01-20T00:00:00Z', 'name': 'test2'},
+            {'archived': False, 'updated_at': '2021-01-18T00:00:00Z', 'name': 'test3'},
+        ]),
     )
 
     actual_result = get_repos_names(owner, github_login, github_token, skip_archived=True)
-    assert actual_result == ['test']
+    assert list(actual_result) == ['test', 'test3']
+
+
+def test_run_watchman_keeps_order_and_skips_failed_repos(ow_config, mocker):
+    def process_repo(owner, repo_name, config):
+        if repo_name == 'broken':
+            raise ValueError(repo_name)
+        return repo_name
+
+    mocker.patch(
+        'opensource_watchman.run.get_repos',
+        return_value=[{'name': n} for n in ['a', 'broken', 'b', 'c']],
+    )
+    mocker.patch('opensource_watchman.run.process_repo', side_effect=process_repo)
+
+    actual_result = run_watchman(
+        owner='owner',
+        repo_name=None,
+        exclude_list=['c'],
+        config=ow_config,
+        jobs=3,
+    )
+
+    assert actual_result == ['a', 'b']
+
+
+def test_run_watchman_passes_results_on_as_repos_are_processed(ow_config, mocker):
+    fast_repo_processed = threading.Event()
+
+    def process_repo(owner, repo_name, config):
+        if repo_name == 'slow':
+            assert fast_repo_processed.wait(timeout=5)
+        return repo_name
+
+    mocker.patch(
+        'opensource_watchman.run.get_repos',
+        return_value=[{'name': n} for n in ['slow', 'fast']],
+    )
+    mocker.patch('opensource_watchman.run.process_repo', side_effect=process_repo)
+    processed_repos = []
+
+    def on_repo_processed(repo_result):
+        processed_repos.append(repo_result)
+        fast_repo_processed.set()
+
+    actual_result = run_watchman(
+        'owner', None, [], ow_config, jobs=2, on_repo_processed=on_repo_processed,
+    )
+
+    assert processed_repos == ['fast', 'slow']
+    assert actual_result == ['slow', 'fast']
+
+
+def test_run_watchman_passes_results_on_before_listing_is_exhausted(ow_config, mocker):
+    processed_repos = []
+    processed_repos_numbers_when_listed = []
+
+    def get_repos(*args, **kwargs):
+        for repo_number in range(10):
+            processed_repos_numbers_when_listed.append(len(processed_repos))
+            yield {'name': str(repo_number)}
+
+    mocker.patch('opensource_watchman.run.get_repos', side_effect=get_repos)
+    mocker.patch('opensource_watchman.run.process_repo', side_effect=lambda o, r, c: r)
+
+    actual_result = run_watchman(
+        'owner', None, [], ow_config, jobs=1, on_repo_processed=processed_repos.append,
+    )
+
+    assert actual_result == [str(n) for n in range(10)]
+    assert processed_repos_numbers_when_listed[-1] > 0
+
+
+def test_run_watchman_async_keeps_order_and_skips_failed_repos(ow_config, mocker):
+    def process_repo(owner, repo_name, config):
+        if repo_name == 'broken':
+            raise ValueError(repo_name)
+        return repo_name
+
+    mocker.patch(
+        'opensource_watchman.run.get_repos',
+        return_value=[{'name': n} for n in ['a', 'broken', 'b']],
+    )
+    mocker.patch('opensource_watchman.run.process_repo', side_effect=process_repo)
+    processed_repos = []
+    loop_thread_id = threading.get_ident()
+
+    actual_result = asyncio.run(run_watchman_async(
+        owner='owner',
+        repo_name=None,
+        exclude_list=[],
+        config=ow_config,
+        jobs=2,
+        on_repo_processed=lambda r: processed_repos.append((r, threading.get_ident())),
+    ))
+
+    assert actual_result == ['a', 'b']
+    assert sorted(processed_repos) == [('a', loop_thread_id), ('b', loop_thread_id)]
+
+
+def test_process_repo_fetches_only_data_of_selected_checks(ow_config, mocked_responses, mocker):
+    mocked_responses.mock_calls([
+        ('https://raw.githubusercontent.com/owner/test/master/setup.py', 'package_name = "test"'),
+        ('https://api.github.com/repos/owner/test', {'description': 'Test'}),
+        (
+            'https://api.github.com/repos/owner/test/commits',
+            [{'commit': {'committer': {'date': '2000-01-01T00:00:00Z'}}}],
+        ),
+    ])
+    get_image_height = mocker.patch(
+        'opensource_watchman.pipelines.github.get_image_height_in_pixels',
+    )
+
+    actual_result = process_repo('owner', 'test', ow_config._replace(checks_to_run=['S01']))
+
+    assert actual_result.package_name == 'test'
+    assert actual_result.description == 'Test.'
+    assert list(actual_result.errors.keys()) == ['S01']
+    assert len(mocked_responses.calls) == 3
+    assert not get_image_height.called
+
+
+GITHUB_REPO_URL = 'https://api.github.com/repos/owner/test'
+
+
+def iso_days_ago(days):
+    return (datetime.datetime.now() - datetime.timedelta(days=days)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def create_repo_activity():
+    """Open issues and pull requests (newest first), served by both github data sources."""
+    issues = [
+        {'number': 5, 'updated_at': iso_days_ago(300), 'comments': [10, 200]},
+        {'number': 3, 'updated_at': iso_days_ago(20), 'comments': []},
+    ]
+    pull_requests = [
+        {
+            'number': 4, 'updated_at': iso_days_ago(30), 'comments': [5], 'sha': 'c4',
+            'statuses': [('success', 30)],
+            'reviews': [('CHANGES_REQUESTED', 'c3', 40), ('APPROVED', 'c4', 29)],
+            'review_threads': [[25, 28], [27]],
+        },
+        {
+            'number': 2, 'updated_at': iso_days_ago(60), 'comments': [], 'sha': 'c2',
+            'statuses': [('failure', 59), ('success', 61)], 'reviews': [], 'review_threads': [],
+        },
+        {
+            'number': 1, 'updated_at': iso_days_ago(90), 'comments': [], 'sha': 'c1',
+            'statuses': [], 'reviews': [], 'review_threads': [],
+        },
+    ]
+    return issues, pull_requests
+
+
+def mock_rest_repo_activity(mocked_responses, issues, pull_requests):
+    all_issues = sorted([*issues, *pull_requests], key=lambda i: i['number'], reverse=True)
+    mocked_responses.mock_calls([
+        (f'{GITHUB_REPO_URL}/issues', [
+            {'number': i['number'], 'updated_at': i['updated_at'], 'comments': len(i['comments'])}
+            for i in all_issues
+        ]),
+        *[
+            (
+                f'{GITHUB_REPO_URL}/issues/{i["number"]}/comments',
+                [{'updated_at': iso_days_ago(d)} for d in i['comments']],
+            )
+            for i in all_issues
+        ],
+        (f'{GITHUB_REPO_URL}/pulls', [
+            {'number': p['number'], 'updated_at': p['updated_at']} for p in pull_requests
+        ]),
+    ])
+    for pull_request in pull_requests:
+        number, sha = pull_request['number'], pull_request['sha']
+        mocked_responses.mock_calls([
+            (f'{GITHUB_REPO_URL}/pulls/{number}', {'number': number}),
+            (f'{GITHUB_REPO_URL}/pulls/{number}/commits', [{'sha': sha}]),
+            (f'{GITHUB_REPO_URL}/commits/{sha}/statuses', [
+                {'state': s, 'created_at': iso_days_ago(d)} for s, d in pull_request['statuses']
+            ]),
+            (f'{GITHUB_REPO_URL}/commits/{sha}/reviews', [
+                {'state': s, 'submitted_at': iso_days_ago(d)}
+                for s, commit_sha, d in pull_request['reviews'] if commit_sha == sha
+            ]),
+            (f'{GITHUB_REPO_URL}/pulls/{number}/comments', [
+                {'updated_at': iso_days_ago(d)} for t in pull_request['review_threads'] for d in t
+            ]),
+        ])
+
+
+def get_graphql_connection(nodes):
+    return {
+        'totalCount': len(nodes),
+        'pageInfo': {'hasNextPage': False, 'endCursor': None},
+        'nodes': nodes,
+    }
+
+
+def get_graphql_comments(updated_days_ago):
+    return get_graphql_connection([{'updatedAt': iso_days_ago(d)} for d in updated_days_ago])
+
+
+def mock_graphql_repo_activity(mocked_responses, issues, pull_requests):
+    issues_nodes = [
+        {
+            '__typename': 'Issue',
+            'id': f'issue{i["number"]}',
+            'number': i['number'],
+            'updatedAt': i['updated_at'],
+            'comments': get_graphql_comments(i['comments']),
+        }
+        for i in issues
+    ]
+    pull_requests_nodes = [
+        {
+            '__typename': 'PullRequest',
+            'id': f'pull_request{p["number"]}',
+            'number': p['number'],
+            'updatedAt': p['updated_at'],
+            'comments': get_graphql_comments(p['comments']),
+            'commits': {'nodes': [{'commit': {
+                'oid': p['sha'],
+                'status': {'contexts': [
+                    {'state': s.upper(), 'createdAt': iso_days_ago(d)} for s, d in p['statuses']
+                ]} if p['statuses'] else None,
+            }}]},
+            'reviews': get_graphql_connection([
+                {'state': s, 'submittedAt': iso_days_ago(d), 'commit': {'oid': commit_sha}}
+                for s, commit_sha, d in p['reviews']
+            ]),
+            'reviewThreads': get_graphql_connection([
+                {
+                    '__typename': 'PullRequestReviewThread',
+                    'id': f'thread{p["number"]}-{thread_index}',
+                    'comments': get_graphql_comments(t),
+                }
+                for thread_index, t in enumerate(p['review_threads'])
+            ]),
+        }
+        for p in pull_requests
+    ]
+
+    def respond(request):
+        query = json.loads(request.body)['query']
+        nodes = pull_requests_nodes if 'pullRequests(' in query else issues_nodes
+        return 200, {}, json.dumps({
+            'data': {'repository': {'items': get_graphql_connection(nodes)}},
+        })
+
+    mocked_responses.add_callback(responses.POST, 'https://api.github.com/graphql', respond)
+
+
+def mock_repo_files(mocked_responses):
+    mocked_responses.mock_calls([
+        ('https://raw.githubusercontent.com/owner/test/master/setup.py', 'package_name = "test"'),
+        ('https://raw.githubusercontent.com/owner/test/master/setup.cfg', ''),
+        (GITHUB_REPO_URL, {'description': 'Test'}),
+    ])
+
+
+@pytest.mark.parametrize('github_data_source', ['rest', 'graphql'])
+def test_github_data_sources_give_same_results(
+    github_data_source, ow_config, mocked_responses,
+):
+    issues, pull_requests = create_repo_activity()
+    mock_repo_activity = {
+        'rest': mock_rest_repo_activity,
+        'graphql': mock_graphql_repo_activity,
+    }[github_data_source]
+    mock_repo_activity(mocked_responses, issues, pull_requests)
+    mock_repo_files(mocked_responses)
+    config = ow_config._replace(
+        checks_to_run=['I01', 'M01'],
+        min_number_of_actual_issues=6,
+        github_data_source=github_data_source,
+    )
+
+    repo_result, github_results = evaluate_repo('owner', 'test', config)
+    master_results = create_repo_master_pipeline('owner', 'test', config).update_parameters(
+        github_data=github_results,
+        travis_data={},
+    ).run_all(1, ['issues_stale_days', 'is_prs_ok_to_merge', 'pull_requests_updated_at'])
+
+    assert repo_result.errors == {
+        'I01': ['Too few actual issues (5<6)'],
+        'M01': ['Pull request #1 is stale for too long (90 days)'],
+    }
+    assert not repo_result.unknown_checks
+    assert master_results['issues_stale_days'] == {5: 10, 4: 5, 3: 20, 2: 60, 1: 90}
+    assert master_results['is_prs_ok_to_merge'] == {4: True, 2: False, 1: True}
+    assert {
+        n: (datetime.datetime.now() - d).days
+        for n, d in master_results['pull_requests_updated_at'].items()
+    } == {4: 25, 2: 60, 1: 90}
+
+
+def test_graphql_errors_make_issues_and_pull_requests_checks_unknown(ow_config, mocked_responses):
+    mocked_responses.add(
+        responses.POST,
+        'https://api.github.com/graphql',
+        json={'data': None, 'errors': [{'type': 'RATE_LIMITED', 'message': 'Rate limit exceeded'}]},
+    )
+    mock_repo_files(mocked_responses)
+    config = ow_config._replace(checks_to_run=['I01', 'M01'], github_data_source='graphql')
+
+    repo_result = evaluate_repo('owner', 'test', config)[0]
+
+    assert repo_result.errors == {}
+    assert repo_result.unknown_checks == ['I01', 'M01']
+
+
+INPUTS_VERSIONS = {
+    'last_issue_updated_at': '2021-01-22T00:00:00Z',
+    'last_build': {'id': 1, 'state': 'passed', 'finished_at': '2021-01-22T00:00:00Z'},
+    'pypi_version': '1.0',
+}
+
+
+def save_unchanged_repo_state(state_store, evaluated_at):
+    state_store.save('owner', 'test', RepoState(
+        pushed_at='2021-01-22T00:00:00Z',
+        updated_at='2021-01-22T00:00:00Z',
+        result=RepoResult(
+            owner='owner',
+            package_name='test',
+            description='Test',
+            badges_urls=[],
+            repo_name='test',
+            errors={'D01': ['README.md not found'], 'S01': ['Last commit was long ago']},
+        ),
+        clock_dependent_data={
+            'last_commit_date': datetime.datetime.now(),
+            'ow_repo_config': {'features_from_contributors_are_welcome': 'False'},
+            'open_issues': [],
+            'issues_comments': {},
+            'open_pull_requests': [],
+            'pull_request_details': {},
+            'detailed_pull_requests': {},
+        },
+        inputs_versions=INPUTS_VERSIONS,
+        evaluated_at=evaluated_at,
+    ))
+
+
+def test_process_repo_incrementally_reevaluates_clock_dependent_checks_of_unchanged_repo(
+    ow_config, mocker,
+):
+    mocker.patch(
+        'opensource_watchman.run.fetch_repo_inputs_versions', return_value=INPUTS_VERSIONS,
+    )
+    evaluate_repo = mocker.patch('opensource_watchman.run.evaluate_repo')
+    state_store = RepoStateStore(SqliteStore(':memory:', 'repos_state'))
+    save_unchanged_repo_state(state_store, evaluated_at=time.time())
+
+    actual_result = process_repo_incrementally(
+        'owner',
+        {'name': 'test', 'pushed_at': '2021-01-22T00:00:00Z', 'updated_at': '2021-01-22T00:00:00Z'},
+        ow_config,
+        state_store,
+    )
+
+    assert actual_result.errors == {'D01': ['README.md not found']}
+    assert not evaluate_repo.called
+
+
+@pytest.mark.parametrize('changed_inputs_versions, state_age_seconds', [
+    ({'last_build': {'id': 2, 'state': 'failed', 'finished_at': '2021-01-23T00:00:00Z'}}, 0),
+    ({'last_issue_updated_at': '2021-01-23T00:00:00Z'}, 0),
+    ({'pypi_version': '1.1'}, 0),
+    ({}, INCREMENTAL_STATE_MAX_AGE_SECONDS + 1),
+])
+def test_process_repo_incrementally_processes_repo_with_changed_inputs_or_old_state(
+    changed_inputs_versions, state_age_seconds, ow_config, mocker,
+):
+    mocker.patch(
+        'opensource_watchman.run.fetch_repo_inputs_versions',
+        return_value={**INPUTS_VERSIONS, **changed_inputs_versions},
+    )
+    state_store = RepoStateStore(SqliteStore(':memory:', 'repos_state'))
+    save_unchanged_repo_state(state_store, evaluated_at=time.time() - state_age_seconds)
+    evaluate_repo = mocker.patch(
+        'opensource_watchman.run.evaluate_repo',
+        return_value=(
+            RepoResult('owner', 'test', 'Test', [], 'test', {}),
+            state_store.get('owner', 'test').clock_dependent_data,
+        ),
+    )
+
+    actual_result = process_repo_incrementally(
+        'owner',
+        {'name': 'test', 'pushed_at': '2021-01-22T00:00:00Z', 'updated_at': '2021-01-22T00:00:00Z'},
+        ow_config,
+        state_store,
+    )
+
+    assert evaluate_repo.call_count == 1
+    assert actual_result.errors == {}
+    assert state_store.get('owner', 'test').inputs_versions == {
+        **INPUTS_VERSIONS, **changed_inputs_versions,
+    }
+
+
+def test_run_watchman_processes_repo_given_by_name_incrementally(
+    ow_config, mocked_responses, mocker,
+):
+    mocked_responses.mock_calls([(
+        'https://api.github.com/repos/owner/test',
+        {'name': 'test', 'pushed_at': '2021-01-22T00:00:00Z', 'updated_at': '2021-01-22T00:00:00Z'},
+    )])
+    mocker.patch(
+        'opensource_watchman.run.fetch_repo_inputs_versions', return_value=INPUTS_VERSIONS,
+    )
+    evaluate_repo = mocker.patch('opensource_watchman.run.evaluate_repo')
+    state_store = RepoStateStore(SqliteStore(':memory:', 'repos_state'))
+    save_unchanged_repo_state(state_store, evaluated_at=time.time())
+
+    actual_result = run_watchman('owner', 'test', [], ow_config, state_store=state_store)
+
+    assert actual_result[0].errors == {'D01': ['README.md not found']}
+    assert not evaluate_repo.called
+
+
+def test_run_watchman_bypasses_incremental_mode_with_selected_checks(ow_config, mocker, caplog):
+    process_repo = mocker.patch('opensource_watchman.run.process_repo', return_value='result')
+    process_repo_incrementally = mocker.patch(
+        'opensource_watchman.run.process_repo_incrementally',
+    )
+    state_store = RepoStateStore(SqliteStore(':memory:', 'repos_state'))
+
+    actual_result = run_watchman(
+        'owner', 'test', [], ow_config._replace(checks_to_run=['S01']), state_store=state_store,
+    )
+
+    assert actual_result == ['result']
+    assert process_repo.call_count == 1
+    assert not process_repo_incrementally.called
+    assert 'Incremental mode is bypassed' in caplog.text
+
+
+def test_fetch_repo_inputs_versions(ow_config, mocked_responses):
+    mocked_responses.mock_calls([
+        (
+            'https://api.github.com/repos/owner/test/issues',
+            [{'number': 2, 'updated_at': '2021-01-22T00:00:00Z'}],
+        ),
+        (
+            'https://api.travis-ci.org/repo/owner%2Ftest/builds',
+            {'builds': [{**INPUTS_VERSIONS['last_build'], 'jobs': []}]},
+        ),
+        ('https://pypi.org/pypi/test/json', {'info': {'version': '1.0'}}),
+    ])
+
+    assert fetch_repo_inputs_versions('owner', 'test', 'test', ow_config) == INPUTS_VERSIONS
+    assert 'sort=updated' in mocked_responses.calls[0].request.url
+
+
+def test_process_repo_incrementally_saves_state_of_changed_repo(ow_config, mocker):
+    repo_result = RepoResult(
+        owner='owner',
+        package_name='test',
+        description='Test',
+        badges_urls=[],
+        repo_name='test',
+        errors={},
+    )
+    github_results = {
+        'project_description': 'Test',
+        'readme_content': 'content',
+        'last_commit_date': datetime.datetime(2021, 1, 20),
+        'ow_repo_config': {},
+        'open_issues': [{'number': 1, 'updated_at': '2021-01-20T00:00:00Z', 'comments': 1}],
+        'issues_comments': {1: [{'updated_at': '2021-01-20T00:00:00Z'}]},
+        'open_pull_requests': [],
+        'pull_request_details': {},
+        'detailed_pull_requests': {},
+    }
+    evaluate_repo = mocker.patch(
+        'opensource_watchman.run.evaluate_repo', return_value=(repo_result, github_results),
+    )
+    mocker.patch(
+        'opensource_watchman.run.fetch_repo_inputs_versions', return_value=INPUTS_VERSIONS,
+    )
+    state_store = RepoStateStore(SqliteStore(':memory:', 'repos_state'))
+
+    actual_result = process_repo_incrementally(
+        'owner',
+        {'name': 'test', 'pushed_at': '2021-01-22T00:00:00Z', 'updated_at': '2021-01-22T00:00:00Z'},
+        ow_config,
+        state_store,
+    )
+
+    repo_state = state_store.get('owner', 'test')
+    assert actual_result == repo_result
+    assert evaluate_repo.call_count == 1
+    assert repo_state.result == repo_result
+    assert repo_state.pushed_at == '2021-01-22T00:00:00Z'
+    assert repo_state.inputs_versions == INPUTS_VERSIONS
+    assert 'readme_content' not in repo_state.clock_dependent_data
+    assert repo_state.clock_dependent_data['last_commit_date'] == datetime.datetime(2021, 1, 20)
+    assert repo_state.clock_dependent_data['issues_comments'] == github_results['issues_comments']
+
+
+def test_run_watchman_disables_contracts_during_run_only(ow_config, mocker):
+    contracts_enabled_in_run = []
+
+    def process_repo(owner, repo_name, config):
+        contracts_enabled_in_run.append(deal.state.debug)
+        return repo_name
+
+    mocker.patch('opensource_watchman.run.process_repo', side_effect=process_repo)
+    deal.enable()
+    try:
+        run_watchman('owner', 'test', [], ow_config)
+        assert deal.state.debug
+    finally:
+        deal.reset()
+
+    assert contracts_enabled_in_run == [False]
+
+
+def test_contracts_stay_disabled_until_last_of_overlapping_runs_finishes():
+    deal.enable()
+    try:
+        first_run = contracts_disabled()
+        second_run = contracts_disabled()
+        first_run.__enter__()
+        second_run.__enter__()
+        first_run.__exit__(None, None, None)
+        assert not deal.state.debug
+        second_run.__exit__(None, None, None)
+        assert deal.state.debug
+    finally:
+        deal.reset()
+
+
+def test_memory_profiler_reports_usage_after_each_repo(ow_config, mocker, tmp_path):
+    mocker.patch(
+        'opensource_watchman.run.get_repos',
+        return_value=[{'name': n} for n in ['a', 'b']],
+    )
+    mocker.patch(
+        'opensource_watchman.run.process_repo',
+        side_effect=lambda owner, repo_name, config: RepoResult(
+            owner=owner, repo_name=repo_name, package_name=None, description=None,
+            badges_urls=[], errors={},
+        ),
+    )
+
+    with MemoryProfiler(str(tmp_path / 'memory.txt')) as profiler:
+        run_watchman('owner', None, [], ow_config, on_repo_processed=profiler.observe_repo)
+
+    report = (tmp_path / 'memory.txt').read_text()
+    assert [r for r, _, _ in profiler.repos_memory] == ['owner/a', 'owner/b']
+    assert 'Top allocation sites' in report
+
+
+def test_cpu_profiler_writes_collapsed_stacks(tmp_path):
+    with CpuProfiler(str(tmp_path / 'cpu.collapsed')) as profiler:
+        profiler.sample()
+
+    collapsed_stacks = dict(
+        line.rsplit(' ', 1) for line in (tmp_path / 'cpu.collapsed').read_text().splitlines()
+    )
+    assert any(
+        ':test_cpu_profiler_writes_collapsed_stacks:' in stack
+        and stack.split(';')[-1].startswith('opensource_watchman.profiling:sample:')
+        for stack in collapsed_stacks
+    )
+
+
+def test_get_checks_by_nodes_of_pipelines(ow_config):
+    checks_by_nodes = get_checks_by_nodes_of_pipelines('owner', ow_config)
+
+    assert checks_by_nodes[('github', 'pull_request_details')] == {'M01'}
+    assert checks_by_nodes[('github', 'issues_comments')] == {'I01'}
+    assert checks_by_nodes[('travis', 'last_build_commands')] == {'C03'}
+    assert checks_by_nodes[('master', 'is_pypi_response_ok')] == {'R02'}
+    assert {'D02', 'R01', 'T01'} < checks_by_nodes[('github', 'ow_repo_config')]
+    assert ('github', 'project_description') not in checks_by_nodes
+
+
+def test_create_transport_can_disable_github_requests_pacing():
+    transport = create_transport(
+        warm_up_connections=False,
+        cache_dir=None,
+        github_points_per_minute={},
+    )
+
+    rate_limiters = [layer for layer in transport.layers if isinstance(layer, GithubRateLimiter)]
+    assert [layer.points_per_minute for layer in rate_limiters] == [{}]
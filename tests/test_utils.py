@@ -1,7 +1,18 @@
+import io
+
 import deal
+import pytest
+import responses
+from PIL import Image, UnidentifiedImageError
 
 from opensource_watchman.prerequisites import python_only, rus_only
-from opensource_watchman.utils.logs_analiser import if_logs_has_any_of_commands
+from opensource_watchman.utils.images import (
+    read_image_size, read_svg_size, get_image_size, set_image_size_cache,
+)
+from opensource_watchman.utils.logs_analiser import (
+    CommandsMatcher, if_logs_has_any_of_commands, iterate_build_commands, iterate_commands_until_found,
+)
+from opensource_watchman.utils.storage import SqliteStore
 
 
 def test_if_logs_has_any_of_commands_success_case():
@@ -13,3 +24,116 @@ def test_if_logs_has_any_of_commands_success_case():
 
 test_python_only = deal.cases(python_only)
 test_rus_only = deal.cases(rus_only)
+
+
+def _make_image_bytes(image_format, size):
+    image_data = io.BytesIO()
+    Image.new('RGB', size).save(image_data, format=image_format)
+    return image_data.getvalue()
+
+
+@pytest.mark.parametrize('image_format', ['PNG', 'GIF', 'JPEG'])
+def test_read_image_size_consumes_only_header(image_format):
+    image_data = _make_image_bytes(image_format, (300, 20))
+    chunks = iter([image_data[:1024], b'never read'])
+
+    assert read_image_size(chunks) == (300, 20)
+    assert next(chunks) == b'never read'
+
+
+def test_read_image_size_raises_for_unknown_format():
+    with pytest.raises(UnidentifiedImageError):
+        read_image_size([b'not an image'])
+
+
+def test_get_image_size_uses_cache(mocked_responses, tmp_path):
+    url = 'https://example.com/badge.png'
+    mocked_responses.add(responses.GET, url, body=_make_image_bytes('PNG', (90, 20)))
+    set_image_size_cache(SqliteStore(str(tmp_path / 'cache.sqlite'), 'image_sizes'))
+    try:
+        image_sizes = [get_image_size(url), get_image_size(url)]
+    finally:
+        set_image_size_cache(None)
+
+    assert image_sizes == [(90, 20), (90, 20)]
+    assert len(mocked_responses.calls) == 1
+    assert mocked_responses.calls[0].request.headers['Range'] == 'bytes=0-65535'
+
+
+def test_get_image_size_reprobes_failed_image_after_short_ttl(mocked_responses, tmp_path, mocker):
+    url = 'https://example.com/badge.png'
+    mocked_responses.add(responses.GET, url, status=503)
+    mocked_responses.add(responses.GET, url, body=_make_image_bytes('PNG', (90, 20)))
+    mocker.patch('opensource_watchman.utils.images.IMAGE_SIZE_FAILURE_CACHE_TTL_SECONDS', -1)
+    set_image_size_cache(SqliteStore(str(tmp_path / 'cache.sqlite'), 'image_sizes'))
+    try:
+        image_sizes = [get_image_size(url), get_image_size(url), get_image_size(url)]
+    finally:
+        set_image_size_cache(None)
+
+    assert image_sizes == [None, (90, 20), (90, 20)]
+    assert len(mocked_responses.calls) == 2
+
+
+@pytest.mark.parametrize(('svg_root', 'expected_size'), [
+    ('<svg xmlns="http://www.w3.org/2000/svg" width="90" height="20">', (90, 20)),
+    ('<svg width="90px" height="20.4px">', (90, 20)),
+    ('<svg width="100%" viewBox="0 0 300 150">', (300, 150)),
+    ('<svg>', None),
+])
+def test_read_svg_size_reads_only_root_element(svg_root, expected_size):
+    chunks = iter([
+        b'<?xml version="1.0"?>\n<!-- badge -->\n',
+        svg_root.encode(),
+        b'<g><text>passing</text></g></svg>',
+    ])
+
+    assert read_svg_size(chunks) == expected_size
+    assert next(chunks) == b'<g><text>passing</text></g></svg>'
+
+
+def test_get_image_size_detects_svg_by_content(mocked_responses):
+    url = 'https://raw.githubusercontent.com/test/test/master/badge.svg'
+    mocked_responses.add(
+        responses.GET,
+        url,
+        body='<svg width="90" height="20"></svg>',
+        content_type='text/plain',
+    )
+
+    assert get_image_size(url) == (90, 20)
+
+
+def test_iterate_build_commands_extracts_commands_and_subcommands():
+    log_lines = [
+        'Cloning repo',
+        '\x1b[0K$ pip install -r requirements.txt',
+        '$ make check',
+        'flake8 .',
+        'make[1]: Entering directory',
+        '----------',
+        'mypy .',
+        'Done. Your build exited with 0.',
+    ]
+
+    assert list(iterate_build_commands(log_lines)) == [
+        'pip install -r requirements.txt', 'make check', 'make check', 'flake8 .', 'mypy .',
+    ]
+
+
+def test_iterate_commands_until_found_stops_when_all_sections_found():
+    def commands():
+        yield 'flake8 .'
+        yield 'pytest'
+        raise AssertionError('log should not be read further')
+
+    actual_result = iterate_commands_until_found(commands(), [['flake8'], ['pytest', 'py.test']])
+
+    assert list(actual_result) == ['flake8 .', 'pytest']
+
+
+def test_commands_matcher_finds_all_commands_in_single_pass():
+    matcher = CommandsMatcher(['flake8', 'pytest', 'python -m pytest', 'mypy', 'mdl'])
+    log = ['flake8 .', 'cd tests && python -m pytest -v', 'run mypy', 'mdl']
+
+    assert matcher.find_in_log(log) == {'flake8', 'python -m pytest', 'pytest', 'mdl'}